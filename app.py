@@ -7,11 +7,17 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from itertools import chain, repeat
 import numpy as np
 import os
-import re
 import json
+import hashlib
+import queue
+import threading
+import time
+import warnings
 
 # Try to import yfinance
 try:
@@ -22,12 +28,48 @@ try:
 except ImportError:
     YFINANCE_AVAILABLE = False
 
+# Chatbot inference backend: "auto" (TensorFlow if installed, else NumPy),
+# "tensorflow", "numpy" or "onnx". Forcing "numpy" or "onnx" skips the
+# TensorFlow import entirely. "remote" loads no model at all and sends questions
+# to chatbot_server.py at CHATBOT_SERVER_URL.
+CHATBOT_BACKEND = os.environ.get("CHATBOT_BACKEND", "auto").lower()
+CHATBOT_SERVER_URL = os.environ.get("CHATBOT_SERVER_URL", "http://127.0.0.1:8765")
+# Seconds the UI waits for one custom chatbot answer before showing what was decoded so far
+CHATBOT_GENERATION_TIMEOUT = float(os.environ.get("CHATBOT_GENERATION_TIMEOUT", "20"))
+# Seconds between checks for a newly published model version (0 = never hot swap), see ChatbotHotSwap
+CHATBOT_HOT_SWAP_INTERVAL = float(os.environ.get("CHATBOT_HOT_SWAP_INTERVAL", "5"))
+
 # Try to import TensorFlow for chatbot
-try:
-    import tensorflow as tf
-    TF_AVAILABLE = True
-except ImportError:
-    TF_AVAILABLE = False
+TF_AVAILABLE = False
+if CHATBOT_BACKEND not in ("numpy", "onnx", "remote"):
+    try:
+        import tensorflow as tf
+        TF_AVAILABLE = True
+    except ImportError:
+        TF_AVAILABLE = False
+
+# Try to import the TensorFlow-free NumPy backend (needs h5py)
+NUMPY_BACKEND_AVAILABLE = False
+if CHATBOT_BACKEND != "remote":
+    try:
+        from chatbot_numpy import NumpyTransformer
+        NUMPY_BACKEND_AVAILABLE = True
+    except ImportError:
+        NUMPY_BACKEND_AVAILABLE = False
+
+# Try to import the onnxruntime backend (needs graphs from export_onnx_model.py)
+ONNX_BACKEND_AVAILABLE = False
+if CHATBOT_BACKEND != "remote":
+    try:
+        from chatbot_onnx import OnnxTransformer, ONNX_DIR
+        ONNX_BACKEND_AVAILABLE = True
+    except ImportError:
+        ONNX_BACKEND_AVAILABLE = False
+
+from chatbot_cache import ResponseCache
+from chatbot_text import normalize_text
+from chatbot_vocab import VocabularyFile, pad_token_ids
+from chatbot_retrieval import RetrievalIndex
 
 # Try to import Groq for API chatbot
 try:
@@ -46,38 +88,64 @@ import requests
 # Model directory - where trained model files should be placed
 MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
 
-def preprocess_sentence_chatbot(sentence):
-    """Clean and preprocess a sentence for chatbot"""
-    if not isinstance(sentence, str):
-        sentence = str(sentence)
-    
-    sentence = sentence.lower().strip()
-    sentence = re.sub(r"([?.!,])", r" \1 ", sentence)
-    sentence = re.sub(r'[" "]+', " ", sentence)
-    sentence = re.sub(r"i'm", "i am", sentence)
-    sentence = re.sub(r"he's", "he is", sentence)
-    sentence = re.sub(r"she's", "she is", sentence)
-    sentence = re.sub(r"it's", "it is", sentence)
-    sentence = re.sub(r"that's", "that is", sentence)
-    sentence = re.sub(r"what's", "what is", sentence)
-    sentence = re.sub(r"where's", "where is", sentence)
-    sentence = re.sub(r"how's", "how is", sentence)
-    sentence = re.sub(r"\'ll", " will", sentence)
-    sentence = re.sub(r"\'ve", " have", sentence)
-    sentence = re.sub(r"\'re", " are", sentence)
-    sentence = re.sub(r"\'d", " would", sentence)
-    sentence = re.sub(r"won't", "will not", sentence)
-    sentence = re.sub(r"can't", "cannot", sentence)
-    sentence = re.sub(r"n't", " not", sentence)
-    sentence = re.sub(r"n'", "ng", sentence)
-    sentence = re.sub(r"'bout", "about", sentence)
-    sentence = re.sub(r"[^a-zA-Z0-9?.!,%]+", " ", sentence)
-    sentence = sentence.strip()
-    return sentence
+# Versioned deployments: MODEL_DIR holds one subdirectory per model version and this
+# pointer names the live one, either as a symlink to it or as a file containing its name
+# (see publish_model_version.py). Without a pointer MODEL_DIR itself is the model.
+MODEL_VERSION_POINTER = "current"
+
+# Exported serving artifact (see export_serving_model.py), inside the model directory
+SERVING_DIR = "serving"
+SERVING_WEIGHTS_STAMP = "weights.sha256"
+
+# Token ids that occur in the training answers (see build_vocab_shortlist.py)
+VOCAB_SHORTLIST_FILE = "vocab_shortlist.json"
+
+# Persistent tier of the response cache, inside the model directory
+RESPONSE_CACHE_FILE = "response_cache.sqlite3"
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Digests of file_sha256_cached by (path, size, mtime), so the weights are read once per version
+_FILE_SHA256_CACHE = {}
+
+def file_sha256_cached(path):
+    """file_sha256, computed once per process for each size and modification time of the file"""
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _FILE_SHA256_CACHE:
+        _FILE_SHA256_CACHE[key] = file_sha256(path)
+    return _FILE_SHA256_CACHE[key]
+
+def resolve_model_dir(model_dir):
+    """The version directory model_dir's "current" pointer names, or model_dir itself"""
+    pointer = os.path.join(model_dir, MODEL_VERSION_POINTER)
+    if os.path.isdir(pointer):
+        return os.path.realpath(pointer)
+    if os.path.isfile(pointer):
+        with open(pointer, 'r') as f:
+            version = f.read().strip()
+        if version:
+            return os.path.join(model_dir, version)
+    return model_dir
+
+# Single-pass normalizer shared with the training scripts (see chatbot_text.py)
+preprocess_sentence_chatbot = normalize_text
 
 
 class SimpleTokenizer:
-    """A simple word-level tokenizer for the chatbot."""
+    """A simple word-level tokenizer for the chatbot.
+    
+    Loaded from a model directory with a current tokenizer.bin, the vocabulary stays
+    in that memory-mapped file (see chatbot_vocab.py) instead of the word2idx and
+    idx2word dicts, which are then left empty.
+    """
     
     def __init__(self):
         self.word2idx = {}
@@ -85,17 +153,50 @@ class SimpleTokenizer:
         self.vocab_size = 0
         self.oov_token = '<OOV>'
         self.pad_token = '<PAD>'
+        self.vocab_file = None
     
     def encode(self, sentence):
+        if self.vocab_file is not None:
+            lookup = self.vocab_file.lookup
+            return [lookup(word, 1) for word in sentence.split()]
         return [self.word2idx.get(word, 1) for word in sentence.split()]
     
     def decode(self, tokens):
+        if self.vocab_file is not None:
+            word, size = self.vocab_file.word, len(self.vocab_file)
+            return ' '.join([word(idx) for idx in tokens if 0 < idx < size])
         words = [self.idx2word.get(idx, self.oov_token) for idx in tokens 
                  if idx != 0 and idx in self.idx2word]
         return ' '.join(words)
     
+    def encode_batch(self, sentences, max_length, start_token=None, end_token=None):
+        """Encode sentences into a zero-padded (len(sentences), max_length) int32 array.
+        
+        Rows are [start_token] + ids + [end_token] and overlong rows keep their last
+        max_length tokens, as with pad_sequences(padding="post"). Returns the array
+        and the untruncated length of every row.
+        """
+        lookup = self.vocab_file.lookup if self.vocab_file is not None else self.word2idx.get
+        split = [sentence.split() for sentence in sentences]
+        counts = np.fromiter(map(len, split), dtype=np.int64, count=len(split))
+        # One pass over all words straight into the id array, without per-sentence lists
+        ids = np.fromiter(map(lookup, chain.from_iterable(split), repeat(1)), dtype=np.int32, count=int(counts.sum()))
+        return pad_token_ids(ids, counts, max_length, start_token, end_token)
+    
+    def decode_batch(self, tokens):
+        """Decode every row of a 2-D token array; ids outside the vocabulary (padding, START, END) are skipped"""
+        tokens = np.asarray(tokens)
+        tokens = np.where((tokens > 0) & (tokens < self.vocab_size), tokens, 0)
+        return [self.decode(row) for row in tokens.tolist()]
+    
     @classmethod
     def load(cls, path):
+        vocab_file = VocabularyFile.load(path)
+        if vocab_file is not None:
+            tokenizer = cls()
+            tokenizer.vocab_file = vocab_file
+            tokenizer.vocab_size = len(vocab_file)
+            return tokenizer
         with open(path, 'r') as f:
             data = json.load(f)
         tokenizer = cls()
@@ -132,13 +233,18 @@ if TF_AVAILABLE:
     def scaled_dot_product_attention(q, k, v, mask):
         matmul_qk = tf.matmul(q, k, transpose_b=True)
         dk = tf.cast(tf.shape(k)[-1], tf.float32)
-        scaled_attention_logits = matmul_qk / tf.math.sqrt(dk)
+        # Logits and softmax stay in float32 for reduced-precision models (no-op casts otherwise)
+        scaled_attention_logits = tf.cast(matmul_qk, tf.float32) / tf.math.sqrt(dk)
         if mask is not None:
-            scaled_attention_logits += (mask * -1e9)
+            scaled_attention_logits += (tf.cast(mask, tf.float32) * -1e9)
         attention_weights = tf.nn.softmax(scaled_attention_logits, axis=-1)
-        output = tf.matmul(attention_weights, v)
+        output = tf.matmul(tf.cast(attention_weights, v.dtype), v)
         return output, attention_weights
 
+    def inference_identity(x, training=False):
+        """Stands in for Dropout after optimize_for_inference (Keras forbids new sub-layers once built)"""
+        return x
+
     class MultiHeadAttention(tf.keras.layers.Layer):
         def __init__(self, d_model, num_heads):
             super(MultiHeadAttention, self).__init__()
@@ -154,19 +260,26 @@ if TF_AVAILABLE:
             x = tf.reshape(x, (batch_size, -1, self.num_heads, self.depth))
             return tf.transpose(x, perm=[0, 2, 1, 3])
         
-        def call(self, v, k, q, mask):
+        def compute_kv(self, v, k):
+            """Project and split keys/values so they can be cached across decode steps"""
+            batch_size = tf.shape(k)[0]
+            k = self.split_heads(self.wk(k), batch_size)
+            v = self.split_heads(self.wv(v), batch_size)
+            return k, v
+        
+        def attend(self, q, k, v, mask):
+            """Attend with already projected (cached) keys and values"""
             batch_size = tf.shape(q)[0]
-            q = self.wq(q)
-            k = self.wk(k)
-            v = self.wv(v)
-            q = self.split_heads(q, batch_size)
-            k = self.split_heads(k, batch_size)
-            v = self.split_heads(v, batch_size)
+            q = self.split_heads(self.wq(q), batch_size)
             scaled_attention, _ = scaled_dot_product_attention(q, k, v, mask)
             scaled_attention = tf.transpose(scaled_attention, perm=[0, 2, 1, 3])
             concat_attention = tf.reshape(scaled_attention, (batch_size, -1, self.d_model))
             output = self.dense(concat_attention)
             return output
+        
+        def call(self, v, k, q, mask):
+            k, v = self.compute_kv(v, k)
+            return self.attend(q, k, v, mask)
 
     def point_wise_feed_forward_network(d_model, dff):
         return tf.keras.Sequential([
@@ -217,6 +330,61 @@ if TF_AVAILABLE:
             ffn_output = self.dropout3(ffn_output, training=training)
             out3 = self.layernorm3(ffn_output + out2)
             return out3
+        
+        def init_cache(self, enc_output, max_length=None):
+            """Create the key/value cache for one question (encoder keys/values are computed once).
+            
+            Without max_length the self-attention cache grows by concatenation; with it the
+            cache is a preallocated buffer of fixed shape, as needed inside a tf.while_loop.
+            """
+            enc_k, enc_v = self.mha2.compute_kv(enc_output, enc_output)
+            batch_size = tf.shape(enc_output)[0]
+            depth = self.mha1.depth
+            empty = tf.zeros((batch_size, self.mha1.num_heads, max_length or 0, depth), dtype=enc_k.dtype)
+            return {"self_k": empty, "self_v": empty, "enc_k": enc_k, "enc_v": enc_v}
+        
+        def call_cached(self, x, cache, look_ahead_mask=None, padding_mask=None, slot=None):
+            """Decode only the newest position x, storing its keys/values in cache.
+            
+            If slot is given the cache is a fixed-size buffer and the new keys/values
+            overwrite that position instead of being appended.
+            """
+            self.write_cache(x, cache, slot)
+            return self._attend_cached(x, cache, look_ahead_mask, padding_mask)
+        
+        def write_cache(self, x, cache, slot=None):
+            """Store the self-attention keys/values of the newest position x in cache"""
+            k, v = self.mha1.compute_kv(x, x)
+            if slot is None:
+                cache["self_k"] = tf.concat([cache["self_k"], k], axis=2)
+                cache["self_v"] = tf.concat([cache["self_v"], v], axis=2)
+            else:
+                write = tf.equal(tf.range(tf.shape(cache["self_k"])[2]), slot)[tf.newaxis, tf.newaxis, :, tf.newaxis]
+                cache["self_k"] = tf.where(write, k, cache["self_k"])
+                cache["self_v"] = tf.where(write, v, cache["self_v"])
+        
+        def call_block(self, x, cache, start, look_ahead_mask=None, padding_mask=None):
+            """Decode the consecutive positions start .. start + len(x) - 1 in one pass.
+            
+            The cache is a fixed-size buffer; look_ahead_mask must be causal within the block.
+            """
+            k, v = self.mha1.compute_kv(x, x)
+            end = start + tf.shape(x)[1]
+            for name, new in (("self_k", k), ("self_v", v)):
+                # ensure_shape keeps the buffer's static shape for tf.while_loop
+                cache[name] = tf.ensure_shape(
+                    tf.concat([cache[name][:, :, :start], new, cache[name][:, :, end:]], axis=2), cache[name].shape
+                )
+            return self._attend_cached(x, cache, look_ahead_mask, padding_mask)
+        
+        def _attend_cached(self, x, cache, look_ahead_mask, padding_mask):
+            attn1 = self.mha1.attend(x, cache["self_k"], cache["self_v"], look_ahead_mask)
+            out1 = self.layernorm1(attn1 + x)
+            attn2 = self.mha2.attend(out1, cache["enc_k"], cache["enc_v"], padding_mask)
+            out2 = self.layernorm2(attn2 + out1)
+            ffn_output = self.ffn(out2)
+            out3 = self.layernorm3(ffn_output + out2)
+            return out3
 
     class Encoder(tf.keras.layers.Layer):
         def __init__(self, num_layers, d_model, num_heads, dff, input_vocab_size, maximum_position_encoding, rate=0.1):
@@ -227,11 +395,14 @@ if TF_AVAILABLE:
             self.pos_encoding = positional_encoding(maximum_position_encoding, d_model)
             self.enc_layers = [EncoderLayer(d_model, num_heads, dff, rate) for _ in range(num_layers)]
             self.dropout = tf.keras.layers.Dropout(rate)
+            # Cleared by Transformer.optimize_for_inference once the scale is folded into the embedding
+            self.scale_embeddings = True
         
         def call(self, x, training=False, mask=None):
             seq_len = tf.shape(x)[1]
             x = self.embedding(x)
-            x *= tf.math.sqrt(tf.cast(self.d_model, tf.float32))
+            if self.scale_embeddings:
+                x *= tf.math.sqrt(tf.cast(self.d_model, x.dtype))
             x += self.pos_encoding[:, :seq_len, :]
             x = self.dropout(x, training=training)
             for i in range(self.num_layers):
@@ -247,16 +418,48 @@ if TF_AVAILABLE:
             self.pos_encoding = positional_encoding(maximum_position_encoding, d_model)
             self.dec_layers = [DecoderLayer(d_model, num_heads, dff, rate) for _ in range(num_layers)]
             self.dropout = tf.keras.layers.Dropout(rate)
+            self.scale_embeddings = True
         
         def call(self, x, enc_output, training=False, look_ahead_mask=None, padding_mask=None):
             seq_len = tf.shape(x)[1]
             x = self.embedding(x)
-            x *= tf.math.sqrt(tf.cast(self.d_model, tf.float32))
+            if self.scale_embeddings:
+                x *= tf.math.sqrt(tf.cast(self.d_model, x.dtype))
             x += self.pos_encoding[:, :seq_len, :]
             x = self.dropout(x, training=training)
             for i in range(self.num_layers):
                 x = self.dec_layers[i](x, enc_output, training=training, look_ahead_mask=look_ahead_mask, padding_mask=padding_mask)
             return x
+        
+        def init_cache(self, enc_output, max_length=None):
+            return [layer.init_cache(enc_output, max_length) for layer in self.dec_layers]
+        
+        def call_cached(self, x, caches, position, look_ahead_mask=None, padding_mask=None, fixed_size=False):
+            """Run the decoder for a single new token at the given position"""
+            x = self.embed_position(x, position)
+            slot = position if fixed_size else None
+            for i in range(self.num_layers):
+                x = self.dec_layers[i].call_cached(x, caches[i], look_ahead_mask=look_ahead_mask, padding_mask=padding_mask, slot=slot)
+            return x
+        
+        def embed_position(self, x, position):
+            """Decoder input for a single token at the given position"""
+            x = self.embedding(x)
+            if self.scale_embeddings:
+                x *= tf.math.sqrt(tf.cast(self.d_model, x.dtype))
+            return x + self.pos_encoding[:, position, :][:, tf.newaxis, :]
+        
+        def call_block(self, x, caches, start, look_ahead_mask=None, padding_mask=None):
+            """Run the decoder for the consecutive tokens x starting at position start"""
+            length = tf.shape(x)[1]
+            x = self.embedding(x)
+            if self.scale_embeddings:
+                x *= tf.math.sqrt(tf.cast(self.d_model, x.dtype))
+            # Blocks may run past the last position generation keeps; those rows are discarded
+            x += tf.pad(self.pos_encoding, [[0, 0], [0, length], [0, 0]])[:, start:start + length, :]
+            for i in range(self.num_layers):
+                x = self.dec_layers[i].call_block(x, caches[i], start, look_ahead_mask=look_ahead_mask, padding_mask=padding_mask)
+            return x
 
     class Transformer(tf.keras.Model):
         def __init__(self, num_layers, d_model, num_heads, dff, input_vocab_size, target_vocab_size, pe_input, pe_target, rate=0.1):
@@ -264,12 +467,23 @@ if TF_AVAILABLE:
             self.encoder = Encoder(num_layers, d_model, num_heads, dff, input_vocab_size, pe_input, rate)
             self.decoder = Decoder(num_layers, d_model, num_heads, dff, target_vocab_size, pe_target, rate)
             self.final_layer = tf.keras.layers.Dense(target_vocab_size)
+            # Precomputed by optimize_for_inference; sliced per target length instead of rebuilt
+            self.look_ahead_masks = None
+            # Set by set_vocab_shortlist: final_layer columns for the shortlisted ids only
+            self.shortlist_kernel = None
+            self.shortlist_bias = None
+            self.shortlist_positions = None
+        
+        def _look_ahead_mask(self, size):
+            if self.look_ahead_masks is None:
+                return create_look_ahead_mask(size)
+            return self.look_ahead_masks[:size, :size]
         
         def call(self, inputs, training=False):
             inp, tar = inputs
             enc_padding_mask = create_padding_mask(inp)
             dec_padding_mask = create_padding_mask(inp)
-            look_ahead_mask = create_look_ahead_mask(tf.shape(tar)[1])
+            look_ahead_mask = self._look_ahead_mask(tf.shape(tar)[1])
             dec_target_padding_mask = create_padding_mask(tar)
             combined_mask = tf.maximum(dec_target_padding_mask, look_ahead_mask)
             
@@ -277,22 +491,664 @@ if TF_AVAILABLE:
             dec_output = self.decoder(tar, enc_output, training=training, look_ahead_mask=combined_mask, padding_mask=dec_padding_mask)
             final_output = self.final_layer(dec_output)
             return final_output
+        
+        def optimize_for_inference(self, max_length):
+            """Rewrite the loaded model for generation only; it must not be trained or saved afterwards.
+            
+            Dropout layers become a pass-through, the sqrt(d_model) embedding scale is folded
+            into the embedding matrices, the positional tables (built for vocab_size
+            positions) are trimmed to the max_length + 1 positions generation can reach,
+            and the look-ahead masks are precomputed for every target length.
+            """
+            for coder, layers in ((self.encoder, self.encoder.enc_layers), (self.decoder, self.decoder.dec_layers)):
+                for layer in [coder] + list(layers):
+                    for name in ("dropout", "dropout1", "dropout2", "dropout3"):
+                        if isinstance(getattr(layer, name, None), tf.keras.layers.Dropout):
+                            setattr(layer, name, inference_identity)
+                if coder.scale_embeddings:
+                    scale = tf.math.sqrt(tf.cast(coder.d_model, tf.float32))
+                    embeddings = coder.embedding.embeddings
+                    embeddings.assign(tf.cast(tf.cast(embeddings, tf.float32) * scale, embeddings.dtype))
+                    coder.scale_embeddings = False
+                coder.pos_encoding = tf.constant(coder.pos_encoding[:, :max_length + 1, :])
+            self.look_ahead_masks = create_look_ahead_mask(max_length + 1)
+        
+        def set_precision(self, precision):
+            """Compute in precision (e.g. "bfloat16") instead of float32; call before the model is built.
+            
+            Dense and Embedding weights and the activations between layers are stored in
+            precision, so weights loaded afterwards are cast once. Layer norms keep float32
+            weights and normalize in float32, and attention logits, softmax and the output
+            logits (see project) are float32 as well.
+            """
+            for layer in self._flatten_layers():
+                if isinstance(layer, tf.keras.layers.LayerNormalization):
+                    layer.dtype_policy = f"mixed_{precision}"
+                else:
+                    layer.dtype_policy = precision
+            for coder in (self.encoder, self.decoder):
+                coder.pos_encoding = tf.cast(coder.pos_encoding, precision)
+        
+        def set_vocab_shortlist(self, token_ids):
+            """Restrict generation to token_ids by projecting onto their final_layer columns only.
+            
+            Call before quantizing: the columns are copied out of the float kernel.
+            Logits keep the full vocabulary layout (other ids get -1e9), so every
+            decoding strategy works unchanged.
+            """
+            token_ids = np.array(sorted(set(token_ids)), dtype=np.int32)
+            self.shortlist_kernel = tf.gather(self.final_layer.kernel, token_ids, axis=1)
+            self.shortlist_bias = tf.gather(self.final_layer.bias, token_ids)
+            # Column of each vocabulary id in the shortlisted logits; -1e9 column for the rest
+            positions = np.full(self.final_layer.units, len(token_ids), dtype=np.int32)
+            positions[token_ids] = np.arange(len(token_ids), dtype=np.int32)
+            self.shortlist_positions = tf.constant(positions)
+        
+        def project(self, dec_output):
+            """final_layer for generation, restricted to the vocabulary shortlist when one is set"""
+            # float32 logits for sampling, beam scores and early-exit confidence at any precision
+            if self.shortlist_kernel is None:
+                return tf.cast(self.final_layer(dec_output), tf.float32)
+            logits = tf.cast(tf.matmul(dec_output, self.shortlist_kernel) + self.shortlist_bias, tf.float32)
+            logits = tf.concat([logits, tf.fill(tf.shape(logits[..., :1]), -1e9)], axis=-1)
+            return tf.gather(logits, self.shortlist_positions, axis=-1)
+        
+        def next_token_logits(self, inp, tar):
+            """Logits for the token after tar, recomputing every position but projecting only the last"""
+            enc_output, enc_padding_mask = self.encode(inp)
+            combined_mask = tf.maximum(create_padding_mask(tar), self._look_ahead_mask(tf.shape(tar)[1]))
+            dec_output = self.decoder(
+                tar, enc_output, training=False, look_ahead_mask=combined_mask, padding_mask=enc_padding_mask
+            )
+            return self.project(dec_output[:, -1:, :])
+        
+        def encode(self, inp):
+            """Run the encoder once per question; returns the output and its padding mask"""
+            enc_padding_mask = create_padding_mask(inp)
+            enc_output = self.encoder(inp, training=False, mask=enc_padding_mask)
+            return enc_output, enc_padding_mask
+        
+        def init_cache(self, enc_output, max_length=None):
+            return self.decoder.init_cache(enc_output, max_length)
+        
+        def decode_step(self, tar, caches, enc_padding_mask, position=None):
+            """Logits for one token of tar, reusing cached keys/values for earlier positions.
+            
+            By default the last token of tar is decoded. With position given, tar is a
+            zero-padded token buffer as long as the preallocated caches; the unwritten
+            tail is padding, so the padding mask doubles as the look-ahead mask.
+            The full-sequence call masks decoder positions that hold padding, so the
+            mask over the cached prefix is rebuilt from tar to give identical results.
+            """
+            fixed_size = position is not None
+            if not fixed_size:
+                position = tf.shape(tar)[1] - 1
+            dec_target_padding_mask = create_padding_mask(tar)
+            dec_output = self.decoder.call_cached(
+                tar[:, position][:, tf.newaxis], caches, position,
+                look_ahead_mask=dec_target_padding_mask, padding_mask=enc_padding_mask,
+                fixed_size=fixed_size
+            )
+            return self.project(dec_output)
+        
+        def encode_for_steps(self, inp):
+            """Encoder pass for step-wise decoding.
+            
+            Returns the padding mask followed by each decoder layer's cross-attention
+            keys and values: the flat layout decode_position and the exported step
+            graphs (serving artifact, ONNX) work with.
+            """
+            enc_output, enc_padding_mask = self.encode(inp)
+            outputs = [enc_padding_mask]
+            for layer in self.decoder.dec_layers:
+                outputs.extend(layer.mha2.compute_kv(enc_output, enc_output))
+            return outputs
+        
+        def decode_position(self, tokens, position, enc_padding_mask, *flat_caches):
+            """Next-token logits for tokens[:, position] over flat fixed-size caches.
+            
+            flat_caches holds enc_k, enc_v, self_k, self_v for each decoder layer (self
+            caches are max_length + 1 long). Returns the (batch, vocab) logits followed
+            by the updated self_k, self_v of each layer.
+            """
+            caches = [
+                dict(zip(("enc_k", "enc_v", "self_k", "self_v"), flat_caches[i:i + 4]))
+                for i in range(0, len(flat_caches), 4)
+            ]
+            predictions = self.decode_step(tokens, caches, enc_padding_mask, position=position)
+            outputs = [predictions[:, -1, :]]
+            for cache in caches:
+                outputs.extend([cache["self_k"], cache["self_v"]])
+            return outputs
+        
+        def decode_block(self, tokens, start, length, enc_padding_mask, *flat_caches):
+            """Logits after each of tokens[:, start:start + length] in a single decoder pass.
+            
+            Same layout as decode_position, but the (batch, length, vocab) logits let
+            speculative decoding check several draft tokens at once. Cache slots past
+            the tokens the caller keeps are overwritten by the next block and masked
+            as padding until then.
+            """
+            caches = [
+                dict(zip(("enc_k", "enc_v", "self_k", "self_v"), flat_caches[i:i + 4]))
+                for i in range(0, len(flat_caches), 4)
+            ]
+            # Unwritten buffer tail is padding; draft tokens inside the buffer need the causal mask
+            causal_mask = tf.cast(
+                tf.range(tf.shape(tokens)[1])[tf.newaxis, :] > (start + tf.range(length))[:, tf.newaxis], tf.float32
+            )
+            look_ahead_mask = tf.maximum(create_padding_mask(tokens), causal_mask)
+            dec_output = self.decoder.call_block(
+                tokens[:, start:start + length], caches, start,
+                look_ahead_mask=look_ahead_mask, padding_mask=enc_padding_mask
+            )
+            outputs = [self.project(dec_output)]
+            for cache in caches:
+                outputs.extend([cache["self_k"], cache["self_v"]])
+            return outputs
+        
+        def _start_buffer(self, batch_size, start_token, max_length):
+            return tf.concat([
+                tf.fill((batch_size, 1), tf.constant(start_token, tf.int32)),
+                tf.zeros((batch_size, max_length), dtype=tf.int32)
+            ], axis=1)
+        
+        def _decode_loop(self, inp, start_token, end_token, max_length, select_fn):
+            """Decode one token per row per step, choosing it with select_fn(logits).
+            
+            Runs as a single tf.while_loop over fixed-shape buffers. Returns a
+            (batch, max_length + 1) token buffer with START at index 0 and zeros
+            after each row's END token (END itself is not written).
+            """
+            batch_size = tf.shape(inp)[0]
+            buffer_length = max_length + 1
+            enc_output, enc_padding_mask = self.encode(inp)
+            caches = self.init_cache(enc_output, buffer_length)
+            tokens = self._start_buffer(batch_size, start_token, max_length)
+            finished = tf.zeros((batch_size,), dtype=tf.bool)
+            
+            def cond(i, tokens, finished, caches):
+                return tf.logical_and(i < max_length, tf.logical_not(tf.reduce_all(finished)))
+            
+            def body(i, tokens, finished, caches):
+                caches = [dict(cache) for cache in caches]
+                predictions = self.decode_step(tokens, caches, enc_padding_mask, position=i)
+                predicted_id = select_fn(predictions[:, -1, :])
+                finished = tf.logical_or(finished, tf.equal(predicted_id, end_token))
+                predicted_id = tf.where(finished, tf.zeros_like(predicted_id), predicted_id)
+                write = tf.equal(tf.range(buffer_length), i + 1)[tf.newaxis, :]
+                tokens = tf.where(write, predicted_id[:, tf.newaxis], tokens)
+                return i + 1, tokens, finished, caches
+            
+            _, tokens, _, _ = tf.while_loop(cond, body, (tf.constant(0), tokens, finished, caches))
+            return tokens
+        
+        def greedy_generate(self, inp, start_token, end_token, max_length):
+            """Greedy (argmax) decoding; see _decode_loop for the output layout"""
+            def select(logits):
+                return tf.argmax(logits, axis=-1, output_type=tf.int32)
+            return self._decode_loop(inp, start_token, end_token, max_length, select)
+        
+        def early_exit_generate(self, inp, start_token, end_token, max_length, threshold=0.9):
+            """Greedy decoding that may stop each step after an intermediate decoder layer.
+            
+            After every decoder layer but the last, the hidden state is projected through
+            the shared final_layer; once the top-1 probability reaches threshold for every
+            unfinished row, that token is taken and the remaining layers are skipped. The
+            skipped layers still need keys/values at this position for later steps, so
+            they are computed from the exit hidden state (state propagation), which costs
+            one key/value projection per skipped layer. Returns the greedy_generate token
+            buffer and a (num_layers,) count of steps that exited after each layer.
+            """
+            batch_size = tf.shape(inp)[0]
+            buffer_length = max_length + 1
+            num_layers = self.decoder.num_layers
+            enc_output, enc_padding_mask = self.encode(inp)
+            caches = self.init_cache(enc_output, buffer_length)
+            tokens = self._start_buffer(batch_size, start_token, max_length)
+            finished = tf.zeros((batch_size,), dtype=tf.bool)
+            exit_counts = tf.zeros((num_layers,), dtype=tf.int32)
+            
+            def cond(i, tokens, finished, caches, exit_counts):
+                return tf.logical_and(i < max_length, tf.logical_not(tf.reduce_all(finished)))
+            
+            def body(i, tokens, finished, caches, exit_counts):
+                caches = [dict(cache) for cache in caches]
+                # Same masks as decode_step with a fixed-size buffer
+                look_ahead_mask = create_padding_mask(tokens)
+                x = self.decoder.embed_position(tokens[:, i][:, tf.newaxis], i)
+                exited = tf.constant(False)
+                exit_layer = tf.constant(num_layers - 1)
+                logits = tf.zeros((batch_size, self.final_layer.units))
+                for l, (layer, cache) in enumerate(zip(self.decoder.dec_layers, caches)):
+                    def run(layer=layer, cache=cache, x=x):
+                        cache = dict(cache)
+                        out = layer.call_cached(x, cache, look_ahead_mask=look_ahead_mask, padding_mask=enc_padding_mask, slot=i)
+                        return out, cache["self_k"], cache["self_v"]
+                    
+                    def skip(layer=layer, cache=cache, x=x):
+                        cache = dict(cache)
+                        layer.write_cache(x, cache, slot=i)
+                        return x, cache["self_k"], cache["self_v"]
+                    
+                    x, cache["self_k"], cache["self_v"] = tf.cond(exited, skip, run) if l else run()
+                    if l == num_layers - 1:
+                        break
+                    
+                    def check(x=x):
+                        step_logits = self.project(x)[:, -1, :]
+                        confident = tf.reduce_max(tf.nn.softmax(step_logits), axis=-1) >= threshold
+                        return step_logits, tf.reduce_all(confident | finished)
+                    
+                    logits, exit_now = tf.cond(exited, lambda: (logits, exited), check)
+                    exit_layer = tf.where(exit_now & tf.logical_not(exited), l, exit_layer)
+                    exited = exit_now
+                logits = tf.cond(exited, lambda: logits, lambda: self.project(x)[:, -1, :])
+                exit_counts += tf.one_hot(exit_layer, num_layers, dtype=tf.int32)
+                
+                predicted_id = tf.argmax(logits, axis=-1, output_type=tf.int32)
+                finished = tf.logical_or(finished, tf.equal(predicted_id, end_token))
+                predicted_id = tf.where(finished, tf.zeros_like(predicted_id), predicted_id)
+                write = tf.equal(tf.range(buffer_length), i + 1)[tf.newaxis, :]
+                tokens = tf.where(write, predicted_id[:, tf.newaxis], tokens)
+                return i + 1, tokens, finished, caches, exit_counts
+            
+            _, tokens, _, _, exit_counts = tf.while_loop(
+                cond, body, (tf.constant(0), tokens, finished, caches, exit_counts)
+            )
+            return tokens, exit_counts
+        
+        @staticmethod
+        def draft_continuation(tokens, position, draft, size):
+            """The size draft tokens after the longest (up to 3 token) suffix of tokens[0, :position + 1] in draft.
+            
+            The first occurrence of the longest matching suffix wins; missing tokens are 0.
+            """
+            draft_length = tf.shape(draft)[0]
+            index = tf.range(draft_length)
+            last_matched = tf.constant(-1)
+            for n in (1, 2, 3):
+                match = index < draft_length - 1  # something must follow the match
+                for j in range(n):
+                    match &= (index >= j) & (position >= j)
+                    match &= tf.equal(tf.gather(draft, tf.maximum(index - j, 0)), tokens[0, tf.maximum(position - j, 0)])
+                last_matched = tf.where(
+                    tf.reduce_any(match), tf.argmax(tf.cast(match, tf.int32), output_type=tf.int32), last_matched
+                )
+            follow = last_matched + 1 + tf.range(size)
+            valid = (last_matched >= 0) & (follow < draft_length)
+            return tf.where(valid, tf.gather(draft, tf.minimum(follow, draft_length - 1)), 0)
+        
+        def speculative_generate(self, inp, draft, start_token, end_token, max_length, draft_length=8):
+            """Greedy decoding of one question that verifies draft tokens in blocks.
+            
+            Each decoder pass covers the last accepted token and up to draft_length draft
+            tokens that follow it in draft (see draft_continuation). Draft tokens the
+            model would have chosen itself are accepted together with the model's own
+            next token, so the output equals greedy_generate in fewer sequential
+            passes. Returns the greedy_generate token buffer for inp of batch size 1
+            and the number of decoder passes.
+            """
+            block_size = draft_length + 1
+            # Room for a full block after the last position generation can reach
+            buffer_length = max_length + 1 + block_size
+            enc_output, enc_padding_mask = self.encode(inp)
+            flat_caches = []
+            for cache in self.init_cache(enc_output, buffer_length):
+                flat_caches += [cache["enc_k"], cache["enc_v"], cache["self_k"], cache["self_v"]]
+            tokens = self._start_buffer(1, start_token, buffer_length - 1)
+            index = tf.range(buffer_length)
+            
+            def cond(position, passes, tokens, finished, flat_caches):
+                return tf.logical_and(position < max_length, tf.logical_not(finished))
+            
+            def body(position, passes, tokens, finished, flat_caches):
+                proposal = self.draft_continuation(tokens, position, draft, draft_length)
+                # Every row costs a full output projection, so the block is only as long as the draft
+                length = tf.reduce_sum(tf.cast(proposal > 0, tf.int32)) + 1
+                offset = index - position - 1
+                in_block = (offset >= 0) & (offset < length - 1)
+                tokens = tf.where(in_block, tf.gather(proposal, tf.clip_by_value(offset, 0, draft_length - 1)), tokens)
+                logits, *self_kv = self.decode_block(tokens, position, length, enc_padding_mask, *flat_caches)
+                predicted = tf.argmax(logits[0], axis=-1, output_type=tf.int32)
+                # Leading draft tokens that match the model's choices, then the model's next token
+                agree = tf.cast(tf.equal(predicted[:-1], proposal[:length - 1]), tf.int32)
+                count = tf.reduce_sum(tf.math.cumprod(agree)) + 1
+                is_end = tf.equal(predicted, end_token) & (tf.range(length) < count)
+                finished = tf.reduce_any(is_end)
+                count = tf.where(finished, tf.argmax(tf.cast(is_end, tf.int32), output_type=tf.int32), count)
+                count = tf.minimum(count, max_length - position)
+                keep = (offset >= 0) & (offset < count)
+                tokens = tf.where(
+                    keep, tf.gather(predicted, tf.clip_by_value(offset, 0, length - 1)), tf.where(offset >= 0, 0, tokens)
+                )
+                new_caches = list(flat_caches)
+                new_caches[2::4] = self_kv[0::2]
+                new_caches[3::4] = self_kv[1::2]
+                return position + count, passes + 1, tokens, finished, new_caches
+            
+            _, passes, tokens, _, _ = tf.while_loop(
+                cond, body, (tf.constant(0), tf.constant(0), tokens, tf.constant(False), flat_caches)
+            )
+            return tokens[:, :max_length + 1], passes
+        
+        def sample_generate(self, inp, start_token, end_token, max_length, top_k=0, top_p=1.0, temperature=1.0):
+            """Top-k and/or nucleus (top-p) sampling; see _decode_loop for the output layout"""
+            def select(logits):
+                logits = logits / temperature
+                if top_k:
+                    kth_logit = tf.math.top_k(logits, k=top_k).values[:, -1:]
+                    logits = tf.where(logits < kth_logit, -1e9, logits)
+                if top_p < 1.0:
+                    # Keep the smallest set of tokens whose probability mass reaches top_p
+                    sorted_logits = tf.sort(logits, axis=-1, direction="DESCENDING")
+                    mass_before = tf.math.cumsum(tf.nn.softmax(sorted_logits), axis=-1, exclusive=True)
+                    cutoff = tf.reduce_min(tf.where(mass_before < top_p, sorted_logits, 1e9), axis=-1, keepdims=True)
+                    logits = tf.where(logits < cutoff, -1e9, logits)
+                return tf.squeeze(tf.random.categorical(logits, 1, dtype=tf.int32), axis=-1)
+            return self._decode_loop(inp, start_token, end_token, max_length, select)
+        
+        def beam_search_generate(self, inp, start_token, end_token, max_length, beam_width=4, length_penalty=0.6):
+            """Beam search with the beams folded into the batch dimension.
+            
+            Each step is one decoder pass over batch * beam_width rows, and all
+            hypothesis scores are updated with vectorized log-prob arithmetic.
+            Finished hypotheses can only be extended by END at no cost, so they keep
+            their score. The best hypothesis per row is chosen with the GNMT length
+            penalty and returned in the same layout as greedy_generate.
+            """
+            batch_size = tf.shape(inp)[0]
+            buffer_length = max_length + 1
+            vocab_size = self.final_layer.units
+            enc_output, enc_padding_mask = self.encode(inp)
+            enc_output = tf.repeat(enc_output, beam_width, axis=0)
+            enc_padding_mask = tf.repeat(enc_padding_mask, beam_width, axis=0)
+            caches = self.init_cache(enc_output, buffer_length)
+            tokens = self._start_buffer(batch_size * beam_width, start_token, max_length)
+            # Only the first beam is live initially so the first step does not pick duplicates
+            scores = tf.tile(tf.constant([[0.0] + [-1e9] * (beam_width - 1)]), (batch_size, 1))
+            finished = tf.zeros((batch_size, beam_width), dtype=tf.bool)
+            lengths = tf.zeros((batch_size, beam_width), dtype=tf.int32)
+            end_only = tf.one_hot(end_token, vocab_size, on_value=0.0, off_value=-1e9)
+            beam_offsets = (tf.range(batch_size) * beam_width)[:, tf.newaxis]
+            
+            def cond(i, tokens, scores, finished, lengths, caches):
+                return tf.logical_and(i < max_length, tf.logical_not(tf.reduce_all(finished)))
+            
+            def body(i, tokens, scores, finished, lengths, caches):
+                caches = [dict(cache) for cache in caches]
+                predictions = self.decode_step(tokens, caches, enc_padding_mask, position=i)
+                log_probs = tf.nn.log_softmax(predictions[:, -1, :], axis=-1)
+                log_probs = tf.reshape(log_probs, (batch_size, beam_width, vocab_size))
+                log_probs = tf.where(finished[:, :, tf.newaxis], end_only, log_probs)
+                candidates = tf.reshape(scores[:, :, tf.newaxis] + log_probs, (batch_size, -1))
+                scores, indices = tf.math.top_k(candidates, k=beam_width)
+                beam_indices = indices // vocab_size
+                predicted_id = indices % vocab_size
+                
+                # Reorder every per-hypothesis buffer to follow its parent beam
+                rows = tf.reshape(beam_offsets + beam_indices, [-1])
+                tokens = tf.gather(tokens, rows)
+                for cache in caches:
+                    cache["self_k"] = tf.gather(cache["self_k"], rows)
+                    cache["self_v"] = tf.gather(cache["self_v"], rows)
+                finished = tf.gather(finished, beam_indices, batch_dims=1)
+                lengths = tf.gather(lengths, beam_indices, batch_dims=1)
+                
+                lengths += tf.cast(tf.logical_not(finished), tf.int32)
+                finished = tf.logical_or(finished, tf.equal(predicted_id, end_token))
+                predicted_id = tf.where(finished, tf.zeros_like(predicted_id), predicted_id)
+                write = tf.equal(tf.range(buffer_length), i + 1)[tf.newaxis, :]
+                tokens = tf.where(write, tf.reshape(predicted_id, (-1, 1)), tokens)
+                return i + 1, tokens, scores, finished, lengths, caches
+            
+            _, tokens, scores, _, lengths, _ = tf.while_loop(
+                cond, body, (tf.constant(0), tokens, scores, finished, lengths, caches)
+            )
+            penalty = tf.pow((5.0 + tf.cast(lengths, tf.float32)) / 6.0, length_penalty)
+            best = tf.argmax(scores / penalty, axis=-1, output_type=tf.int32)
+            tokens = tf.reshape(tokens, (batch_size, beam_width, buffer_length))
+            return tf.gather(tokens, best, batch_dims=1)
+    
+    def decoding_step_signatures(config, dtype=tf.float32):
+        """Input signatures of Transformer.encode_for_steps and Transformer.decode_position (caches in dtype)"""
+        max_length = config["max_length"]
+        num_heads = config["num_heads"]
+        depth = config["d_model"] // num_heads
+        encoder_signature = [tf.TensorSpec((None, max_length), tf.int32, name="encoder_input")]
+        cache_signature = []
+        for i in range(config["num_layers"]):
+            cache_signature += [
+                tf.TensorSpec((None, num_heads, max_length, depth), dtype, name=f"enc_k_{i}"),
+                tf.TensorSpec((None, num_heads, max_length, depth), dtype, name=f"enc_v_{i}"),
+                tf.TensorSpec((None, num_heads, max_length + 1, depth), dtype, name=f"self_k_{i}"),
+                tf.TensorSpec((None, num_heads, max_length + 1, depth), dtype, name=f"self_v_{i}"),
+            ]
+        decoder_signature = [
+            tf.TensorSpec((None, max_length + 1), tf.int32, name="tokens"),
+            tf.TensorSpec((), tf.int32, name="position"),
+            tf.TensorSpec((None, 1, 1, max_length), tf.float32, name="enc_padding_mask"),
+        ] + cache_signature
+        return encoder_signature, decoder_signature
+
+
+class CancellationToken:
+    """Cooperative cancellation for one chatbot request.
+    
+    Any thread may call cancel(); decoding checks the token between decode steps
+    and stops with the tokens generated so far.
+    """
+    
+    def __init__(self):
+        self._event = threading.Event()
+    
+    def cancel(self):
+        self._event.set()
+    
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class ChatMicroBatcher:
+    """Coalesce concurrent single-message requests into batched calls.
+    
+    A worker thread takes the first queued message, waits up to max_wait_ms for
+    more (never past max_batch_size), answers them with one batch_fn(messages)
+    call and hands each caller its own answer. A lone request costs at most
+    max_wait_ms extra. Callers wait at most timeout seconds for their answer.
+    """
+    
+    # Seconds between checks that the worker thread is still running while a caller waits
+    _POLL_SECONDS = 0.5
+    
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=5.0, timeout=60.0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self.batch_sizes = []  # size of every dispatched batch, for monitoring
+        self._closed = False
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="chat-micro-batcher", daemon=True)
+        self._thread.start()
+    
+    def submit(self, message, timeout=None):
+        """Queue message and block until its answer is ready.
+        
+        Raises RuntimeError if the batcher is closed or its worker thread has
+        stopped, and TimeoutError after timeout seconds (defaults to self.timeout,
+        None waits indefinitely).
+        """
+        if self._closed:
+            raise RuntimeError("The micro-batcher is closed")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        request = {"message": message, "done": threading.Event(), "response": None, "error": None}
+        self._queue.put(request)
+        while True:
+            wait = self._POLL_SECONDS if deadline is None else min(self._POLL_SECONDS, deadline - time.monotonic())
+            if request["done"].wait(max(wait, 0)):
+                break
+            # Requests queued behind close() or a crashed worker would never be answered
+            if not self._thread.is_alive():
+                raise RuntimeError("The micro-batcher has stopped")
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"No answer from the micro-batcher within {timeout:g} seconds")
+        if request["error"] is not None:
+            raise request["error"]
+        return request["response"]
+    
+    def close(self):
+        """Stop the worker thread once the requests queued so far are answered"""
+        self._closed = True
+        self._queue.put(None)
+    
+    def _run(self):
+        closed = False
+        while not closed:
+            batch = [self._queue.get()]
+            if batch[0] is None:
+                return
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    closed = True
+                    break
+                batch.append(request)
+            try:
+                responses = self.batch_fn([request["message"] for request in batch])
+            except Exception as e:
+                responses = [None] * len(batch)
+                for request in batch:
+                    request["error"] = e
+            self.batch_sizes.append(len(batch))
+            for request, response in zip(batch, responses):
+                request["response"] = response
+                request["done"].set()
 
 
 class BuffettChatbot:
     """Warren Buffett Investment Advisor Chatbot"""
     
-    def __init__(self, model_dir):
+    DECODING_STRATEGIES = ("greedy", "beam", "top_k", "top_p")
+    BACKENDS = ("auto", "tensorflow", "numpy", "onnx")
+    QUANTIZATION_MODES = ("int8",)
+    PRECISIONS = ("float32", "bfloat16")
+    
+    def __init__(self, model_dir, use_kv_cache=True, compile_generation=True, jit_compile=False,
+                 decoding="greedy", beam_width=4, length_penalty=0.6, top_k=40, top_p=0.9, temperature=1.0,
+                 backend=None, quantize=None, precision="float32", use_serving_artifact=True, onnx_threads=0, onnx_inter_op_threads=0,
+                 optimize_for_inference=True, vocab_shortlist=False, max_batch_size=1, max_wait_ms=5.0,
+                 response_cache_size=256, persist_response_cache=True, retrieval_threshold=0.85,
+                 speculative_decoding=False, draft_length=8, early_exit_threshold=None, generation_timeout=None):
+        if decoding not in self.DECODING_STRATEGIES:
+            raise ValueError(f"Unknown decoding strategy '{decoding}', expected one of {self.DECODING_STRATEGIES}")
+        backend = backend or CHATBOT_BACKEND
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {self.BACKENDS}")
+        if backend == "auto":
+            backend = "tensorflow" if TF_AVAILABLE else "numpy"
+        if backend in ("numpy", "onnx") and decoding != "greedy":
+            raise ValueError(f"The {backend} backend only supports greedy decoding")
+        if quantize is not None and quantize not in self.QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{quantize}', expected one of {self.QUANTIZATION_MODES}")
+        if backend != "tensorflow" and quantize:
+            raise ValueError("Quantized inference requires the TensorFlow backend")
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {self.PRECISIONS}")
+        if precision != "float32" and (backend != "tensorflow" or quantize):
+            raise ValueError(f"{precision} inference requires the TensorFlow backend without quantization")
+        if backend != "tensorflow" and vocab_shortlist:
+            raise ValueError("The vocabulary shortlist requires the TensorFlow backend")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if speculative_decoding and (backend != "tensorflow" or decoding != "greedy"):
+            raise ValueError("Speculative decoding requires the TensorFlow backend and greedy decoding")
+        if early_exit_threshold is not None and (backend != "tensorflow" or decoding != "greedy" or speculative_decoding):
+            raise ValueError("Early exit requires the TensorFlow backend and greedy decoding without speculative decoding")
+        self.backend = backend
+        self.quantize = quantize
+        self.precision = precision
+        self.use_serving_artifact = use_serving_artifact
+        self.optimize_for_inference = optimize_for_inference
+        self.vocab_shortlist = vocab_shortlist
+        # Applies to answers decoded as a whole: chat(), chat_batch() and micro-batched requests
+        # without a deadline or cancel token (speculative drafts are per question, so batches are
+        # answered one by one). Streamed answers (chat_stream, the Streamlit UI) and answers with a
+        # deadline decode step by step with plain greedy decoding, which gives the same tokens.
+        self.speculative_decoding = speculative_decoding
+        self.draft_length = draft_length
+        # Counters over all speculatively decoded answers
+        self.speculative_stats = {"answers": 0, "tokens": 0, "decoder_calls": 0}
+        self.early_exit_threshold = early_exit_threshold
+        # Decode steps that exited after each decoder layer (see Transformer.early_exit_generate)
+        self._exit_counts = None
+        # Default per-request deadline in seconds (None = no deadline), see chat()
+        self.generation_timeout = generation_timeout
+        # Outcomes of requests decoded with a deadline or cancellation token, and the
+        # decode steps spent on the ones that were cut short
+        self._generation_stats = {"completed": 0, "expired": 0, "cancelled": 0, "expired_steps": 0, "cancelled_steps": 0}
+        self._generation_stats_lock = threading.Lock()
+        self.onnx_threads = onnx_threads
+        self.onnx_inter_op_threads = onnx_inter_op_threads
+        # A versioned MODEL_DIR is read from its current version (see resolve_model_dir)
+        model_dir = resolve_model_dir(model_dir)
         self.model_dir = model_dir
+        self.use_kv_cache = use_kv_cache
+        self.compile_generation = compile_generation
+        self.jit_compile = jit_compile
+        self.decoding = decoding
+        self.beam_width = beam_width
+        self.length_penalty = length_penalty
+        self.top_k = top_k
+        self.top_p = top_p
+        self.temperature = temperature
+        self._generate_fn = None
+        self._step_fns = None
+        self._speculative_fn = None
+        self._serving_module = None
         self.model = None
         self.tokenizer = None
         self.config = None
         self.loaded = False
         self._load_model()
+        # With max_batch_size > 1, concurrent chat() calls without a timeout or cancel token
+        # share batched decodes. Only chatbot_server.py (--max-batch-size) turns this on: the
+        # Streamlit UI streams each answer with a timeout (chat_stream), which is never batched.
+        self._batcher = None
+        if self.loaded and max_batch_size > 1:
+            self._batcher = ChatMicroBatcher(self._answer_batch, max_batch_size, max_wait_ms)
+        # Sampling is not deterministic, so only greedy and beam search answers are cached
+        self.response_cache = None
+        if self.loaded and response_cache_size > 0 and decoding in ("greedy", "beam"):
+            self.response_cache = ResponseCache(
+                self._model_version(), max_entries=response_cache_size,
+                path=os.path.join(model_dir, RESPONSE_CACHE_FILE) if persist_response_cache else None
+            )
+        # Near-duplicates of training questions get the curated answer (see build_retrieval_index.py);
+        # retrieval_threshold=None always decodes. Speculative decoding drafts from the same index.
+        self.retrieval_threshold = retrieval_threshold
+        self.retrieval_index = None
+        if self.loaded and (retrieval_threshold is not None or speculative_decoding):
+            self.retrieval_index = RetrievalIndex.load(model_dir)
+            if self.retrieval_index is None and speculative_decoding:
+                print("Retrieval index not found, run build_retrieval_index.py; speculative decoding has no drafts")
     
     def _load_model(self):
         """Load the trained model and tokenizer"""
-        if not TF_AVAILABLE:
+        if self.backend == "tensorflow" and not TF_AVAILABLE:
+            return
+        if self.backend == "numpy" and not NUMPY_BACKEND_AVAILABLE:
+            return
+        if self.backend == "onnx" and not ONNX_BACKEND_AVAILABLE:
             return
         
         try:
@@ -314,6 +1170,31 @@ class BuffettChatbot:
             if not os.path.exists(weights_path):
                 return
             
+            if self.backend == "numpy":
+                self.model = NumpyTransformer.load(weights_path, self.config)
+                self.loaded = True
+                return
+            
+            if self.backend == "onnx":
+                onnx_dir = os.path.join(self.model_dir, ONNX_DIR)
+                if not self._artifact_is_current(onnx_dir, weights_path):
+                    print("ONNX graphs missing or stale, run export_onnx_model.py")
+                    return
+                self.model = OnnxTransformer.load(
+                    onnx_dir, self.config,
+                    intra_op_threads=self.onnx_threads, inter_op_threads=self.onnx_inter_op_threads
+                )
+                self.loaded = True
+                return
+            
+            # The exported artifact is a compiled greedy graph, so only use it in that configuration
+            if (self.use_serving_artifact and self.compile_generation and self.decoding == "greedy"
+                    and not self.quantize and self.precision == "float32" and not self.vocab_shortlist and not self.speculative_decoding
+                    and self.early_exit_threshold is None
+                    and self._load_serving_artifact(weights_path)):
+                self.loaded = True
+                return
+            
             # Rebuild model architecture from config
             vocab_size = self.config["vocab_size"]
             num_layers = self.config["num_layers"]
@@ -334,6 +1215,9 @@ class BuffettChatbot:
                 pe_target=vocab_size,
                 rate=dropout
             )
+            if self.precision != "float32":
+                # Before building, so the weights are created (and loaded) in reduced precision
+                self.model.set_precision(self.precision)
             
             # Build model by calling it once
             sample_input = (tf.zeros((1, max_length), dtype=tf.int32), tf.zeros((1, max_length-1), dtype=tf.int32))
@@ -341,6 +1225,23 @@ class BuffettChatbot:
             
             # Load weights
             self.model.load_weights(weights_path)
+            if self.optimize_for_inference:
+                self.model.optimize_for_inference(max_length)
+            if self.vocab_shortlist:
+                self._load_vocab_shortlist()
+            if self.quantize:
+                # Weight-only: per-output-channel int8 Dense kernels with float32 scales, multiplied
+                # with the float32 activations. Embeddings, the shortlist kernel, layer norms and
+                # softmax stay in float32
+                config = tf.keras.quantizers.Int8QuantizationConfig(activation_quantizer=None)
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")  # Dropout/LayerNormalization have no quantized form
+                    self.model.quantize(config=config,
+                                        filters=lambda layer: isinstance(layer, tf.keras.layers.Dense))
+            if self.early_exit_threshold is not None:
+                self._exit_counts = tf.Variable(tf.zeros((num_layers,), dtype=tf.int32), trainable=False)
+            if self.compile_generation:
+                self._generate_fn = self._build_generate_fn()
             self.loaded = True
             
         except Exception as e:
@@ -350,25 +1251,206 @@ class BuffettChatbot:
     def is_loaded(self):
         return self.loaded
     
+    def close(self):
+        """Unload the model: stop the micro-batcher, close the response cache and drop the weights.
+        
+        Only call this once no request is using the chatbot (see ChatbotHotSwap).
+        """
+        self.loaded = False
+        if self._batcher is not None:
+            self._batcher.close()
+            self._batcher = None
+        if self.response_cache is not None:
+            self.response_cache.close()
+            self.response_cache = None
+        self.retrieval_index = None
+        self.model = None
+        self._serving_module = None
+        self._generate_fn = None
+        self._step_fns = None
+        self._speculative_fn = None
+    
+    @staticmethod
+    def _artifact_is_current(artifact_dir, weights_path):
+        """Whether an exported artifact exists and was built from the current weights"""
+        stamp_path = os.path.join(artifact_dir, SERVING_WEIGHTS_STAMP)
+        if not os.path.exists(stamp_path):
+            return False
+        with open(stamp_path, 'r') as f:
+            return f.read().strip() == file_sha256_cached(weights_path)
+    
+    def _load_vocab_shortlist(self):
+        """Restrict the model's output layer to the precomputed answer vocabulary, if present"""
+        shortlist_path = os.path.join(self.model_dir, VOCAB_SHORTLIST_FILE)
+        if not os.path.exists(shortlist_path):
+            print("Vocabulary shortlist not found, run build_vocab_shortlist.py; using the full vocabulary")
+            return
+        with open(shortlist_path, 'r') as f:
+            token_ids = json.load(f)["token_ids"]
+        # The end token must always be reachable or generation never stops early
+        self.model.set_vocab_shortlist(token_ids + [self.config["end_token"]])
+    
+    def _load_serving_artifact(self, weights_path):
+        """Load the exported generate graph if it was built from the current weights"""
+        serving_dir = os.path.join(self.model_dir, SERVING_DIR)
+        if not self._artifact_is_current(serving_dir, weights_path):
+            if os.path.isdir(serving_dir):
+                print("Serving artifact is stale (weights changed), rebuilding the model instead")
+            return False
+        self._serving_module = tf.saved_model.load(serving_dir)
+        self._generate_fn = self._serving_module.generate
+        return True
+    
+    def _generate(self, encoder_input):
+        """Run the configured decoding strategy over an encoder input batch"""
+        start_token = self.config["start_token"]
+        end_token = self.config["end_token"]
+        max_length = self.config["max_length"]
+        
+        if self.decoding == "beam":
+            return self.model.beam_search_generate(
+                encoder_input, start_token, end_token, max_length,
+                beam_width=self.beam_width, length_penalty=self.length_penalty
+            )
+        if self.decoding in ("top_k", "top_p"):
+            return self.model.sample_generate(
+                encoder_input, start_token, end_token, max_length,
+                top_k=self.top_k if self.decoding == "top_k" else 0,
+                top_p=self.top_p if self.decoding == "top_p" else 1.0,
+                temperature=self.temperature
+            )
+        if self.early_exit_threshold is not None:
+            tokens, exit_counts = self.model.early_exit_generate(
+                encoder_input, start_token, end_token, max_length, threshold=self.early_exit_threshold
+            )
+            self._exit_counts.assign_add(exit_counts)
+            return tokens
+        return self.model.greedy_generate(encoder_input, start_token, end_token, max_length)
+    
+    def early_exit_stats(self):
+        """Decode steps that exited after each decoder layer and the mean decoder layers run per step"""
+        if self._exit_counts is None:
+            return None
+        counts = self._exit_counts.numpy()
+        steps = int(counts.sum())
+        layers = float(np.dot(counts, np.arange(1, len(counts) + 1)))
+        return {
+            "steps": steps,
+            "exits_per_layer": counts.tolist(),
+            "layers_per_step": layers / steps if steps else float(len(counts)),
+        }
+    
+    def _step_functions(self):
+        """(encode, decode_step) for step-wise greedy decoding on TensorFlow, built once.
+        
+        Returns None for serving artifacts exported without the step functions.
+        """
+        if self._step_fns is None:
+            if self._serving_module is not None:
+                if not hasattr(self._serving_module, "decode_step"):
+                    return None
+                self._step_fns = (self._serving_module.encode, self._serving_module.decode_step)
+            elif self.compile_generation:
+                encoder_signature, decoder_signature = decoding_step_signatures(self.config, self.precision)
+                self._step_fns = (
+                    tf.function(self.model.encode_for_steps, input_signature=encoder_signature, jit_compile=self.jit_compile),
+                    tf.function(self.model.decode_position, input_signature=decoder_signature, jit_compile=self.jit_compile)
+                )
+            else:
+                self._step_fns = (self.model.encode_for_steps, self.model.decode_position)
+        return self._step_fns
+    
+    def _greedy_steps(self, encoder_input):
+        """Yield the greedy token ids of each decode step, like NumpyTransformer.greedy_steps"""
+        start_token = self.config["start_token"]
+        end_token = self.config["end_token"]
+        max_length = self.config["max_length"]
+        if self.backend in ("numpy", "onnx"):
+            yield from self.model.greedy_steps(encoder_input, start_token, end_token, max_length)
+            return
+        
+        encode, decode_step = self._step_functions()
+        batch_size = len(encoder_input)
+        num_heads = self.config["num_heads"]
+        depth = self.config["d_model"] // num_heads
+        enc_padding_mask, *enc_kv = encode(tf.constant(encoder_input))
+        self_kv = [tf.zeros((batch_size, num_heads, max_length + 1, depth), dtype=enc_kv[0].dtype)] * len(enc_kv)
+        tokens = np.zeros((batch_size, max_length + 1), dtype=np.int32)
+        tokens[:, 0] = start_token
+        finished = np.zeros(batch_size, dtype=bool)
+        
+        for i in range(max_length):
+            caches = []
+            for layer in range(len(enc_kv) // 2):
+                caches += enc_kv[2 * layer:2 * layer + 2] + self_kv[2 * layer:2 * layer + 2]
+            logits, *self_kv = decode_step(tf.constant(tokens), tf.constant(i), enc_padding_mask, *caches)
+            predicted_id = np.argmax(logits, axis=-1).astype(np.int32)
+            finished |= predicted_id == end_token
+            tokens[:, i + 1] = np.where(finished, 0, predicted_id)
+            yield tokens[:, i + 1]
+            if finished.all():
+                break
+    
+    def _build_generate_fn(self):
+        """Compile the whole decode loop into one (optionally XLA) graph"""
+        return tf.function(
+            self._generate,
+            input_signature=[tf.TensorSpec((None, self.config["max_length"]), tf.int32)],
+            jit_compile=self.jit_compile
+        )
+    
+    def _encode_inputs(self, sentences):
+        """Preprocess, tokenize and pad raw messages into one encoder input batch"""
+        encoder_input, _ = self.tokenizer.encode_batch(
+            [preprocess_sentence_chatbot(sentence) for sentence in sentences],
+            self.config["max_length"], self.config["start_token"], self.config["end_token"]
+        )
+        return encoder_input
+    
+    def _evaluate_batch(self, sentences):
+        """Greedy-decode several messages in lockstep; returns a (batch, max_length + 1) token buffer"""
+        encoder_input = self._encode_inputs(sentences)
+        if self.backend in ("numpy", "onnx"):
+            return self.model.greedy_generate(
+                encoder_input, self.config["start_token"], self.config["end_token"], self.config["max_length"]
+            )
+        if self._generate_fn is not None:
+            return self._generate_fn(encoder_input)
+        return self._generate(encoder_input)
+    
     def _evaluate(self, sentence):
-        sentence = preprocess_sentence_chatbot(sentence)
         START_TOKEN = self.config["start_token"]
         END_TOKEN = self.config["end_token"]
         MAX_LENGTH = self.config["max_length"]
         
-        # Tokenize and pad input
-        sentence_tok = [START_TOKEN] + self.tokenizer.encode(sentence) + [END_TOKEN]
-        sentence_tok = tf.keras.preprocessing.sequence.pad_sequences([sentence_tok], maxlen=MAX_LENGTH, padding="post")
-        encoder_input = tf.cast(sentence_tok, tf.int32)
+        if self.backend in ("numpy", "onnx"):
+            return self._evaluate_batch([sentence])[0]
+        if self.speculative_decoding:
+            return self._speculative_evaluate(sentence)
+        
+        encoder_input = tf.constant(self._encode_inputs([sentence]))
+        
+        if self._generate_fn is not None:
+            # Runs entirely in the graph; the caller fetches the tokens in one transfer
+            return self._generate_fn(encoder_input)[0]
+        if self.decoding != "greedy" or self.early_exit_threshold is not None:
+            return self._generate(encoder_input)[0]
         
         # Start with START token
         decoder_input = [START_TOKEN]
         output = tf.expand_dims(decoder_input, 0)
         output = tf.cast(output, tf.int32)
         
+        if self.use_kv_cache:
+            # Encode once and only feed the newest token to the decoder each step
+            enc_output, enc_padding_mask = self.model.encode(encoder_input)
+            caches = self.model.init_cache(enc_output)
+        
         for i in range(MAX_LENGTH):
-            predictions = self.model((encoder_input, output), training=False)
-            predictions = predictions[:, -1:, :]
+            if self.use_kv_cache:
+                predictions = self.model.decode_step(output, caches, enc_padding_mask)
+            else:
+                predictions = self.model.next_token_logits(encoder_input, output)
             predicted_id = tf.argmax(predictions, axis=-1, output_type=tf.int32)
             predicted_id_val = int(predicted_id.numpy()[0][0])
             
@@ -379,23 +1461,588 @@ class BuffettChatbot:
         
         return tf.squeeze(output, axis=0)
     
-    def chat(self, message):
+    def _draft_tokens(self, sentence, neighbours=4):
+        """Draft for speculative decoding: the answers of the nearest training questions as START ... END runs.
+        
+        Several answers give the suffix matching in Transformer.draft_continuation a
+        chance to pick up whichever of them the model is actually reproducing.
+        """
+        if self.retrieval_index is None:
+            return []
+        scores = self.retrieval_index.scores(preprocess_sentence_chatbot(sentence))
+        answer_ids = []
+        for best in np.argsort(-scores):
+            if scores[best] == 0 or len(answer_ids) == neighbours:
+                break
+            if self.retrieval_index.answer_ids[best] not in answer_ids:
+                answer_ids.append(self.retrieval_index.answer_ids[best])
+        draft = []
+        for answer_id in answer_ids:
+            answer = preprocess_sentence_chatbot(self.retrieval_index.answers[answer_id])
+            draft += [self.config["start_token"]] + self.tokenizer.encode(answer) + [self.config["end_token"]]
+        return draft
+    
+    def _speculative_evaluate(self, sentence):
+        """Greedy decoding with the nearest training answer as the draft (see Transformer.speculative_generate)"""
+        draft = self._draft_tokens(sentence)
+        encoder_input = tf.constant(self._encode_inputs([sentence]))
+        if not draft:
+            return (self._generate_fn or self._generate)(encoder_input)[0]
+        if self._speculative_fn is None:
+            def speculative_generate(encoder_input, draft):
+                return self.model.speculative_generate(
+                    encoder_input, draft, self.config["start_token"], self.config["end_token"],
+                    self.config["max_length"], draft_length=self.draft_length
+                )
+            self._speculative_fn = speculative_generate
+            if self.compile_generation:
+                self._speculative_fn = tf.function(speculative_generate, input_signature=[
+                    tf.TensorSpec((1, self.config["max_length"]), tf.int32), tf.TensorSpec((None,), tf.int32)
+                ], jit_compile=self.jit_compile)
+        tokens, passes = self._speculative_fn(encoder_input, tf.constant(draft, dtype=tf.int32))
+        tokens = tokens[0]
+        self.speculative_stats["answers"] += 1
+        self.speculative_stats["tokens"] += int(tf.math.count_nonzero(tokens)) - 1
+        self.speculative_stats["decoder_calls"] += int(passes)
+        return tokens
+    
+    def _decode_response(self, prediction):
+        return self._decode_responses(np.asarray(prediction, dtype=np.int32).reshape(1, -1))[0]
+    
+    def _decode_responses(self, predictions):
+        """Answers of every row of a (batch, length) token buffer"""
+        return [response if response else "I'm not sure how to respond to that."
+                for response in self.tokenizer.decode_batch(predictions)]
+    
+    def _model_version(self):
+        """Hash of the weights and config: cached answers are only valid for this model"""
+        digest = hashlib.sha256(file_sha256_cached(os.path.join(self.model_dir, "transformer_weights.weights.h5")).encode())
+        with open(os.path.join(self.model_dir, "config.json"), 'rb') as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+    
+    def _cache_key(self, message):
+        # Settings that change the generated tokens are part of the key
+        settings = (
+            self.backend, self.decoding, self.beam_width, self.length_penalty, self.quantize, self.vocab_shortlist,
+            self.early_exit_threshold, self.precision
+        )
+        return f"{settings}|{preprocess_sentence_chatbot(message)}"
+    
+    def _retrieved_response(self, message):
+        """Curated training answer if message closely matches a training question, else None"""
+        if self.retrieval_index is None or self.retrieval_threshold is None:
+            return None
+        return self.retrieval_index.lookup(preprocess_sentence_chatbot(message), self.retrieval_threshold)
+    
+    def _cached_response(self, message):
+        if self.response_cache is None:
+            return None
+        return self.response_cache.get(self._cache_key(message))
+    
+    def _cache_response(self, message, response):
+        if self.response_cache is not None:
+            self.response_cache.put(self._cache_key(message), response)
+    
+    def _answer(self, message):
+        """Decode one answer, bypassing the response cache"""
+        return self._decode_response(np.asarray(self._evaluate(message)))
+    
+    def _answer_batch(self, messages):
+        """Decode several answers in one batch, bypassing the response cache"""
+        if self.speculative_decoding:
+            return [self._answer(message) for message in messages]
+        return self._decode_responses(self._evaluate_batch(messages))
+    
+    def _decodes_in_steps(self):
+        """Whether answers can be decoded step by step in Python (greedy_steps), which streaming,
+        deadlines and cancellation need"""
+        # Early exit changes the answer, so it is not replaced by full-depth steps
+        return (self.decoding == "greedy" and self.early_exit_threshold is None
+                and (self.backend != "tensorflow" or self._step_functions() is not None))
+    
+    def _deadline(self, timeout):
+        """time.monotonic() deadline for a request; timeout defaults to generation_timeout"""
+        timeout = self.generation_timeout if timeout is None else timeout
+        return None if timeout is None else time.monotonic() + timeout
+    
+    @staticmethod
+    def _stop_reason(deadline, cancel_token):
+        if cancel_token is not None and cancel_token.cancelled:
+            return "cancelled"
+        if deadline is not None and time.monotonic() >= deadline:
+            return "expired"
+        return None
+    
+    def _record_generation(self, outcome, steps=0):
+        with self._generation_stats_lock:
+            self._generation_stats[outcome] += 1
+            if outcome != "completed":
+                self._generation_stats[f"{outcome}_steps"] += steps
+    
+    def generation_stats(self):
+        """Outcomes of requests decoded with a deadline or cancellation token.
+        
+        completed/expired/cancelled count requests; expired_steps/cancelled_steps are
+        the decode steps the cut-short requests ran before stopping.
+        """
+        with self._generation_stats_lock:
+            return dict(self._generation_stats)
+    
+    def _interruptible_steps(self, messages, deadline=None, cancel_token=None):
+        """Yield each greedy decode step's tokens for messages, like _greedy_steps.
+        
+        Between steps the deadline and cancel_token are checked and decoding stops
+        early if either has tripped; closing the generator counts as cancellation.
+        Returns the outcome: "completed", "expired" or "cancelled". Requests with a
+        deadline or token are recorded in generation_stats.
+        """
+        tracked = deadline is not None or cancel_token is not None
+        max_length = self.config["max_length"]
+        outcome = self._stop_reason(deadline, cancel_token)
+        steps = 0
+        if outcome is None:
+            stepper = self._greedy_steps(self._encode_inputs(messages))
+            try:
+                for step_tokens in stepper:
+                    steps += 1
+                    yield step_tokens
+                    # All-zero tokens: every row has emitted END, so there is nothing left to stop
+                    if step_tokens.any() and steps < max_length:
+                        outcome = self._stop_reason(deadline, cancel_token)
+                        if outcome is not None:
+                            break
+            except GeneratorExit:
+                if tracked:
+                    self._record_generation("cancelled", steps)
+                raise
+            finally:
+                stepper.close()
+        outcome = outcome or "completed"
+        if tracked:
+            self._record_generation(outcome, steps)
+        return outcome
+    
+    def _answer_within(self, messages, deadline, cancel_token):
+        """Decode answers for messages, stopping between decode steps at the deadline or on cancellation.
+        
+        Returns the answers (partial if cut short) and the outcome. Decoding that runs
+        as a single graph (beam search, sampling, early exit) can only be stopped
+        before it starts.
+        """
+        if not self._decodes_in_steps():
+            outcome = self._stop_reason(deadline, cancel_token)
+            answers = self._answer_batch(messages) if outcome is None else [self._decode_response([])] * len(messages)
+            self._record_generation(outcome or "completed")
+            return answers, outcome or "completed"
+        columns = []
+        steps = self._interruptible_steps(messages, deadline, cancel_token)
+        while True:
+            try:
+                columns.append(next(steps))
+            except StopIteration as stop:
+                outcome = stop.value
+                break
+        predictions = np.stack(columns, axis=1) if columns else np.zeros((len(messages), 0), dtype=np.int32)
+        return self._decode_responses(predictions), outcome
+    
+    def _stream_answer(self, message, deadline=None, cancel_token=None):
+        """Yield the detokenized answer one token at a time, bypassing the response cache.
+        
+        Returns (outcome, answer); see _interruptible_steps for deadlines and cancellation.
+        """
+        if not self._decodes_in_steps():
+            if deadline is None and cancel_token is None:
+                answer, outcome = self._answer(message), "completed"
+            else:
+                (answer,), outcome = self._answer_within([message], deadline, cancel_token)
+            yield answer
+            return outcome, answer
+        pieces = []
+        steps = self._interruptible_steps([message], deadline, cancel_token)
+        try:
+            while True:
+                try:
+                    token = int(next(steps)[0])
+                except StopIteration as stop:
+                    outcome = stop.value
+                    break
+                word = self.tokenizer.decode([token]) if token < self.tokenizer.vocab_size else ""
+                if word:
+                    pieces.append(word if not pieces else " " + word)
+                    yield pieces[-1]
+        finally:
+            steps.close()
+        if not pieces:
+            pieces.append("I'm not sure how to respond to that.")
+            yield pieces[0]
+        return outcome, "".join(pieces)
+    
+    def warm_up(self, questions):
+        """Run questions through the uncached generation paths so graphs are traced up front"""
+        for question in questions:
+            self._answer(question)
+            "".join(self._stream_answer(question))
+    
+    def chat(self, message, timeout=None, cancel_token=None):
+        """Answer message from retrieval, the response cache or by decoding.
+        
+        With a timeout in seconds (defaults to generation_timeout) or a
+        CancellationToken, decoding is checked between steps and stops early with
+        the partial answer, which is returned but not cached. Such requests bypass
+        the micro-batcher.
+        """
         if not self.loaded:
             return None
+        response = self._retrieved_response(message) or self._cached_response(message)
+        if response is not None:
+            return response
+        deadline = self._deadline(timeout)
         try:
-            prediction = self._evaluate(message)
-            response = self.tokenizer.decode(
-                [i for i in prediction.numpy() if i < self.tokenizer.vocab_size]
-            )
-            return response if response else "I'm not sure how to respond to that."
+            if deadline is not None or cancel_token is not None:
+                (response,), outcome = self._answer_within([message], deadline, cancel_token)
+                if outcome != "completed":
+                    return response
+            elif self._batcher is not None:
+                response = self._batcher.submit(message)
+            else:
+                response = self._answer(message)
         except Exception as e:
             return f"Error: {str(e)}"
+        self._cache_response(message, response)
+        return response
+    
+    def chat_stream(self, message, timeout=None, cancel_token=None):
+        """Yield the answer to message as detokenized text, one token at a time.
+        
+        Only greedy decoding is streamed token by token; other decoding strategies,
+        serving artifacts exported without step functions, retrieved and cached
+        answers yield the whole answer at once. timeout and cancel_token work as in
+        chat(): the stream ends early with the answer so far. Closing the generator
+        (e.g. an abandoned Streamlit run) also stops decoding. Streaming does not
+        use speculative decoding; its greedy steps give the same answer.
+        """
+        if not self.loaded:
+            return
+        response = self._retrieved_response(message) or self._cached_response(message)
+        if response is not None:
+            yield response
+            return
+        try:
+            outcome, response = yield from self._stream_answer(message, self._deadline(timeout), cancel_token)
+        except Exception as e:
+            yield f"Error: {str(e)}"
+            return
+        if outcome == "completed":
+            self._cache_response(message, response)
+    
+    def chat_batch(self, messages, timeout=None, cancel_token=None):
+        """Answer several messages at once, sharing one forward pass per decode step.
+        
+        Rows that have emitted the end token are masked out while the rest keep
+        decoding. Retrieved and cached answers are not decoded. timeout and
+        cancel_token apply to the whole batch, as in chat(). Returns one answer per
+        message, in order.
+        """
+        if not self.loaded:
+            return [None] * len(messages)
+        if not messages:
+            return []
+        responses = [self._retrieved_response(message) or self._cached_response(message) for message in messages]
+        missing = [i for i, response in enumerate(responses) if response is None]
+        if missing:
+            deadline = self._deadline(timeout)
+            try:
+                if deadline is not None or cancel_token is not None:
+                    answers, outcome = self._answer_within([messages[i] for i in missing], deadline, cancel_token)
+                else:
+                    answers, outcome = self._answer_batch([messages[i] for i in missing]), "completed"
+            except Exception as e:
+                answers = [f"Error: {str(e)}"] * len(missing)
+            else:
+                if outcome == "completed":
+                    for i, answer in zip(missing, answers):
+                        self._cache_response(messages[i], answer)
+            for i, answer in zip(missing, answers):
+                responses[i] = answer
+        return responses
+
+
+class RemoteChatbot:
+    """Thin client for chatbot_server.py with the BuffettChatbot interface the UI uses.
+    
+    The server process owns the only copy of the model, so UI workers in remote mode
+    import neither TensorFlow nor the weights.
+    """
+    
+    def __init__(self, server_url=CHATBOT_SERVER_URL, timeout=60):
+        self.server_url = server_url.rstrip("/")
+        self.timeout = timeout
+        self.backend = "remote"
+        self.config = None
+        self.loaded = False
+        self._connect()
+    
+    def _connect(self):
+        try:
+            health = requests.get(f"{self.server_url}/health", timeout=5).json()
+            self.config = health["config"]
+            self.loaded = health["loaded"]
+            self.backend = f"remote ({health['backend']})"
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"Chatbot server not reachable at {self.server_url}: {e}")
+    
+    def is_loaded(self):
+        # The server may start after the UI worker, so keep checking until it answers
+        if not self.loaded:
+            self._connect()
+        return self.loaded
+    
+    def _post(self, path, payload, **kwargs):
+        response = requests.post(f"{self.server_url}{path}", json=payload, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+    
+    def generation_stats(self):
+        """The server's BuffettChatbot.generation_stats(), or None if it is unreachable"""
+        try:
+            return requests.get(f"{self.server_url}/health", timeout=5).json().get("generation_stats")
+        except (requests.RequestException, ValueError):
+            return None
+    
+    def chat(self, message, timeout=None, cancel_token=None):
+        """The server enforces timeout; a cancel_token can only stop the request before it is sent (returns None)"""
+        if not self.loaded:
+            return None
+        if cancel_token is not None and cancel_token.cancelled:
+            return None
+        try:
+            return self._post("/chat", {"message": message, "timeout": timeout}).json()["response"]
+        except (requests.RequestException, ValueError, KeyError) as e:
+            return f"Error: {str(e)}"
+    
+    def chat_batch(self, messages, timeout=None, cancel_token=None):
+        if not self.loaded:
+            return [None] * len(messages)
+        if not messages:
+            return []
+        if cancel_token is not None and cancel_token.cancelled:
+            return [None] * len(messages)
+        try:
+            return self._post("/chat_batch", {"messages": messages, "timeout": timeout}).json()["responses"]
+        except (requests.RequestException, ValueError, KeyError) as e:
+            return [f"Error: {str(e)}"] * len(messages)
+    
+    def chat_stream(self, message, timeout=None, cancel_token=None):
+        """Yield the answer's text pieces as the server decodes them (one JSON string per line).
+        
+        Cancelling cancel_token closes the connection, which stops decoding on the server.
+        """
+        if not self.loaded:
+            return
+        try:
+            with self._post("/chat_stream", {"message": message, "timeout": timeout}, stream=True) as response:
+                for line in response.iter_lines():
+                    if cancel_token is not None and cancel_token.cancelled:
+                        break
+                    if line:
+                        yield json.loads(line)
+        except (requests.RequestException, ValueError) as e:
+            yield f"Error: {str(e)}"
+
+
+class ChatbotWarmup:
+    """Load the chatbot in a background thread and run warm-up questions through it.
+    
+    The first questions pay for graph tracing and kernel setup, so short, medium and
+    long questions are answered through both the batch-decode and streaming paths
+    (bypassing the response cache) before the chatbot is handed out. Check is_ready()
+    instead of blocking a request.
+    """
+    
+    WARMUP_QUESTIONS = [
+        "What is ROE?",
+        "How do you select stocks?",
+        "Why does Buffett prefer companies with a durable competitive advantage and low debt?",
+    ]
+    
+    def __init__(self, model_dir, **chatbot_kwargs):
+        self.model_dir = model_dir
+        self.chatbot_kwargs = chatbot_kwargs
+        self.chatbot = None
+        self.seconds = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="chatbot-warmup", daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            if CHATBOT_BACKEND == "remote":
+                chatbot = RemoteChatbot()
+            else:
+                chatbot = BuffettChatbot(self.model_dir, **self.chatbot_kwargs)
+            # A remote server warms itself up; RemoteChatbot has nothing to trace
+            if isinstance(chatbot, BuffettChatbot) and chatbot.is_loaded():
+                chatbot.warm_up(self.WARMUP_QUESTIONS)
+            self.chatbot = chatbot
+        except Exception as e:
+            print(f"Error warming up chatbot: {e}")
+        finally:
+            self.seconds = time.perf_counter() - start
+            self._ready.set()
+    
+    def is_ready(self):
+        return self._ready.is_set()
+    
+    def wait(self, timeout=None):
+        """Block until the warm-up has finished; returns whether it did"""
+        return self._ready.wait(timeout)
+
+
+class ChatbotHotSwap:
+    """Serve the current model version and swap in newly published ones without a restart.
+    
+    A watcher thread polls the "current" pointer of model_dir (see resolve_model_dir).
+    When it names a new version, a ChatbotWarmup loads and warms that version up in the
+    background while the old one keeps answering, and it is then swapped in with a single
+    reference assignment. Requests hold their version through use(), so in-flight answers
+    finish on the version they started on; a replaced version is closed once its last
+    request has returned. A version that fails to load is skipped until the pointer moves.
+    
+    Has the same wait()/is_ready()/chatbot/seconds interface as ChatbotWarmup.
+    """
+    
+    def __init__(self, model_dir, poll_seconds=CHATBOT_HOT_SWAP_INTERVAL, **chatbot_kwargs):
+        self.model_dir = model_dir
+        self.poll_seconds = poll_seconds
+        self.chatbot_kwargs = chatbot_kwargs
+        self.swaps = 0
+        self._lock = threading.Lock()
+        self._current = ChatbotWarmup(resolve_model_dir(model_dir), **chatbot_kwargs)
+        self._pending = None
+        self._failed_dir = None
+        self._in_flight = {}  # id(chatbot) -> requests using it
+        self._retired = []  # replaced chatbots waiting for their requests to finish
+        self._stopped = threading.Event()
+        # A remote chatbot is swapped by its server
+        if poll_seconds > 0 and CHATBOT_BACKEND != "remote":
+            threading.Thread(target=self._watch, name="chatbot-hot-swap", daemon=True).start()
+    
+    @property
+    def chatbot(self):
+        return self._current.chatbot
+    
+    @property
+    def seconds(self):
+        return self._current.seconds
+    
+    @property
+    def version_dir(self):
+        """Directory of the version being served"""
+        return self._current.model_dir
+    
+    def is_ready(self):
+        return self._current.is_ready()
+    
+    def wait(self, timeout=None):
+        """Block until the current version has finished warming up; returns whether it did"""
+        return self._current.wait(timeout)
+    
+    @contextmanager
+    def use(self):
+        """Yield the current chatbot and keep it loaded until the block exits"""
+        with self._lock:
+            chatbot = self._current.chatbot
+            self._in_flight[id(chatbot)] = self._in_flight.get(id(chatbot), 0) + 1
+        try:
+            yield chatbot
+        finally:
+            with self._lock:
+                self._in_flight[id(chatbot)] -= 1
+            self._close_idle()
+    
+    def stop(self):
+        """Stop watching for new versions"""
+        self._stopped.set()
+    
+    def _watch(self):
+        while not self._stopped.wait(self.poll_seconds):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error checking for a new model version: {e}")
+    
+    def check(self):
+        """Start loading a newly published version, or swap it in once it is warm; returns whether it swapped"""
+        if not self._current.is_ready():
+            return False
+        pending = self._pending
+        if pending is None:
+            version_dir = resolve_model_dir(self.model_dir)
+            if version_dir == self._current.model_dir or version_dir == self._failed_dir:
+                return False
+            self._failed_dir = None
+            self._pending = ChatbotWarmup(version_dir, **self.chatbot_kwargs)
+            return False
+        if not pending.is_ready():
+            return False
+        self._pending = None
+        if pending.chatbot is None or not pending.chatbot.is_loaded():
+            print(f"Could not load model version {pending.model_dir}, still serving {self._current.model_dir}")
+            self._failed_dir = pending.model_dir
+            return False
+        with self._lock:
+            retired = self._current.chatbot
+            self._current = pending
+            self.swaps += 1
+            if retired is not None:
+                self._retired.append(retired)
+        print(f"✓ Swapped in model version {pending.model_dir} (warm-up took {pending.seconds:.1f}s)")
+        self._close_idle()
+        return True
+    
+    def _close_idle(self):
+        with self._lock:
+            idle = [chatbot for chatbot in self._retired if not self._in_flight.get(id(chatbot))]
+            for chatbot in idle:
+                self._retired.remove(chatbot)
+                self._in_flight.pop(id(chatbot), None)
+        for chatbot in idle:
+            chatbot.close()
 
 
 @st.cache_resource
-def load_chatbot():
-    """Load the chatbot model (cached)"""
-    return BuffettChatbot(MODEL_DIR)
+def start_chatbot_warmup():
+    """Start loading and warming up the chatbot in the background and watch for new versions (once per server process)"""
+    # No micro-batching: the UI streams every answer with a deadline, which chat_stream decodes on its own
+    return ChatbotHotSwap(MODEL_DIR)
+
+
+def stream_chatbot_response(chatbot, prompt):
+    """Render the custom chatbot's answer token by token; returns (response, stats caption)"""
+    # A newer question supersedes an answer still decoding for this session (e.g. after a rerun)
+    previous = st.session_state.get("custom_chat_cancel_token")
+    if previous is not None:
+        previous.cancel()
+    cancel_token = st.session_state["custom_chat_cancel_token"] = CancellationToken()
+    start = time.perf_counter()
+    first_token = []
+    
+    def pieces():
+        for piece in chatbot.chat_stream(prompt, timeout=CHATBOT_GENERATION_TIMEOUT, cancel_token=cancel_token):
+            if not first_token:
+                first_token.append(time.perf_counter() - start)
+            yield piece
+    
+    response = st.write_stream(pieces())
+    elapsed = time.perf_counter() - start
+    if not response or not first_token:
+        return None, None
+    # The tokenizer is word-level, so words are tokens
+    num_tokens = len(response.split())
+    caption = f"⚡ {num_tokens} tokens · {num_tokens / elapsed:.1f} tokens/sec · first token in {first_token[0] * 1000:.0f} ms"
+    return response, caption
 
 
 # ============================================================================
@@ -508,13 +2155,21 @@ def call_groq_api(message: str, api_key: str, conversation_history: list = None)
 def is_model_available():
     """Check if the trained model files exist"""
     required_files = ["config.json", "tokenizer.json", "transformer_weights.weights.h5"]
+    model_dir = resolve_model_dir(MODEL_DIR)
     
     for f in required_files:
-        if not os.path.exists(os.path.join(MODEL_DIR, f)):
+        if not os.path.exists(os.path.join(model_dir, f)):
             return False
     
     return True
 
+
+def is_chatbot_available():
+    """Whether the custom chatbot can run: via the inference server, or locally with model files and a backend"""
+    if CHATBOT_BACKEND == "remote":
+        return True
+    return is_model_available() and (TF_AVAILABLE or NUMPY_BACKEND_AVAILABLE or ONNX_BACKEND_AVAILABLE)
+
 # Page configuration
 st.set_page_config(
     page_title="AppleBee - Warren Buffett Stock Analyzer",
@@ -1450,6 +3105,10 @@ def display_financial_statement(df: pd.DataFrame, title: str):
 
 # ===== MAIN APPLICATION =====
 def main():
+    # Start warming up the custom chatbot so it is ready before the first question
+    if is_chatbot_available():
+        start_chatbot_warmup()
+    
     # Header
     st.markdown('<h1 class="main-header">🐝 AppleBee</h1>', unsafe_allow_html=True)
     st.markdown('<p class="sub-header">Warren Buffett Stock Analysis Dashboard</p>', unsafe_allow_html=True)
@@ -2024,26 +3683,71 @@ Starts with 'gsk_': {groq_api_key.startswith('gsk_')}""")
         """, unsafe_allow_html=True)
         
         # Check if model is available
-        model_available = is_model_available() and TF_AVAILABLE
+        model_available = is_chatbot_available()
         
+        warming_up = False
         if model_available:
-            # Load the chatbot
-            chatbot = load_chatbot()
-            
-            if chatbot.is_loaded():
+            # The chatbot loads in the background; don't block the page while it warms up
+            warmup = start_chatbot_warmup()
+            warming_up = not warmup.is_ready()
+            chatbot = warmup.chatbot
+            
+            if warming_up:
+                st.info("⏳ **Warming up...** The chatbot model is loading in the background and will be ready in a few seconds.")
+                if st.button("🔄 Check again", key="custom_warmup_refresh"):
+                    st.rerun()
+                model_available = False
+            elif chatbot is not None and chatbot.is_loaded():
                 st.success("✅ **Chatbot Ready!** The custom-trained Warren Buffett AI advisor is ready.")
                 
                 # Model info
+                cache = getattr(chatbot, "response_cache", None)
+                if cache is not None:
+                    cache_stats = cache.stats()
+                    cache_info = (f"{cache_stats['hit_rate']:.0%} hit rate ({cache_stats['memory_hits']} memory, "
+                                  f"{cache_stats['disk_hits']} disk, {cache_stats['misses']} misses)")
+                else:
+                    cache_info = "off"
+                retrieval = getattr(chatbot, "retrieval_index", None)
+                if retrieval is not None:
+                    retrieval_stats = retrieval.stats()
+                    retrieval_info = (f"{len(retrieval.questions)} questions, threshold {chatbot.retrieval_threshold}, "
+                                      f"{retrieval_stats['hits']} hits / {retrieval_stats['misses']} misses")
+                else:
+                    retrieval_info = "off"
+                early_exit = chatbot.early_exit_stats() if hasattr(chatbot, "early_exit_stats") else None
+                if early_exit is not None:
+                    early_exit_info = (f"threshold {chatbot.early_exit_threshold}, {early_exit['layers_per_step']:.2f} "
+                                       f"of {len(early_exit['exits_per_layer'])} decoder layers per step")
+                else:
+                    early_exit_info = "off"
+                generation = chatbot.generation_stats() if hasattr(chatbot, "generation_stats") else None
+                if generation is not None:
+                    deadline_info = (f"{CHATBOT_GENERATION_TIMEOUT:g}s per answer; {generation['completed']} completed, "
+                                     f"{generation['expired']} expired, {generation['cancelled']} cancelled")
+                else:
+                    deadline_info = "unavailable"
+                if warmup.version_dir != MODEL_DIR:
+                    version_info = f"{os.path.basename(warmup.version_dir)} ({warmup.swaps} hot swaps since start-up)"
+                else:
+                    version_info = "unversioned"
                 with st.expander("ℹ️ Model Information"):
                     st.markdown(f"""
                     **Model Type:** Custom Transformer (trained from scratch)
                     
                     **Architecture:**
                     - **Model Directory:** `{MODEL_DIR}`
+                    - **Model Version:** {version_info}
                     - **Vocabulary Size:** {chatbot.config.get('vocab_size', 'N/A')}
                     - **Max Length:** {chatbot.config.get('max_length', 'N/A')}
                     - **Layers:** {chatbot.config.get('num_layers', 'N/A')}
                     - **Model Dimension:** {chatbot.config.get('d_model', 'N/A')}
+                    - **Inference Backend:** {chatbot.backend}
+                    - **Warm-up Time:** {warmup.seconds:.1f}s
+                    - **Response Cache:** {cache_info}
+                    - **Retrieval Fast Path:** {retrieval_info}
+                    - **Early Exit:** {early_exit_info}
+                    - **Generation Deadline:** {deadline_info}
                     
                     **Training:**
                     - Trained on 1,153 Warren Buffett Q&A pairs
@@ -2054,8 +3758,8 @@ Starts with 'gsk_': {groq_api_key.startswith('gsk_')}""")
                 st.warning("⚠️ Model files found but failed to load. Check the console for errors.")
                 model_available = False
         else:
-            if not TF_AVAILABLE:
-                st.warning("⚠️ **TensorFlow not installed.** Install TensorFlow to use the chatbot: `pip install tensorflow`")
+            if not (TF_AVAILABLE or NUMPY_BACKEND_AVAILABLE or ONNX_BACKEND_AVAILABLE):
+                st.warning("⚠️ **No inference backend installed.** Install TensorFlow (`pip install tensorflow`) or h5py (`pip install h5py`) to use the chatbot.")
             else:
                 st.info("""
                 🚀 **Train Your Chatbot!**
@@ -2091,6 +3795,8 @@ Starts with 'gsk_': {groq_api_key.startswith('gsk_')}""")
             for message in st.session_state.custom_messages:
                 with st.chat_message(message["role"], avatar="🧑‍💼" if message["role"] == "user" else "🎩"):
                     st.markdown(message["content"])
+                    if message.get("caption"):
+                        st.caption(message["caption"])
         
         # Sample questions
         if not st.session_state.custom_messages:
@@ -2116,15 +3822,23 @@ Starts with 'gsk_': {groq_api_key.startswith('gsk_')}""")
             del st.session_state.custom_pending_question
             
             st.session_state.custom_messages.append({"role": "user", "content": prompt})
+            with st.chat_message("user", avatar="🧑‍💼"):
+                st.markdown(prompt)
             
-            if model_available and chatbot.is_loaded():
-                response = chatbot.chat(prompt)
-                if response is None:
-                    response = "I'm having trouble generating a response. Please try again."
-            else:
-                response = "🚧 The chatbot model is not loaded. Please train the model first using the Colab notebook."
+            caption = None
+            with st.chat_message("assistant", avatar="🎩"):
+                if model_available and chatbot.is_loaded():
+                    # Answer on the version that is current now; a hot swap closes it only afterwards
+                    with warmup.use() as chatbot:
+                        response, caption = stream_chatbot_response(chatbot, prompt)
+                    if response is None:
+                        response = "I'm having trouble generating a response. Please try again."
+                elif warming_up:
+                    response = "⏳ The chatbot is still warming up. Please ask again in a few seconds."
+                else:
+                    response = "🚧 The chatbot model is not loaded. Please train the model first using the Colab notebook."
             
-            st.session_state.custom_messages.append({"role": "assistant", "content": response})
+            st.session_state.custom_messages.append({"role": "assistant", "content": response, "caption": caption})
             st.rerun()
         
         # Chat input
@@ -2134,19 +3848,26 @@ Starts with 'gsk_': {groq_api_key.startswith('gsk_')}""")
             with st.chat_message("user", avatar="🧑‍💼"):
                 st.markdown(prompt)
             
-            # Generate response
+            # Generate response, streamed token by token
+            caption = None
             with st.chat_message("assistant", avatar="🎩"):
                 if model_available and chatbot.is_loaded():
-                    with st.spinner("Thinking..."):
-                        response = chatbot.chat(prompt)
-                        if response is None:
-                            response = "I'm having trouble generating a response. Please try again."
+                    # Answer on the version that is current now; a hot swap closes it only afterwards
+                    with warmup.use() as chatbot:
+                        response, caption = stream_chatbot_response(chatbot, prompt)
+                    if response is None:
+                        response = "I'm having trouble generating a response. Please try again."
+                        st.markdown(response)
+                    else:
+                        st.caption(caption)
+                elif warming_up:
+                    response = "⏳ The chatbot is still warming up. Please ask again in a few seconds."
+                    st.markdown(response)
                 else:
                     response = "🚧 The chatbot model is not loaded. Please train the model first using the Colab notebook (`train_chatbot_colab.py`)."
-                
-                st.markdown(response)
+                    st.markdown(response)
             
-            st.session_state.custom_messages.append({"role": "assistant", "content": response})
+            st.session_state.custom_messages.append({"role": "assistant", "content": response, "caption": caption})
     
     # ===== TAB 4: LEARN =====
     with tab4:
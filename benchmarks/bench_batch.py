@@ -0,0 +1,51 @@
+"""
+Benchmark: batched generation (chat_batch) vs. one chat() call per message
+Checks that both give the same answers and reports throughput.
+
+Usage:
+    python benchmarks/bench_batch.py [--model-dir model] [--batch-size 16]
+"""
+
+import argparse
+import sys
+from time import perf_counter
+
+from common import QUESTIONS
+from app import BuffettChatbot, MODEL_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    chatbot = BuffettChatbot(args.model_dir, response_cache_size=0, retrieval_threshold=None)
+    if not chatbot.is_loaded():
+        sys.exit(f"Could not load a model from {args.model_dir}")
+    messages = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.batch_size)]
+
+    # Warm-up (graph tracing)
+    chatbot.chat(messages[0])
+    chatbot.chat_batch(messages)
+
+    start = perf_counter()
+    sequential = [chatbot.chat(m) for m in messages]
+    sequential_s = perf_counter() - start
+
+    start = perf_counter()
+    batched = chatbot.chat_batch(messages)
+    batched_s = perf_counter() - start
+
+    same = sum(a == b for a, b in zip(sequential, batched))
+    print(f"{'Mode':<14}{'answers/s':>12}")
+    print(f"{'sequential':<14}{len(messages) / sequential_s:>12.1f}")
+    print(f"{'chat_batch':<14}{len(messages) / batched_s:>12.1f}")
+    print(f"Speed-up: {sequential_s / batched_s:.2f}x")
+    print(f"Identical answers: {same}/{len(messages)}")
+    if same != len(messages):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
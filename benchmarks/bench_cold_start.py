@@ -0,0 +1,46 @@
+"""
+Benchmark: time-to-first-answer after process start
+Compares rebuilding the Transformer from config.json (dummy forward pass +
+load_weights + decode-loop tracing) with loading the exported SavedModel
+serving artifact, and the NumPy backend for reference. Exports the artifact
+first if the model directory does not have one yet.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--model-dir model] [--runs 3]
+"""
+
+import argparse
+import os
+import statistics
+
+from common import cold_start
+from app import MODEL_DIR, SERVING_DIR, SERVING_WEIGHTS_STAMP
+from export_serving_model import export_serving_model
+
+# Mode name -> (environment, BuffettChatbot keyword arguments)
+MODES = {
+    "rebuild + load_weights": ({}, dict(use_serving_artifact=False)),
+    "SavedModel artifact": ({}, dict(use_serving_artifact=True)),
+    "numpy backend": ({"CHATBOT_BACKEND": "numpy"}, dict(backend="numpy")),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.model_dir, SERVING_DIR, SERVING_WEIGHTS_STAMP)):
+        print(f"Exporting serving artifact to {export_serving_model(args.model_dir)}")
+
+    print(f"{'Mode':<26}{'first answer s':>16}{'peak RSS MB':>13}")
+    for name, (env, kwargs) in MODES.items():
+        runs = [cold_start(args.model_dir, env=env, **kwargs) for _ in range(args.runs)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        rss = statistics.median(run["peak_rss_mb"] for run in runs)
+        print(f"{name:<26}{seconds:>16.2f}{rss:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
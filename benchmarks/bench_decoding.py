@@ -0,0 +1,50 @@
+"""
+Benchmark: greedy decoding modes of BuffettChatbot
+Checks that every mode gives the same answers as full-prefix recomputation
+and reports per-answer latency.
+
+Usage:
+    python benchmarks/bench_decoding.py [--model-dir model] [--repeats 3]
+"""
+
+import argparse
+import sys
+
+from common import QUESTIONS, time_answers
+from app import BuffettChatbot, MODEL_DIR
+
+# Mode name -> BuffettChatbot keyword arguments; the first mode is the reference
+MODES = {
+    "full recompute": dict(use_kv_cache=False, compile_generation=False),
+    "kv cache": dict(use_kv_cache=True, compile_generation=False),
+    "compiled loop": dict(compile_generation=True),
+    "compiled loop + XLA": dict(compile_generation=True, jit_compile=True),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {}
+    for name, kwargs in MODES.items():
+        chatbot = BuffettChatbot(args.model_dir, response_cache_size=0, retrieval_threshold=None, **kwargs)
+        if not chatbot.is_loaded():
+            sys.exit(f"Could not load a model from {args.model_dir}")
+        results[name] = time_answers(chatbot, QUESTIONS, args.repeats)
+
+    reference_answers, reference_ms = next(iter(results.values()))
+    failed = False
+    print(f"{'Mode':<24}{'ms/answer':>12}{'speed-up':>10}{'identical':>11}")
+    for name, (answers, ms) in results.items():
+        same = sum(a == b for a, b in zip(answers, reference_answers))
+        failed = failed or same != len(QUESTIONS)
+        print(f"{name:<24}{ms:>12.1f}{reference_ms / ms:>9.2f}x{same:>8}/{len(QUESTIONS)}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
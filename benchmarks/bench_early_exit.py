@@ -0,0 +1,60 @@
+"""
+Benchmark: confidence-based early exit between decoder layers
+Decodes CSV questions (retrieval fast path off) with full-depth greedy decoding
+and with early_exit_threshold at several thresholds, and reports decoder layers
+run per decode step, the share of steps that exited early, latency per answer
+and how many answers are identical to full-depth decoding.
+
+Intermediate layers only become confident enough to exit in models trained with
+the auxiliary early-exit loss (EARLY_EXIT_LOSS_WEIGHT=0.3 for training/chatbot_model.py).
+
+Usage:
+    python benchmarks/bench_early_exit.py [--model-dir model] [--limit 100] [--thresholds 0.99 0.95 0.9 0.8]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from common import load_qa_pairs, timed_answers
+from app import BuffettChatbot, MODEL_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--limit", type=int, default=100, help="number of CSV questions")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.99, 0.95, 0.9, 0.8])
+    parser.add_argument("--repeats", type=int, default=3, help="timing passes (the best is reported)")
+    args = parser.parse_args()
+
+    questions = [q for q, _ in load_qa_pairs()][::10][:args.limit]
+    full = BuffettChatbot(args.model_dir, use_serving_artifact=False, response_cache_size=0, retrieval_threshold=None)
+    if not full.is_loaded():
+        sys.exit(f"Could not load a model from {args.model_dir}")
+    num_layers = full.config["num_layers"]
+    full.warm_up(questions[:1])
+    expected, full_ms = timed_answers(full, questions, args.repeats)
+
+    print(f"{len(questions)} CSV questions, {num_layers} decoder layers")
+    print(f"{'Threshold':<12}{'layers/step':>13}{'early exits':>13}{'ms/answer':>11}{'speed-up':>10}{'identical':>11}")
+    print(f"{'full depth':<12}{num_layers:>13.2f}{'-':>13}{full_ms:>11.1f}{'1.00x':>10}{'-':>11}")
+    for threshold in args.thresholds:
+        chatbot = BuffettChatbot(
+            args.model_dir, response_cache_size=0, retrieval_threshold=None, early_exit_threshold=threshold
+        )
+        chatbot.warm_up(questions[:1])
+        warm_up_counts = np.array(chatbot.early_exit_stats()["exits_per_layer"])
+        answers, ms = timed_answers(chatbot, questions, args.repeats)
+        # Summed over the repeats, so per-step figures are unaffected
+        counts = np.array(chatbot.early_exit_stats()["exits_per_layer"]) - warm_up_counts
+        layers_per_step = np.dot(counts, np.arange(1, num_layers + 1)) / counts.sum()
+        early = 1 - counts[-1] / counts.sum()
+        same = sum(a == b for a, b in zip(answers, expected))
+        print(f"{threshold:<12g}{layers_per_step:>13.2f}{early:>13.1%}{ms:>11.1f}"
+              f"{f'{full_ms / ms:.2f}x':>10}{f'{same}/{len(questions)}':>11}")
+
+
+if __name__ == "__main__":
+    main()
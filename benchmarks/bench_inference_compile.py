@@ -0,0 +1,77 @@
+"""
+Benchmark: load-time inference optimization (Transformer.optimize_for_inference)
+Loads the model with and without the pass, checks that greedy answers are
+identical on the training CSV questions, and reports per-answer latency for
+each generation path plus the memory held by positional tables and masks and
+the cold-start peak RSS.
+
+Usage:
+    python benchmarks/bench_inference_compile.py [--model-dir model] [--limit 200]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from common import QUESTIONS, cold_start, load_qa_pairs, time_answers
+from app import BuffettChatbot, MODEL_DIR
+
+# (label, BuffettChatbot kwargs) for each generation path
+PATHS = [
+    ("compiled loop", {}),
+    ("eager + KV cache", {"compile_generation": False}),
+    ("eager recompute", {"compile_generation": False, "use_kv_cache": False}),
+]
+
+
+def table_bytes(model):
+    """Bytes of the non-weight tensors the model keeps around for generation"""
+    tables = [model.encoder.pos_encoding, model.decoder.pos_encoding]
+    if model.look_ahead_masks is not None:
+        tables.append(model.look_ahead_masks)
+    return sum(np.asarray(t).nbytes for t in tables)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--limit", type=int, default=200, help="number of CSV questions to compare")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    questions = [q for q, _ in load_qa_pairs(limit=args.limit)]
+    answers = {}
+    print(f"{'Path':<18}{'before ms':>11}{'after ms':>10}{'speed-up':>10}")
+    for label, kwargs in PATHS:
+        row = []
+        for optimize in (False, True):
+            chatbot = BuffettChatbot(
+                args.model_dir, backend="tensorflow", use_serving_artifact=False,
+                optimize_for_inference=optimize, response_cache_size=0, retrieval_threshold=None, **kwargs
+            )
+            if not chatbot.is_loaded():
+                sys.exit(f"Could not load a model from {args.model_dir}")
+            _, ms = time_answers(chatbot, QUESTIONS, args.repeats)
+            row.append(ms)
+            if not kwargs:
+                answers[optimize] = chatbot.chat_batch(questions)
+                answers[f"tables {optimize}"] = table_bytes(chatbot.model)
+        print(f"{label:<18}{row[0]:>11.1f}{row[1]:>10.1f}{row[0] / row[1]:>9.2f}x")
+
+    same = sum(a == b for a, b in zip(answers[False], answers[True]))
+    print(f"\nIdentical greedy answers: {same}/{len(questions)}")
+    print(f"Positional tables + masks: {answers['tables False'] / 2**20:.2f} MB -> "
+          f"{answers['tables True'] / 2**20:.2f} MB")
+    for optimize in (False, True):
+        cold = cold_start(args.model_dir, backend="tensorflow", use_serving_artifact=False,
+                          optimize_for_inference=optimize)
+        print(f"Cold start ({'after' if optimize else 'before'}): {cold['seconds']:.2f} s, "
+              f"peak RSS {cold['peak_rss_mb']:.0f} MB")
+
+    if same != len(questions):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
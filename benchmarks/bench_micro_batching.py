@@ -0,0 +1,79 @@
+"""
+Benchmark: dynamic micro-batching of concurrent chat() calls
+Sends questions from --clients threads at once to a chatbot without batching
+and with ChatMicroBatcher (max batch size / max wait), and reports throughput,
+p50/p99 latency, the mean dispatched batch size and single-user latency.
+
+Usage:
+    python benchmarks/bench_micro_batching.py [--model-dir model] [--clients 8] [--max-batch-size 8] [--max-wait-ms 5]
+"""
+
+import argparse
+import sys
+import threading
+from time import perf_counter
+
+import numpy as np
+
+from common import QUESTIONS, load_qa_pairs, time_answers
+from app import BuffettChatbot, MODEL_DIR
+
+
+def run_clients(chatbot, questions, clients):
+    """Each client thread asks every question in turn; returns (answers/sec, latencies in ms, answers)"""
+    latencies, answers = [], {}
+    lock = threading.Lock()
+
+    def client(offset):
+        for i in range(len(questions)):
+            question = questions[(i + offset) % len(questions)]
+            start = perf_counter()
+            answer = chatbot.chat(question)
+            with lock:
+                latencies.append(1000 * (perf_counter() - start))
+                answers[question] = answer
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / (perf_counter() - start), latencies, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--questions", type=int, default=16, help="CSV questions asked by each client")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    questions = [q for q, _ in load_qa_pairs(limit=args.questions)]
+    configs = [("no batching", 1), (f"batch<={args.max_batch_size}, {args.max_wait_ms:g} ms", args.max_batch_size)]
+    results = {}
+    print(f"{args.clients} concurrent clients x {len(questions)} questions")
+    print(f"{'Mode':<22}{'answers/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'mean batch':>12}{'1 user ms':>11}")
+    for label, max_batch_size in configs:
+        chatbot = BuffettChatbot(
+            args.model_dir, max_batch_size=max_batch_size, max_wait_ms=args.max_wait_ms,
+            response_cache_size=0, retrieval_threshold=None
+        )
+        if not chatbot.is_loaded():
+            sys.exit(f"Could not load a model from {args.model_dir}")
+        _, single_ms = time_answers(chatbot, QUESTIONS, args.repeats)
+        throughput, latencies, answers = run_clients(chatbot, questions, args.clients)
+        mean_batch = np.mean(chatbot._batcher.batch_sizes) if chatbot._batcher else 1.0
+        results[max_batch_size] = answers
+        print(f"{label:<22}{throughput:>11.1f}{np.percentile(latencies, 50):>9.1f}"
+              f"{np.percentile(latencies, 99):>9.1f}{mean_batch:>12.2f}{single_ms:>11.1f}")
+
+    same = sum(results[1][q] == results[args.max_batch_size][q] for q in questions)
+    print(f"\nIdentical answers: {same}/{len(questions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: single-pass text normalizer vs. the original sequential re.sub passes
+Checks that chatbot_text.normalize_text and normalize_series give exactly the
+output of the original preprocess_sentence_chatbot (kept below as the
+reference) for every question and answer of the training CSV, their
+punctuation/case variants and contraction edge cases, then times both per
+call and over the whole CSV column. Exits non-zero on any mismatch.
+Contrived overlapping contractions such as "n'that's" are known to differ
+(see chatbot_text.py) and are not checked.
+
+Usage:
+    python benchmarks/bench_normalizer.py [--repeats 5]
+"""
+
+import argparse
+import re
+import sys
+
+import pandas as pd
+
+from common import best_seconds, load_qa_pairs
+from chatbot_text import normalize_series, normalize_text
+
+EDGE_CASES = [
+    "", "   ", "?!", "...", "a,b.c", "WON'T", "Can't stop", "she's he's it's", "That's what's where's how's",
+    "I'm", "you'll we've they're i'd", "goin' 'bout", "n'd n'll n've n're n't n'", "n''bout n''d", "won'tn't",
+    "don't!", "\"quoted\"  text", "tab\tand\nnewline", "100% of 5.5 bn", "Buffett's rock-'n'-roll", "café naïve",
+    "İstanbul ΣΑΣ", None, 3.14, float("nan"),
+]
+
+
+def reference_normalize(sentence):
+    """The original preprocess_sentence_chatbot from app.py"""
+    if not isinstance(sentence, str):
+        sentence = str(sentence)
+
+    sentence = sentence.lower().strip()
+    sentence = re.sub(r"([?.!,])", r" \1 ", sentence)
+    sentence = re.sub(r'[" "]+', " ", sentence)
+    sentence = re.sub(r"i'm", "i am", sentence)
+    sentence = re.sub(r"he's", "he is", sentence)
+    sentence = re.sub(r"she's", "she is", sentence)
+    sentence = re.sub(r"it's", "it is", sentence)
+    sentence = re.sub(r"that's", "that is", sentence)
+    sentence = re.sub(r"what's", "what is", sentence)
+    sentence = re.sub(r"where's", "where is", sentence)
+    sentence = re.sub(r"how's", "how is", sentence)
+    sentence = re.sub(r"\'ll", " will", sentence)
+    sentence = re.sub(r"\'ve", " have", sentence)
+    sentence = re.sub(r"\'re", " are", sentence)
+    sentence = re.sub(r"\'d", " would", sentence)
+    sentence = re.sub(r"won't", "will not", sentence)
+    sentence = re.sub(r"can't", "cannot", sentence)
+    sentence = re.sub(r"n't", " not", sentence)
+    sentence = re.sub(r"n'", "ng", sentence)
+    sentence = re.sub(r"'bout", "about", sentence)
+    sentence = re.sub(r"[^a-zA-Z0-9?.!,%]+", " ", sentence)
+    sentence = sentence.strip()
+    return sentence
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="timing passes (the best is reported)")
+    args = parser.parse_args()
+
+    texts = [text for pair in load_qa_pairs() for text in pair]
+    corpus = texts + [t.upper() for t in texts] + [re.sub(r"[?.!,]", "", t) for t in texts] + EDGE_CASES
+    expected = [reference_normalize(t) for t in corpus]
+    mismatches = [(t, e, normalize_text(t)) for t, e in zip(corpus, expected) if normalize_text(t) != e]
+    batch = normalize_series(pd.Series(corpus, dtype=object)).tolist()
+    batch_mismatches = sum(b != e for b, e in zip(batch, expected))
+    print(f"Parity over {len(corpus)} sentences: {len(mismatches)} normalize_text and "
+          f"{batch_mismatches} normalize_series mismatches")
+    for text, want, got in mismatches[:5]:
+        print(f"  {text!r}: expected {want!r}, got {got!r}")
+
+    column = pd.Series(texts)
+    reference_s = best_seconds(lambda: [reference_normalize(t) for t in texts], args.repeats)
+    single_s = best_seconds(lambda: [normalize_text(t) for t in texts], args.repeats)
+    series_s = best_seconds(lambda: normalize_series(column), args.repeats)
+    print(f"\n{len(texts)} CSV questions and answers")
+    print(f"{'Normalizer':<32}{'us/sentence':>13}{'speed-up':>10}")
+    for label, seconds in (("sequential re.sub (reference)", reference_s), ("normalize_text", single_s),
+                           ("normalize_series (whole column)", series_s)):
+        print(f"{label:<32}{seconds * 1e6 / len(texts):>13.2f}{f'{reference_s / seconds:.1f}x':>10}")
+
+    if mismatches or batch_mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark: NumPy inference backend vs. the TensorFlow/Keras model
+Checks that full-sequence logits agree within --atol and that greedy answers
+match on the training CSV questions, then reports per-answer latency and the
+cold-start cost (import + load + first answer, peak RSS) of each backend.
+
+Usage:
+    python benchmarks/bench_numpy_backend.py [--model-dir model] [--limit 200] [--atol 1e-3]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from common import QUESTIONS, cold_start, load_qa_pairs, time_answers
+from app import BuffettChatbot, MODEL_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--limit", type=int, default=200, help="number of CSV questions to compare")
+    parser.add_argument("--atol", type=float, default=1e-3, help="max allowed absolute logit difference")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    tf_bot = BuffettChatbot(
+        args.model_dir, backend="tensorflow", use_serving_artifact=False, response_cache_size=0, retrieval_threshold=None
+    )
+    np_bot = BuffettChatbot(args.model_dir, backend="numpy", response_cache_size=0, retrieval_threshold=None)
+    if not (tf_bot.is_loaded() and np_bot.is_loaded()):
+        sys.exit(f"Could not load a model from {args.model_dir}")
+
+    questions = [q for q, _ in load_qa_pairs(limit=args.limit)]
+
+    # Logit parity on teacher-forced decoder inputs (the TF greedy outputs)
+    encoder_input = tf_bot._encode_inputs(questions)
+    decoder_input = np.asarray(tf_bot._evaluate_batch(questions))[:, :-1]
+    tf_logits = np.asarray(tf_bot.model((encoder_input, decoder_input), training=False))
+    np_logits = np_bot.model(encoder_input, decoder_input)
+    max_diff = float(np.abs(tf_logits - np_logits).max())
+
+    tf_answers = tf_bot.chat_batch(questions)
+    np_answers = np_bot.chat_batch(questions)
+    same = sum(a == b for a, b in zip(tf_answers, np_answers))
+
+    print(f"Max |logit difference|: {max_diff:.2e} (atol {args.atol:.0e})")
+    print(f"Identical greedy answers: {same}/{len(questions)}")
+
+    print(f"\n{'Backend':<12}{'ms/answer':>12}{'cold start s':>14}{'peak RSS MB':>13}{'imports TF':>12}")
+    for name, chatbot in (("tensorflow", tf_bot), ("numpy", np_bot)):
+        _, ms = time_answers(chatbot, QUESTIONS, args.repeats)
+        cold = cold_start(args.model_dir, env={"CHATBOT_BACKEND": name}, backend=name)
+        print(f"{name:<12}{ms:>12.1f}{cold['seconds']:>14.2f}{cold['peak_rss_mb']:>13.0f}"
+              f"{str(cold['tensorflow_imported']):>12}")
+
+    if max_diff > args.atol or same != len(questions):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark: onnxruntime backend vs. the TensorFlow compiled loop
+Exports the ONNX graphs first if the model directory does not have them,
+checks greedy answer agreement on the training CSV questions and reports
+per-answer latency for several onnxruntime thread counts.
+
+Usage:
+    python benchmarks/bench_onnx.py [--model-dir model] [--limit 100] [--threads 1 2 4]
+"""
+
+import argparse
+import os
+import sys
+
+from common import QUESTIONS, load_qa_pairs, time_answers
+from app import BuffettChatbot, MODEL_DIR, SERVING_WEIGHTS_STAMP
+from chatbot_onnx import ONNX_DIR
+from export_onnx_model import export_onnx_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--limit", type=int, default=100, help="number of CSV questions to compare")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4], help="intra-op thread counts")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.model_dir, ONNX_DIR, SERVING_WEIGHTS_STAMP)):
+        print(f"Exporting ONNX graphs to {export_onnx_model(args.model_dir)}")
+
+    tf_bot = BuffettChatbot(args.model_dir, backend="tensorflow", response_cache_size=0, retrieval_threshold=None)
+    onnx_bot = BuffettChatbot(args.model_dir, backend="onnx", response_cache_size=0, retrieval_threshold=None)
+    if not (tf_bot.is_loaded() and onnx_bot.is_loaded()):
+        sys.exit(f"Could not load both backends from {args.model_dir}")
+
+    questions = [q for q, _ in load_qa_pairs(limit=args.limit)]
+    same = sum(a == b for a, b in zip(tf_bot.chat_batch(questions), onnx_bot.chat_batch(questions)))
+    print(f"Identical greedy answers: {same}/{len(questions)}")
+
+    _, tf_ms = time_answers(tf_bot, QUESTIONS, args.repeats)
+    print(f"\n{'Backend':<26}{'ms/answer':>12}{'vs TF':>9}")
+    print(f"{'tensorflow (compiled)':<26}{tf_ms:>12.1f}{1:>8.2f}x")
+    for threads in args.threads:
+        chatbot = BuffettChatbot(
+            args.model_dir, backend="onnx", onnx_threads=threads, response_cache_size=0, retrieval_threshold=None
+        )
+        _, ms = time_answers(chatbot, QUESTIONS, args.repeats)
+        print(f"{f'onnxruntime ({threads} threads)':<26}{ms:>12.1f}{tf_ms / ms:>8.2f}x")
+
+    if same != len(questions):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: bfloat16 inference vs. the float32 model
+Greedy-decodes the training CSV questions (retrieval fast path off) in batches
+with precision="float32" and precision="bfloat16", and reports generated
+tokens/sec, single-question latency and how many answers are identical to
+the float32 greedy outputs (exact match and token-level agreement).
+
+The speed-up depends on native bf16 matmul support in the CPU (AVX512-BF16 or
+AMX); without it bfloat16 can be slower than float32.
+
+Usage:
+    python benchmarks/bench_precision.py [--model-dir model] [--limit 0] [--batch-size 32] [--repeats 3]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from common import QUESTIONS, generate_tokens, load_qa_pairs, time_answers
+from app import BuffettChatbot, MODEL_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--limit", type=int, default=0, help="number of CSV questions (0 = all)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    questions = [q for q, _ in load_qa_pairs(limit=args.limit)]
+    results = {}
+    for precision in BuffettChatbot.PRECISIONS:
+        chatbot = BuffettChatbot(
+            args.model_dir, precision=precision, use_serving_artifact=False,
+            response_cache_size=0, retrieval_threshold=None
+        )
+        if not chatbot.is_loaded():
+            sys.exit(f"Could not load a model from {args.model_dir}")
+        _, ms = time_answers(chatbot, QUESTIONS, args.repeats)
+        tokens, seconds = generate_tokens(chatbot, questions, args.batch_size)
+        # Every non-zero id after START is a generated token
+        results[precision] = (tokens, np.count_nonzero(tokens[:, 1:]) / seconds, ms)
+
+    expected = results["float32"][0]
+    print(f"{len(questions)} CSV questions, batch size {args.batch_size}")
+    print(f"{'Precision':<11}{'tokens/sec':>12}{'ms/answer':>11}{'exact match':>13}{'token agreement':>17}")
+    for precision, (tokens, tokens_per_second, ms) in results.items():
+        # Compare every position that holds a generated token in either output
+        positions = (expected != 0) | (tokens != 0)
+        token_agreement = ((expected == tokens) & positions).sum() / positions.sum()
+        exact_match = np.all(expected == tokens, axis=1).mean()
+        print(f"{precision:<11}{tokens_per_second:>12.0f}{ms:>11.1f}{exact_match:>13.2%}{token_agreement:>17.2%}")
+    speed_up = results["bfloat16"][1] / results["float32"][1]
+    print(f"bfloat16 throughput: {speed_up:.2f}x float32")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: weight-only int8 inference vs. the float32 model
+quantize="int8" stores every Dense kernel as per-output-channel int8 with
+float32 scales and keeps the activations in float32; the embeddings are not
+quantized. Checks that the loaded model is quantized that way (exits non-zero
+otherwise) and reports per-answer speed-up, weight memory saved and
+token-level agreement of the greedy outputs over the training CSV questions.
+
+Usage:
+    python benchmarks/bench_quantization.py [--model-dir model] [--limit 0] [--batch-size 32]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import tensorflow as tf
+
+from common import QUESTIONS, generate_tokens, load_qa_pairs, time_answers
+from app import BuffettChatbot, MODEL_DIR
+
+
+def weight_bytes(model):
+    return sum(np.asarray(w).nbytes for w in model.weights)
+
+
+def is_weight_only_int8(model):
+    """Every Dense kernel is int8 with float inputs, every embedding is float32"""
+    layers = list(model._flatten_layers())
+    dense = [layer for layer in layers if isinstance(layer, tf.keras.layers.Dense)]
+    embeddings = [layer for layer in layers if isinstance(layer, tf.keras.layers.Embedding)]
+    return (all(layer.quantization_mode == "int8" and layer.inputs_quantizer is None for layer in dense)
+            and all(layer.embeddings.dtype == "float32" for layer in embeddings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--limit", type=int, default=0, help="number of CSV questions (0 = all)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    float_bot = BuffettChatbot(
+        args.model_dir, use_serving_artifact=False, response_cache_size=0, retrieval_threshold=None
+    )
+    int8_bot = BuffettChatbot(args.model_dir, quantize="int8", response_cache_size=0, retrieval_threshold=None)
+    if not (float_bot.is_loaded() and int8_bot.is_loaded()):
+        sys.exit(f"Could not load a model from {args.model_dir}")
+    if not is_weight_only_int8(int8_bot.model):
+        sys.exit("The int8 model is not weight-only quantized")
+
+    _, float_ms = time_answers(float_bot, QUESTIONS, args.repeats)
+    _, int8_ms = time_answers(int8_bot, QUESTIONS, args.repeats)
+    float_mb = weight_bytes(float_bot.model) / 2**20
+    int8_mb = weight_bytes(int8_bot.model) / 2**20
+
+    questions = [q for q, _ in load_qa_pairs(limit=args.limit)]
+    float_tokens, _ = generate_tokens(float_bot, questions, args.batch_size)
+    int8_tokens, _ = generate_tokens(int8_bot, questions, args.batch_size)
+    # Compare every position that holds a generated token in either output
+    positions = (float_tokens != 0) | (int8_tokens != 0)
+    token_agreement = ((float_tokens == int8_tokens) & positions).sum() / positions.sum()
+    exact_match = np.all(float_tokens == int8_tokens, axis=1).mean()
+
+    print(f"{'Model':<10}{'ms/answer':>12}{'weights MB':>12}")
+    print(f"{'float32':<10}{float_ms:>12.1f}{float_mb:>12.1f}")
+    print(f"{'int8':<10}{int8_ms:>12.1f}{int8_mb:>12.1f}")
+    print(f"Speed-up: {float_ms / int8_ms:.2f}x, weight memory saved: {float_mb - int8_mb:.1f} MB "
+          f"({1 - int8_mb / float_mb:.0%})")
+    print(f"Token-level agreement over {len(questions)} CSV questions: {token_agreement:.2%}")
+    print(f"Exact-match answers: {exact_match:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: response cache (memory LRU + SQLite) for the custom chatbot
+Answers the CSV questions three times: cold (decoding), warm (memory hits) and
+after a restart (a fresh chatbot with an empty memory tier, disk hits). Checks
+that cached answers equal the decoded ones, then reports latencies and hit
+counters, and that changed weights invalidate the cache.
+
+Works on a temporary copy of the model directory, so the real cache file is
+not touched.
+
+Usage:
+    python benchmarks/bench_response_cache.py [--model-dir model] [--limit 200]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from common import load_qa_pairs, timed_answers
+from app import BuffettChatbot, MODEL_DIR
+
+MODEL_FILES = ["config.json", "tokenizer.json", "transformer_weights.weights.h5"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--limit", type=int, default=200, help="number of CSV questions")
+    args = parser.parse_args()
+
+    questions = [q for q, _ in load_qa_pairs(limit=args.limit)]
+    with tempfile.TemporaryDirectory() as model_dir:
+        for name in MODEL_FILES:
+            shutil.copy(os.path.join(args.model_dir, name), model_dir)
+
+        chatbot = BuffettChatbot(model_dir, use_serving_artifact=False, retrieval_threshold=None)
+        if not chatbot.is_loaded():
+            sys.exit(f"Could not load a model from {args.model_dir}")
+        chatbot.warm_up(questions[:1])
+        decoded, cold_ms = timed_answers(chatbot, questions)
+        cached, warm_ms = timed_answers(chatbot, questions)
+        print(f"{'Pass':<28}{'ms/answer':>11}")
+        print(f"{'cold (decode)':<28}{cold_ms:>11.3f}")
+        print(f"{'warm (memory tier)':<28}{warm_ms:>11.3f}")
+
+        restarted = BuffettChatbot(model_dir, use_serving_artifact=False, retrieval_threshold=None)
+        from_disk, disk_ms = timed_answers(restarted, questions)
+        print(f"{'after restart (disk tier)':<28}{disk_ms:>11.3f}")
+        print(f"\nCounters before restart: {chatbot.response_cache.stats()}")
+        print(f"Counters after restart:  {restarted.response_cache.stats()}")
+
+        same = sum(a == b == c for a, b, c in zip(decoded, cached, from_disk))
+        print(f"Cached answers identical to decoded: {same}/{len(questions)}")
+
+        # Deploy "new" weights: any change to the file must invalidate every entry
+        with open(os.path.join(model_dir, "transformer_weights.weights.h5"), "ab") as f:
+            f.write(b"\0")
+        redeployed = BuffettChatbot(model_dir, backend="numpy", retrieval_threshold=None)
+        redeployed.chat(questions[0])
+        invalidated = redeployed.response_cache.stats()["misses"] == 1
+        print(f"New weights invalidate the cache: {invalidated}")
+
+    if same != len(questions) or not invalidated:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: retrieval fast path over the training Q&A corpus
+Builds the retrieval index from the training CSV into a temporary copy of the
+model directory and checks it against the CSV:
+  - every CSV question must retrieve one of its own curated answers
+  - lowercased/unpunctuated and one-typo variants are reported as hit rate
+    and accuracy at the threshold
+  - off-topic questions must fall below the threshold
+Then compares chat() latency for retrieved answers against decoding.
+
+Usage:
+    python benchmarks/bench_retrieval.py [--model-dir model] [--threshold 0.85]
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+from collections import defaultdict
+from time import perf_counter
+
+from common import QA_CSV, load_qa_pairs, timed_answers
+from app import BuffettChatbot, MODEL_DIR, preprocess_sentence_chatbot
+from build_retrieval_index import build_retrieval_index
+
+MODEL_FILES = ["config.json", "tokenizer.json", "transformer_weights.weights.h5"]
+
+OFF_TOPIC = [
+    "What is the weather in Paris tomorrow?",
+    "What is the capital of France?",
+    "Can you recommend a good pasta recipe?",
+    "Who won the world cup in 2018?",
+    "How do I fix a flat bicycle tire?",
+    "What is your favorite movie?",
+    "Translate hello into Spanish",
+    "How tall is Mount Everest?",
+]
+
+
+def normalize(question):
+    """Preprocessed question without punctuation, to group paraphrases that only differ in it"""
+    return re.sub(r"[?.!,]", " ", preprocess_sentence_chatbot(question)).split()
+
+
+def typo(question):
+    """Drop the middle character of the longest word"""
+    words = question.split()
+    i = max(range(len(words)), key=lambda j: len(words[j]))
+    if len(words[i]) > 3:
+        words[i] = words[i][:len(words[i]) // 2] + words[i][len(words[i]) // 2 + 1:]
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--decode-limit", type=int, default=50, help="CSV questions timed with decoding")
+    args = parser.parse_args()
+
+    pairs = load_qa_pairs()
+    curated = defaultdict(set)
+    for question, answer in pairs:
+        curated[tuple(normalize(question))].add(answer.strip())
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        for name in MODEL_FILES:
+            shutil.copy(os.path.join(args.model_dir, name), model_dir)
+        start = perf_counter()
+        build_retrieval_index(model_dir, QA_CSV)
+        print(f"Index built in {perf_counter() - start:.2f}s")
+
+        chatbot = BuffettChatbot(model_dir, response_cache_size=0, retrieval_threshold=args.threshold)
+        if not chatbot.is_loaded():
+            sys.exit(f"Could not load a model from {args.model_dir}")
+        index = chatbot.retrieval_index
+
+        def check(questions, originals):
+            hits = correct = 0
+            for question, original in zip(questions, originals):
+                answer = chatbot._retrieved_response(question)
+                if answer is not None:
+                    hits += 1
+                    correct += answer in curated[tuple(normalize(original))]
+            return hits, correct
+
+        questions = [q for q, _ in pairs]
+        variants = {
+            "CSV questions": questions,
+            "lowercase, no punctuation": [re.sub(r"[?.!,]", "", q.lower()) for q in questions],
+            "one typo": [typo(q) for q in questions],
+        }
+        print(f"\n{'Questions':<28}{'hit rate':>10}{'accuracy':>10}")
+        exact_hits = exact_correct = 0
+        for label, variant in variants.items():
+            hits, correct = check(variant, questions)
+            if label == "CSV questions":
+                exact_hits, exact_correct = hits, correct
+            print(f"{label:<28}{hits / len(questions):>10.2%}{correct / max(hits, 1):>10.2%}")
+        false_hits = sum(chatbot._retrieved_response(q) is not None for q in OFF_TOPIC)
+        best = max(index.search(preprocess_sentence_chatbot(q))[1] for q in OFF_TOPIC)
+        print(f"{'off-topic':<28}{false_hits / len(OFF_TOPIC):>10.2%}{'-':>10}  (best similarity {best:.3f})")
+
+        _, retrieved_ms = timed_answers(chatbot, questions)
+        decoder = BuffettChatbot(model_dir, response_cache_size=0, retrieval_threshold=None)
+        decoder.warm_up(questions[:1])
+        _, decoded_ms = timed_answers(decoder, questions[:args.decode_limit])
+        print(f"\n{'Path':<28}{'ms/answer':>10}")
+        print(f"{'retrieval':<28}{retrieved_ms:>10.3f}")
+        print(f"{'decoding':<28}{decoded_ms:>10.3f}")
+        print(f"Speed-up: {decoded_ms / retrieved_ms:.0f}x")
+
+    if exact_hits != len(questions) or exact_correct != len(questions) or false_hits:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: shared inference server vs. one model per Streamlit worker
+Starts N worker processes that import app.py like a Streamlit worker and ask
+questions concurrently, either each with its own BuffettChatbot (in-process)
+or through RemoteChatbot against one chatbot_server.py process (remote).
+Reports the total RSS of all processes and the p50/p99 answer latency.
+
+Usage:
+    python benchmarks/bench_server.py [--model-dir model] [--workers 4] [--questions 20]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import requests
+
+from common import REPO_DIR, load_qa_pairs
+from app import MODEL_DIR
+
+WORKER_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {repo!r})
+from app import BuffettChatbot, RemoteChatbot
+if {remote!r}:
+    chatbot = RemoteChatbot({server_url!r})
+else:
+    chatbot = BuffettChatbot({model_dir!r}, response_cache_size=0, retrieval_threshold=None)
+chatbot.chat("What is gross margin?")  # warm-up
+print("ready", flush=True)
+sys.stdin.readline()  # wait until every worker is ready
+latencies = []
+for question in {questions!r}:
+    start = time.perf_counter()
+    chatbot.chat(question)
+    latencies.append(time.perf_counter() - start)
+print(json.dumps({{
+    "latencies": latencies,
+    "rss_mb": int(next(l for l in open("/proc/self/status") if l.startswith("VmRSS")).split()[1]) / 1024,
+    "tensorflow_imported": "tensorflow" in sys.modules,
+}}), flush=True)
+"""
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        return int(next(line for line in f if line.startswith("VmRSS")).split()[1]) / 1024
+
+
+def start_server(model_dir, port):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, "chatbot_server.py"), "--model-dir", model_dir, "--port", str(port),
+         "--response-cache-size", "0", "--no-retrieval"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    while True:
+        if server.poll() is not None:
+            sys.exit("Inference server exited during start-up")
+        try:
+            if requests.get(f"{url}/health", timeout=1).json()["loaded"]:
+                return server, url
+        except requests.RequestException:
+            time.sleep(0.5)
+
+
+def run_workers(model_dir, workers, questions, server_url=None):
+    """Run the workers concurrently; returns (latencies in ms, per-worker RSS MB, TF imported)"""
+    env = dict(os.environ, CHATBOT_BACKEND="remote" if server_url else "auto")
+    script = WORKER_SCRIPT.format(
+        repo=REPO_DIR, model_dir=model_dir, server_url=server_url, remote=bool(server_url), questions=questions
+    )
+    procs = [
+        subprocess.Popen([sys.executable, "-c", script], env=env, text=True,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        while proc.stdout.readline().strip() != "ready":
+            if proc.poll() is not None:
+                sys.exit("Worker exited during start-up")
+    for proc in procs:
+        proc.stdin.write("go\n")
+        proc.stdin.flush()
+    results = [json.loads(proc.stdout.readline()) for proc in procs]
+    for proc in procs:
+        proc.wait()
+    latencies = [1000 * t for result in results for t in result["latencies"]]
+    return latencies, [r["rss_mb"] for r in results], any(r["tensorflow_imported"] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--questions", type=int, default=20, help="questions asked by each worker")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    questions = [q for q, _ in load_qa_pairs(limit=args.questions)]
+    print(f"{args.workers} workers x {len(questions)} questions")
+    print(f"{'Mode':<12}{'total RSS MB':>14}{'worker MB':>11}{'server MB':>11}{'p50 ms':>9}{'p99 ms':>9}{'workers import TF':>19}")
+
+    latencies, worker_rss, tf_imported = run_workers(args.model_dir, args.workers, questions)
+    print(f"{'in-process':<12}{sum(worker_rss):>14.0f}{np.mean(worker_rss):>11.0f}{'-':>11}"
+          f"{np.percentile(latencies, 50):>9.1f}{np.percentile(latencies, 99):>9.1f}{str(tf_imported):>19}")
+
+    server, url = start_server(args.model_dir, args.port)
+    try:
+        latencies, worker_rss, tf_imported = run_workers(args.model_dir, args.workers, questions, server_url=url)
+        server_rss = rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+    print(f"{'remote':<12}{sum(worker_rss) + server_rss:>14.0f}{np.mean(worker_rss):>11.0f}{server_rss:>11.0f}"
+          f"{np.percentile(latencies, 50):>9.1f}{np.percentile(latencies, 99):>9.1f}{str(tf_imported):>19}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: speculative decoding with retrieved training answers as drafts
+Decodes CSV questions and paraphrased variants of them (retrieval fast path
+off, so every question is decoded) with plain greedy decoding and with
+speculative_decoding=True at several draft lengths. Checks that the answers
+are identical and reports sequential decoder passes and latency per answer.
+
+Needs the retrieval index (python build_retrieval_index.py).
+
+Usage:
+    python benchmarks/bench_speculative.py [--model-dir model] [--limit 100] [--draft-lengths 4 8 16] [--repeats 3]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from common import load_qa_pairs, timed_answers
+from app import BuffettChatbot, MODEL_DIR
+
+
+def paraphrase(question):
+    """A variant below the retrieval threshold that still shares most words with the CSV question"""
+    return "tell me, " + question.lower().rstrip("?") + " in your view?"
+
+
+def greedy_passes(chatbot, questions):
+    """Sequential decoder passes of plain greedy decoding: one per token, plus the END step"""
+    max_length = chatbot.config["max_length"]
+    lengths = [int(np.count_nonzero(chatbot._evaluate(q))) - 1 for q in questions]
+    return np.mean([length + (length < max_length) for length in lengths])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--limit", type=int, default=100, help="number of CSV questions")
+    parser.add_argument("--draft-lengths", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--repeats", type=int, default=3, help="timing passes (the best is reported)")
+    args = parser.parse_args()
+
+    csv_questions = [q for q, _ in load_qa_pairs()][::10][:args.limit]
+    question_sets = {"CSV questions": csv_questions, "paraphrases": [paraphrase(q) for q in csv_questions]}
+
+    greedy = BuffettChatbot(args.model_dir, use_serving_artifact=False, response_cache_size=0, retrieval_threshold=None)
+    if not greedy.is_loaded():
+        sys.exit(f"Could not load a model from {args.model_dir}")
+    greedy.warm_up(csv_questions[:1])
+    speculative = {}
+    for draft_length in args.draft_lengths:
+        chatbot = BuffettChatbot(
+            args.model_dir, response_cache_size=0, retrieval_threshold=None,
+            speculative_decoding=True, draft_length=draft_length
+        )
+        if chatbot.retrieval_index is None:
+            sys.exit("No retrieval index, run build_retrieval_index.py first")
+        chatbot.warm_up(csv_questions[:1])
+        speculative[draft_length] = chatbot
+
+    mismatches = 0
+    for label, questions in question_sets.items():
+        expected, greedy_ms = timed_answers(greedy, questions, args.repeats)
+        passes = greedy_passes(greedy, questions)
+        print(f"\n{label} ({len(questions)})")
+        print(f"{'Decoding':<20}{'passes/answer':>15}{'ms/answer':>11}{'speed-up':>10}{'identical':>11}")
+        print(f"{'greedy':<20}{passes:>15.1f}{greedy_ms:>11.1f}{'1.00x':>10}{'-':>11}")
+        for draft_length, chatbot in speculative.items():
+            chatbot.speculative_stats = {key: 0 for key in chatbot.speculative_stats}
+            answers, ms = timed_answers(chatbot, questions, args.repeats)
+            stats = chatbot.speculative_stats  # summed over the repeats, so per-answer figures are unaffected
+            same = sum(a == b for a, b in zip(answers, expected))
+            mismatches += len(questions) - same
+            print(f"{f'speculative ({draft_length})':<20}{stats['decoder_calls'] / max(stats['answers'], 1):>15.1f}"
+                  f"{ms:>11.1f}{f'{greedy_ms / ms:.2f}x':>10}{f'{same}/{len(questions)}':>11}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark: decoding strategies (greedy, beam search, top-k, nucleus)
+Reports per-answer latency relative to greedy and checks that beam search
+with a width of 1 reproduces the greedy answers.
+
+Usage:
+    python benchmarks/bench_strategies.py [--model-dir model] [--repeats 3]
+"""
+
+import argparse
+import sys
+
+from common import QUESTIONS, time_answers
+from app import BuffettChatbot, MODEL_DIR
+
+# Strategy name -> BuffettChatbot keyword arguments; the first one is the reference
+STRATEGIES = {
+    "greedy": dict(decoding="greedy"),
+    "beam-1": dict(decoding="beam", beam_width=1, length_penalty=0.0),
+    "beam-4": dict(decoding="beam", beam_width=4),
+    "beam-8": dict(decoding="beam", beam_width=8),
+    "top-k (k=40)": dict(decoding="top_k", top_k=40),
+    "nucleus (p=0.9)": dict(decoding="top_p", top_p=0.9),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {}
+    for name, kwargs in STRATEGIES.items():
+        chatbot = BuffettChatbot(args.model_dir, response_cache_size=0, retrieval_threshold=None, **kwargs)
+        if not chatbot.is_loaded():
+            sys.exit(f"Could not load a model from {args.model_dir}")
+        results[name] = time_answers(chatbot, QUESTIONS, args.repeats)
+
+    greedy_answers, greedy_ms = results["greedy"]
+    print(f"{'Strategy':<18}{'ms/answer':>12}{'vs greedy':>11}")
+    for name, (_, ms) in results.items():
+        print(f"{name:<18}{ms:>12.1f}{ms / greedy_ms:>10.2f}x")
+
+    same = sum(a == b for a, b in zip(results["beam-1"][0], greedy_answers))
+    print(f"beam-1 matches greedy: {same}/{len(QUESTIONS)}")
+    if same != len(QUESTIONS):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: token-by-token streaming (BuffettChatbot.chat_stream) vs. chat()
+For each available backend, reports time-to-first-token and tokens/sec of the
+stream against the latency of the complete chat() answer, and checks that the
+streamed text equals the chat() answer on the training CSV questions.
+
+Usage:
+    python benchmarks/bench_streaming.py [--model-dir model] [--backends tensorflow numpy onnx] [--limit 50]
+"""
+
+import argparse
+import sys
+from time import perf_counter
+
+from common import QUESTIONS, load_qa_pairs, time_answers
+from app import BuffettChatbot, MODEL_DIR
+
+
+def time_stream(chatbot, questions, repeats):
+    """Mean time-to-first-token (ms) and tokens/sec over the streamed answers"""
+    for q in questions:  # warm-up (includes graph tracing)
+        "".join(chatbot.chat_stream(q))
+    first_token, tokens, elapsed = [], 0, 0.0
+    for _ in range(repeats):
+        for q in questions:
+            start = perf_counter()
+            pieces = []
+            for piece in chatbot.chat_stream(q):
+                if not pieces:
+                    first_token.append(perf_counter() - start)
+                pieces.append(piece)
+            elapsed += perf_counter() - start
+            tokens += len("".join(pieces).split())
+    return sum(first_token) * 1000 / len(first_token), tokens / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--backends", nargs="+", default=["tensorflow", "numpy", "onnx"])
+    parser.add_argument("--limit", type=int, default=50, help="number of CSV questions to compare")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    questions = [q for q, _ in load_qa_pairs(limit=args.limit)]
+    mismatches = 0
+    print(f"{'Backend':<12}{'chat() ms':>11}{'first token ms':>16}{'tokens/sec':>12}{'identical':>11}")
+    for backend in args.backends:
+        chatbot = BuffettChatbot(args.model_dir, backend=backend, response_cache_size=0, retrieval_threshold=None)
+        if not chatbot.is_loaded():
+            print(f"{backend:<12}{'not available':>11}")
+            continue
+        _, chat_ms = time_answers(chatbot, QUESTIONS, args.repeats)
+        first_ms, tokens_per_sec = time_stream(chatbot, QUESTIONS, args.repeats)
+        same = sum("".join(chatbot.chat_stream(q)) == chatbot.chat(q) for q in questions)
+        mismatches += len(questions) - same
+        print(f"{backend:<12}{chat_ms:>11.1f}{first_ms:>16.1f}{tokens_per_sec:>12.1f}{f'{same}/{len(questions)}':>11}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: SimpleTokenizer.encode_batch / decode_batch vs. per-sentence lists
+Encodes every normalized question and answer of the training CSV into a
+padded int32 array with encode_batch and with the original loop
+([START] + encode() + [END] per sentence, truncated and copied row by row like
+pad_sequences(padding="post")), at the model's max_length and at a short
+length that truncates most rows. Decodes the rows with decode_batch and with
+decode() per row. Checks that both give identical arrays, lengths and text,
+with the JSON tokenizer and the memory-mapped tokenizer.bin, and exits
+non-zero on any mismatch.
+
+Usage:
+    python benchmarks/bench_tokenizer_batch.py [--model-dir model] [--repeats 5]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+from common import best_seconds, load_qa_pairs
+from app import MODEL_DIR, SimpleTokenizer, resolve_model_dir
+from chatbot_text import normalize_text
+from chatbot_vocab import write_vocab_file
+
+
+def reference_encode(tokenizer, sentences, max_length, start_token, end_token):
+    """The original per-sentence encoding of BuffettChatbot._encode_inputs"""
+    padded = np.zeros((len(sentences), max_length), dtype=np.int32)
+    lengths = np.zeros(len(sentences), dtype=np.int64)
+    for row, sentence in enumerate(sentences):
+        tokens = [start_token] + tokenizer.encode(sentence) + [end_token]
+        lengths[row] = len(tokens)
+        tokens = tokens[-max_length:]
+        padded[row, :len(tokens)] = tokens
+    return padded, lengths
+
+
+def reference_decode(tokenizer, rows):
+    """The original per-row decoding of BuffettChatbot._decode_response"""
+    return [tokenizer.decode([i for i in row if i < tokenizer.vocab_size]) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    model_dir = resolve_model_dir(args.model_dir)
+    with open(os.path.join(model_dir, "config.json"), 'r') as f:
+        config = json.load(f)
+    start_token, end_token = config["start_token"], config["end_token"]
+    sentences = [normalize_text(text) for pair in load_qa_pairs() for text in pair] + ["", "zzqx unknownword"]
+
+    bin_dir = tempfile.mkdtemp()
+    try:
+        shutil.copy(os.path.join(model_dir, "tokenizer.json"), bin_dir)
+        json_path = os.path.join(bin_dir, "tokenizer.json")
+        # The mapping outlives the file, so load the memory-mapped tokenizer first
+        write_vocab_file(json_path)
+        from_bin = SimpleTokenizer.load(json_path)
+        os.remove(os.path.join(bin_dir, "tokenizer.bin"))
+        tokenizers = {"tokenizer.json": SimpleTokenizer.load(json_path), "tokenizer.bin": from_bin}
+    finally:
+        shutil.rmtree(bin_dir, ignore_errors=True)
+
+    mismatches = 0
+    print(f"{len(sentences)} CSV questions and answers")
+    print(f"{'Vocabulary':<16}{'max_length':>11}{'encode loop ms':>16}{'encode_batch ms':>17}"
+          f"{'decode loop ms':>16}{'decode_batch ms':>17}")
+    for label, tokenizer in tokenizers.items():
+        for max_length in (config["max_length"], 8):
+            expected, expected_lengths = reference_encode(tokenizer, sentences, max_length, start_token, end_token)
+            padded, lengths = tokenizer.encode_batch(sentences, max_length, start_token, end_token)
+            mismatches += padded.dtype != np.int32 or not np.array_equal(padded, expected)
+            mismatches += not np.array_equal(lengths, expected_lengths)
+            mismatches += tokenizer.decode_batch(padded) != reference_decode(tokenizer, expected)
+
+            loop_s = best_seconds(lambda: reference_encode(tokenizer, sentences, max_length, start_token, end_token),
+                                  args.repeats)
+            batch_s = best_seconds(lambda: tokenizer.encode_batch(sentences, max_length, start_token, end_token),
+                                   args.repeats)
+            decode_loop_s = best_seconds(lambda: reference_decode(tokenizer, padded), args.repeats)
+            decode_batch_s = best_seconds(lambda: tokenizer.decode_batch(padded), args.repeats)
+            print(f"{label:<16}{max_length:>11}{loop_s * 1e3:>16.2f}{batch_s * 1e3:>17.2f}"
+                  f"{decode_loop_s * 1e3:>16.2f}{decode_batch_s * 1e3:>17.2f}")
+
+    print(f"Parity: {mismatches} mismatches")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
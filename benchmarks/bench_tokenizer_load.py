@@ -0,0 +1,98 @@
+"""
+Benchmark: memory-mapped tokenizer.bin vs. parsing tokenizer.json
+Loads the tokenizer of a model directory from tokenizer.json (two dicts) and
+from tokenizer.bin (memory-mapped, see chatbot_vocab.py) and reports load
+time, Python heap allocated by the load and encode/decode speed over the
+training CSV. Checks that both give identical ids for every normalized CSV
+sentence (plus out-of-vocabulary words) and identical text for every id, and
+that a tokenizer.bin built from another tokenizer.json is ignored. Exits
+non-zero on any mismatch.
+
+Works on a temporary copy of tokenizer.json, so the model directory is not touched.
+
+Usage:
+    python benchmarks/bench_tokenizer_load.py [--model-dir model] [--repeats 20]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+from common import best_seconds, load_qa_pairs
+from app import MODEL_DIR, SimpleTokenizer, resolve_model_dir
+from chatbot_text import normalize_text
+from chatbot_vocab import TOKENIZER_VOCAB_FILE, write_vocab_file
+
+
+def allocated_bytes(fn):
+    """Python heap still allocated by what fn returns"""
+    tracemalloc.start()
+    result = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    json_dir, bin_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    try:
+        for directory in (json_dir, bin_dir):
+            shutil.copy(os.path.join(resolve_model_dir(args.model_dir), "tokenizer.json"), directory)
+        json_path, bin_path = os.path.join(json_dir, "tokenizer.json"), os.path.join(bin_dir, "tokenizer.json")
+        write_vocab_file(bin_path)
+        from_json, from_bin = SimpleTokenizer.load(json_path), SimpleTokenizer.load(bin_path)
+        if from_json.vocab_file is not None or from_bin.vocab_file is None:
+            sys.exit("tokenizer.bin was not picked up")
+
+        sentences = [normalize_text(text) for pair in load_qa_pairs() for text in pair]
+        sentences += ["zzqx unknownword café 🙂 <PAD> <OOV>", ""]
+        ids = list(range(-2, from_json.vocab_size + 3))
+        encode_mismatches = sum(from_json.encode(s) != from_bin.encode(s) for s in sentences)
+        decode_mismatches = sum(from_json.decode([i]) != from_bin.decode([i]) for i in ids)
+        decode_mismatches += sum(from_json.decode(from_json.encode(s)) != from_bin.decode(from_json.encode(s))
+                                 for s in sentences)
+        print(f"Parity over {len(sentences)} sentences and {len(ids)} ids: "
+              f"{encode_mismatches} encode and {decode_mismatches} decode mismatches")
+
+        # A tokenizer.json changed after tokenizer.bin was built must win
+        with open(bin_path, 'r') as f:
+            data = json.load(f)
+        with open(bin_path, 'w') as f:
+            json.dump(data, f, indent=1)
+        stale_ignored = SimpleTokenizer.load(bin_path).vocab_file is None
+        print(f"Stale tokenizer.bin ignored: {stale_ignored}")
+        write_vocab_file(bin_path)
+
+        encoded = [from_json.encode(s) for s in sentences]
+        print(f"\nVocabulary of {from_json.vocab_size} words, "
+              f"tokenizer.json {os.path.getsize(json_path) / 1024:.0f} KiB, "
+              f"{TOKENIZER_VOCAB_FILE} {os.path.getsize(os.path.join(bin_dir, TOKENIZER_VOCAB_FILE)) / 1024:.0f} KiB")
+        print(f"{'Format':<16}{'load ms':>9}{'heap KiB':>10}{'encode us/sent':>16}{'decode us/sent':>16}")
+        for label, path in (("tokenizer.json", json_path), (TOKENIZER_VOCAB_FILE, bin_path)):
+            load_s = best_seconds(lambda: SimpleTokenizer.load(path), args.repeats)
+            heap = allocated_bytes(lambda: SimpleTokenizer.load(path))
+            tokenizer = SimpleTokenizer.load(path)
+            encode_s = best_seconds(lambda: [tokenizer.encode(s) for s in sentences], 3)
+            decode_s = best_seconds(lambda: [tokenizer.decode(t) for t in encoded], 3)
+            print(f"{label:<16}{load_s * 1e3:>9.2f}{heap / 1024:>10.0f}"
+                  f"{encode_s * 1e6 / len(sentences):>16.2f}{decode_s * 1e6 / len(sentences):>16.2f}")
+    finally:
+        shutil.rmtree(json_dir, ignore_errors=True)
+        shutil.rmtree(bin_dir, ignore_errors=True)
+
+    if encode_mismatches or decode_mismatches or not stale_ignored:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: output projection cost with and without the vocabulary shortlist
+Compares the full-vocabulary model against BuffettChatbot(vocab_shortlist=True)
+for the compiled loop and the eager full-recompute path (which now projects only
+the last position), and reports per-answer latency, output-layer FLOPs per
+decode step and exact-match agreement on the training CSV questions.
+
+Needs <model-dir>/vocab_shortlist.json (build_vocab_shortlist.py).
+
+Usage:
+    python benchmarks/bench_vocab_shortlist.py [--model-dir model] [--limit 200]
+"""
+
+import argparse
+import sys
+
+from common import QUESTIONS, load_qa_pairs, time_answers
+from app import BuffettChatbot, MODEL_DIR
+
+PATHS = [
+    ("compiled loop", {}),
+    ("eager recompute", {"compile_generation": False, "use_kv_cache": False}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--limit", type=int, default=200, help="number of CSV questions to compare")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    questions = [q for q, _ in load_qa_pairs(limit=args.limit)]
+    print(f"{'Path':<18}{'full ms':>10}{'shortlist ms':>14}{'speed-up':>10}")
+    for label, kwargs in PATHS:
+        bots = [
+            BuffettChatbot(args.model_dir, backend="tensorflow", use_serving_artifact=False,
+                           vocab_shortlist=shortlist, response_cache_size=0, retrieval_threshold=None, **kwargs)
+            for shortlist in (False, True)
+        ]
+        if not all(bot.is_loaded() for bot in bots):
+            sys.exit(f"Could not load a model from {args.model_dir}")
+        full_ms, short_ms = (time_answers(bot, QUESTIONS, args.repeats)[1] for bot in bots)
+        print(f"{label:<18}{full_ms:>10.1f}{short_ms:>14.1f}{full_ms / short_ms:>9.2f}x")
+
+    model = bots[1].model
+    if model.shortlist_kernel is None:
+        sys.exit("No vocabulary shortlist loaded, run build_vocab_shortlist.py first")
+    d_model, vocab_size = model.final_layer.kernel.shape
+    shortlist_size = model.shortlist_kernel.shape[1]
+    print(f"\nOutput layer per decode step: {2 * d_model * vocab_size / 1e6:.2f} -> "
+          f"{2 * d_model * shortlist_size / 1e6:.2f} MFLOPs ({shortlist_size}/{vocab_size} tokens)")
+
+    full_answers = bots[0].chat_batch(questions)
+    short_answers = bots[1].chat_batch(questions)
+    same = sum(a == b for a, b in zip(full_answers, short_answers))
+    print(f"Identical answers: {same}/{len(questions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Shared helpers for the chatbot benchmarks
+"""
+
+import json
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+QA_CSV = os.path.join(REPO_DIR, "training", "warren_buffett_qa_augmented.csv")
+
+QUESTIONS = [
+    "What is gross margin?",
+    "How do you select stocks?",
+    "What is a good debt to equity ratio?",
+    "Why does Buffett avoid high R&D companies?",
+    "What makes a company a good investment?",
+]
+
+
+def time_answers(chatbot, questions, repeats):
+    """Return the answers and the mean latency per answer in milliseconds"""
+    answers = [chatbot.chat(q) for q in questions]  # warm-up (includes graph tracing)
+    start = perf_counter()
+    for _ in range(repeats):
+        for q in questions:
+            chatbot.chat(q)
+    elapsed = perf_counter() - start
+    return answers, elapsed * 1000 / (repeats * len(questions))
+
+
+def timed_answers(chatbot, questions, repeats=1):
+    """Answers and the best mean latency per answer over repeats passes, in milliseconds (no warm-up)"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = perf_counter()
+        answers = [chatbot.chat(q) for q in questions]
+        best = min(best, (perf_counter() - start) * 1000 / len(questions))
+    return answers, best
+
+
+def generate_tokens(chatbot, questions, batch_size):
+    """Greedy token buffers for all questions, decoded in batches, and the seconds it took"""
+    import numpy as np
+
+    chatbot._evaluate_batch(questions[:batch_size])  # warm-up (includes graph tracing)
+    start = perf_counter()
+    tokens = np.concatenate([
+        np.asarray(chatbot._evaluate_batch(questions[i:i + batch_size]))
+        for i in range(0, len(questions), batch_size)
+    ])
+    return tokens, perf_counter() - start
+
+
+def best_seconds(fn, repeats):
+    """Fastest of repeats calls of fn, in seconds"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = perf_counter()
+        fn()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def load_qa_pairs(csv_path=QA_CSV, limit=None):
+    """Raw (question, answer) pairs from the tab-separated training CSV"""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, delimiter="\t", on_bad_lines="skip")
+    df = df.dropna(subset=[df.columns[0], df.columns[1]])
+    pairs = list(zip(df[df.columns[0]].astype(str), df[df.columns[1]].astype(str)))
+    return pairs[:limit] if limit else pairs
+
+
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {repo!r})
+from app import BuffettChatbot
+chatbot = BuffettChatbot({model_dir!r}, response_cache_size=0, retrieval_threshold=None, **{kwargs!r})
+chatbot.chat("What is gross margin?")
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    # VmHWM (unlike ru_maxrss) is not inherited from the forking parent
+    "peak_rss_mb": int(next(l for l in open("/proc/self/status") if l.startswith("VmHWM")).split()[1]) / 1024,
+    "tensorflow_imported": "tensorflow" in sys.modules,
+}}))
+"""
+
+
+def cold_start(model_dir, env=None, **chatbot_kwargs):
+    """Measure a fresh process from start to first answer (import, model load, generation)"""
+    script = COLD_START_SCRIPT.format(repo=REPO_DIR, model_dir=model_dir, kwargs=chatbot_kwargs)
+    result = subprocess.run(
+        [sys.executable, "-c", script], env=dict(os.environ, **(env or {})),
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
@@ -0,0 +1,43 @@
+"""
+Build the retrieval index for the custom chatbot
+Writes <model-dir>/retrieval/ with a hashed n-gram TF-IDF index of the
+preprocessed training questions and their curated answers. BuffettChatbot
+answers questions that closely match a training question straight from the
+index (see retrieval_threshold) instead of decoding.
+
+Rebuild after editing the training CSV.
+
+Usage:
+    python build_retrieval_index.py [--model-dir model] [--csv training/warren_buffett_qa_augmented.csv]
+"""
+
+import argparse
+import os
+
+import pandas as pd
+
+from app import MODEL_DIR, resolve_model_dir
+from chatbot_retrieval import RETRIEVAL_DIR, build_index
+from chatbot_text import normalize_series
+
+QA_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "training", "warren_buffett_qa_augmented.csv")
+
+
+def build_retrieval_index(model_dir, csv_path=QA_CSV):
+    """Index the question/answer pairs of csv_path into model_dir; returns the number of questions"""
+    df = pd.read_csv(csv_path, delimiter="\t", on_bad_lines="skip").dropna()
+    questions = normalize_series(df[df.columns[0]]).tolist()
+    answers = [a.strip() for a in df[df.columns[1]].astype(str)]
+    return build_index(questions, answers, os.path.join(model_dir, RETRIEVAL_DIR))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--csv", default=QA_CSV)
+    args = parser.parse_args()
+    print(f"✓ Retrieval index saved ({build_retrieval_index(resolve_model_dir(args.model_dir), args.csv)} questions)")
+
+
+if __name__ == "__main__":
+    main()
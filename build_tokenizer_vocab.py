@@ -0,0 +1,31 @@
+"""
+Build the binary tokenizer vocabulary for the custom chatbot
+Writes <model-dir>/tokenizer.bin from <model-dir>/tokenizer.json. The app then
+memory-maps it instead of parsing the JSON into two dicts in every worker (see
+chatbot_vocab.py); it falls back to tokenizer.json while tokenizer.bin is
+missing or was built from a different tokenizer.json.
+
+training/chatbot_model.py writes the same file after training; use this script
+for a model directory trained before the binary vocabulary existed.
+
+Usage:
+    python build_tokenizer_vocab.py [--model-dir model]
+"""
+
+import argparse
+import os
+
+from app import MODEL_DIR, resolve_model_dir
+from chatbot_vocab import VocabularyFile, write_vocab_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args()
+    path = write_vocab_file(os.path.join(resolve_model_dir(args.model_dir), "tokenizer.json"))
+    print(f"✓ Tokenizer vocabulary saved to {path} ({len(VocabularyFile(path))} words)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Build the vocabulary shortlist for the custom chatbot
+Writes <model-dir>/vocab_shortlist.json with the token ids that occur in the
+answers of the training CSV. BuffettChatbot(vocab_shortlist=True) then projects
+each decode step onto those ids only instead of the whole vocabulary.
+
+training/chatbot_model.py writes the same file after training; use this script
+for a model directory trained before the shortlist existed.
+
+Usage:
+    python build_vocab_shortlist.py [--model-dir model] [--csv training/warren_buffett_qa_augmented.csv]
+"""
+
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from app import MODEL_DIR, VOCAB_SHORTLIST_FILE, SimpleTokenizer, resolve_model_dir
+from chatbot_text import normalize_series
+
+QA_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "training", "warren_buffett_qa_augmented.csv")
+
+
+def build_vocab_shortlist(model_dir, csv_path=QA_CSV):
+    """Write the answer vocabulary of csv_path as token ids of model_dir's tokenizer; returns the id count"""
+    tokenizer = SimpleTokenizer.load(os.path.join(model_dir, "tokenizer.json"))
+    df = pd.read_csv(csv_path, delimiter="\t", on_bad_lines="skip").dropna()
+    token_ids = set()
+    for answer in normalize_series(df[df.columns[1]]):
+        token_ids.update(tokenizer.encode(answer))
+    with open(os.path.join(model_dir, VOCAB_SHORTLIST_FILE), 'w') as f:
+        json.dump({"token_ids": sorted(token_ids)}, f)
+    return len(token_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--csv", default=QA_CSV)
+    args = parser.parse_args()
+    print(f"✓ Vocabulary shortlist saved ({build_vocab_shortlist(resolve_model_dir(args.model_dir), args.csv)} tokens)")
+
+
+if __name__ == "__main__":
+    main()
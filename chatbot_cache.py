@@ -0,0 +1,103 @@
+"""
+Response cache for the custom chatbot
+Greedy and beam decoding are deterministic, so an answer only depends on the
+preprocessed question, the generation settings and the model version (a hash
+of the weights and config). Answers are kept in a bounded in-memory LRU and in
+a SQLite file that survives restarts and is shared by every process using the
+same model directory. Rows written for other model versions are deleted when
+the cache is opened, so deploying new weights invalidates it automatically.
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) answer cache for one model version"""
+
+    def __init__(self, version, max_entries=256, path=None):
+        self.version = version
+        self.max_entries = max_entries
+        self.path = path
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+                with self._db:
+                    self._db.execute(
+                        "CREATE TABLE IF NOT EXISTS responses "
+                        "(version TEXT, key TEXT, response TEXT, PRIMARY KEY (version, key))"
+                    )
+                    self._db.execute("DELETE FROM responses WHERE version != ?", (version,))
+            except sqlite3.Error as e:
+                print(f"Response cache on disk unavailable ({e}), caching in memory only")
+                self._db = None
+
+    def _remember(self, key, response):
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Cached response for key, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response FROM responses WHERE version = ? AND key = ?", (self.version, key)
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, response):
+        with self._lock:
+            self._remember(key, response)
+            if self._db is not None:
+                try:
+                    with self._db:
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO responses (version, key, response) VALUES (?, ?, ?)",
+                            (self.version, key, response)
+                        )
+                except sqlite3.Error as e:
+                    print(f"Could not write response cache: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM responses")
+
+    def close(self):
+        """Close the SQLite file; the cache keeps working in memory"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self):
+        """Hit counters since start-up"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
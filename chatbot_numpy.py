@@ -0,0 +1,258 @@
+"""
+Pure-NumPy inference backend for the custom Transformer chatbot
+Reads transformer_weights.weights.h5 directly (via h5py) and runs the same
+encoder/decoder forward pass as the Keras model in app.py, so Streamlit
+workers can answer questions without importing TensorFlow.
+"""
+
+import re
+
+import h5py
+import numpy as np
+
+
+def positional_encoding(position, d_model):
+    """Sinusoidal position table of shape (position, d_model), as in app.py"""
+    pos = np.arange(position)[:, np.newaxis]
+    i = np.arange(d_model)[np.newaxis, :]
+    angle_rads = pos / np.power(10000, (2 * (i // 2)) / np.float32(d_model))
+    angle_rads[:, 0::2] = np.sin(angle_rads[:, 0::2])
+    angle_rads[:, 1::2] = np.cos(angle_rads[:, 1::2])
+    return angle_rads.astype(np.float32)
+
+
+def dense(x, params):
+    kernel, bias = params
+    return x @ kernel + bias
+
+
+def layer_norm(x, params, epsilon=1e-6):
+    gamma, beta = params
+    mean = x.mean(axis=-1, keepdims=True)
+    variance = x.var(axis=-1, keepdims=True)
+    return (x - mean) / np.sqrt(variance + epsilon) * gamma + beta
+
+
+def softmax(x):
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+
+def padding_mask(seq):
+    """1.0 where seq is padding, shaped (batch, 1, 1, seq_len) to broadcast over heads"""
+    return (seq == 0).astype(np.float32)[:, np.newaxis, np.newaxis, :]
+
+
+def look_ahead_mask(size):
+    return np.triu(np.ones((size, size), dtype=np.float32), k=1)
+
+
+class NumpyMultiHeadAttention:
+    def __init__(self, params, num_heads):
+        self.wq, self.wk, self.wv, self.dense = params["wq"], params["wk"], params["wv"], params["dense"]
+        self.num_heads = num_heads
+        self.d_model = self.wq[0].shape[1]
+        self.depth = self.d_model // num_heads
+        self.scale = np.float32(1.0 / np.sqrt(self.depth))
+
+    def split_heads(self, x):
+        batch_size, seq_len, _ = x.shape
+        return x.reshape(batch_size, seq_len, self.num_heads, self.depth).transpose(0, 2, 1, 3)
+
+    def compute_kv(self, v, k):
+        return self.split_heads(dense(k, self.wk)), self.split_heads(dense(v, self.wv))
+
+    def attend(self, q, k, v, mask):
+        batch_size, seq_len, _ = q.shape
+        q = self.split_heads(dense(q, self.wq))
+        logits = (q @ k.transpose(0, 1, 3, 2)) * self.scale
+        if mask is not None:
+            logits += mask * -1e9
+        output = softmax(logits) @ v
+        output = output.transpose(0, 2, 1, 3).reshape(batch_size, seq_len, self.d_model)
+        return dense(output, self.dense)
+
+    def __call__(self, v, k, q, mask):
+        k, v = self.compute_kv(v, k)
+        return self.attend(q, k, v, mask)
+
+
+class NumpyEncoderLayer:
+    def __init__(self, params, num_heads):
+        self.mha = NumpyMultiHeadAttention(params["mha"], num_heads)
+        self.ffn = params["ffn"]
+        self.layernorm1, self.layernorm2 = params["layernorm1"], params["layernorm2"]
+
+    def __call__(self, x, mask):
+        out1 = layer_norm(x + self.mha(x, x, x, mask), self.layernorm1)
+        ffn_output = dense(np.maximum(dense(out1, self.ffn[0]), 0), self.ffn[1])
+        return layer_norm(out1 + ffn_output, self.layernorm2)
+
+
+class NumpyDecoderLayer:
+    def __init__(self, params, num_heads):
+        self.mha1 = NumpyMultiHeadAttention(params["mha1"], num_heads)
+        self.mha2 = NumpyMultiHeadAttention(params["mha2"], num_heads)
+        self.ffn = params["ffn"]
+        self.layernorm1, self.layernorm2, self.layernorm3 = (
+            params["layernorm1"], params["layernorm2"], params["layernorm3"]
+        )
+
+    def _finish(self, x, attn1, enc_k, enc_v, padding_mask):
+        out1 = layer_norm(attn1 + x, self.layernorm1)
+        attn2 = self.mha2.attend(out1, enc_k, enc_v, padding_mask)
+        out2 = layer_norm(attn2 + out1, self.layernorm2)
+        ffn_output = dense(np.maximum(dense(out2, self.ffn[0]), 0), self.ffn[1])
+        return layer_norm(ffn_output + out2, self.layernorm3)
+
+    def __call__(self, x, enc_output, look_ahead_mask, padding_mask):
+        attn1 = self.mha1(x, x, x, look_ahead_mask)
+        enc_k, enc_v = self.mha2.compute_kv(enc_output, enc_output)
+        return self._finish(x, attn1, enc_k, enc_v, padding_mask)
+
+    def call_cached(self, x, cache, position, look_ahead_mask, padding_mask):
+        """Decode the token at position, writing its keys/values into the preallocated cache"""
+        k, v = self.mha1.compute_kv(x, x)
+        cache["self_k"][:, :, position:position + 1] = k
+        cache["self_v"][:, :, position:position + 1] = v
+        attn1 = self.mha1.attend(
+            x, cache["self_k"][:, :, :position + 1], cache["self_v"][:, :, :position + 1], look_ahead_mask
+        )
+        return self._finish(x, attn1, cache["enc_k"], cache["enc_v"], padding_mask)
+
+
+class NumpyTransformer:
+    """NumPy mirror of app.Transformer for inference only (no dropout)"""
+
+    def __init__(self, params, config):
+        self.config = config
+        self.d_model = config["d_model"]
+        self.num_heads = config["num_heads"]
+        # The sqrt(d_model) embedding scale is folded into the matrices once at load
+        embedding_scale = np.float32(np.sqrt(self.d_model))
+        self.enc_embedding = params["encoder"]["embedding"] * embedding_scale
+        self.dec_embedding = params["decoder"]["embedding"] * embedding_scale
+        self.enc_layers = [NumpyEncoderLayer(p, self.num_heads) for p in params["encoder"]["layers"]]
+        self.dec_layers = [NumpyDecoderLayer(p, self.num_heads) for p in params["decoder"]["layers"]]
+        self.final_layer = params["final_layer"]
+        # Only positions up to max_length (+1 for the decoder's START token) are ever used
+        self.pos_encoding = positional_encoding(config["max_length"] + 1, self.d_model)
+
+    @classmethod
+    def load(cls, weights_path, config):
+        """Read a Keras 3 .weights.h5 file saved from app.Transformer"""
+        with h5py.File(weights_path, "r") as f:
+            def dense_vars(group):
+                return (group["vars/0"][()], group["vars/1"][()])
+
+            def sublayers(group):
+                # Keras names list entries decoder_layer, decoder_layer_1, ... in creation order
+                def index(name):
+                    match = re.search(r"_(\d+)$", name)
+                    return int(match.group(1)) if match else 0
+                return [group[name] for name in sorted(group.keys(), key=index)]
+
+            def mha_vars(group):
+                return {name: dense_vars(group[name]) for name in ("wq", "wk", "wv", "dense")}
+
+            def ffn_vars(group):
+                return [dense_vars(layer) for layer in sublayers(group["layers"])]
+
+            params = {
+                "encoder": {
+                    "embedding": f["encoder/embedding/vars/0"][()],
+                    "layers": [
+                        {
+                            "mha": mha_vars(layer["mha"]),
+                            "ffn": ffn_vars(layer["ffn"]),
+                            "layernorm1": dense_vars(layer["layernorm1"]),
+                            "layernorm2": dense_vars(layer["layernorm2"]),
+                        }
+                        for layer in sublayers(f["encoder/enc_layers"])
+                    ],
+                },
+                "decoder": {
+                    "embedding": f["decoder/embedding/vars/0"][()],
+                    "layers": [
+                        {
+                            "mha1": mha_vars(layer["mha1"]),
+                            "mha2": mha_vars(layer["mha2"]),
+                            "ffn": ffn_vars(layer["ffn"]),
+                            "layernorm1": dense_vars(layer["layernorm1"]),
+                            "layernorm2": dense_vars(layer["layernorm2"]),
+                            "layernorm3": dense_vars(layer["layernorm3"]),
+                        }
+                        for layer in sublayers(f["decoder/dec_layers"])
+                    ],
+                },
+                "final_layer": dense_vars(f["final_layer"]),
+            }
+        return cls(params, config)
+
+    def encode(self, inp):
+        enc_padding_mask = padding_mask(inp)
+        x = self.enc_embedding[inp] + self.pos_encoding[:inp.shape[1]]
+        for layer in self.enc_layers:
+            x = layer(x, enc_padding_mask)
+        return x, enc_padding_mask
+
+    def __call__(self, inp, tar):
+        """Full-sequence logits, equivalent to app.Transformer((inp, tar), training=False)"""
+        enc_output, enc_padding_mask = self.encode(inp)
+        combined_mask = np.maximum(padding_mask(tar), look_ahead_mask(tar.shape[1]))
+        x = self.dec_embedding[tar] + self.pos_encoding[:tar.shape[1]]
+        for layer in self.dec_layers:
+            x = layer(x, enc_output, combined_mask, enc_padding_mask)
+        return dense(x, self.final_layer)
+
+    def greedy_steps(self, inp, start_token, end_token, max_length):
+        """Greedy decoding with preallocated token and key/value buffers, one step at a time.
+
+        Yields the (batch,) token ids written at each position; rows that have
+        finished (including the step that produced END) yield 0. Stops once
+        every row has emitted END or max_length tokens were decoded.
+        """
+        inp = np.asarray(inp, dtype=np.int32)
+        batch_size = inp.shape[0]
+        depth = self.d_model // self.num_heads
+        enc_output, enc_padding_mask = self.encode(inp)
+
+        caches = []
+        for layer in self.dec_layers:
+            enc_k, enc_v = layer.mha2.compute_kv(enc_output, enc_output)
+            caches.append({
+                "self_k": np.zeros((batch_size, self.num_heads, max_length, depth), dtype=np.float32),
+                "self_v": np.zeros((batch_size, self.num_heads, max_length, depth), dtype=np.float32),
+                "enc_k": enc_k,
+                "enc_v": enc_v,
+            })
+        tokens = np.zeros((batch_size, max_length + 1), dtype=np.int32)
+        tokens[:, 0] = start_token
+        finished = np.zeros(batch_size, dtype=bool)
+
+        for i in range(max_length):
+            # Decoded padding tokens stay masked, exactly like the full-sequence call
+            self_mask = padding_mask(tokens[:, :i + 1])
+            x = self.dec_embedding[tokens[:, i:i + 1]] + self.pos_encoding[i]
+            for layer, cache in zip(self.dec_layers, caches):
+                x = layer.call_cached(x, cache, i, self_mask, enc_padding_mask)
+            predicted_id = dense(x[:, -1], self.final_layer).argmax(axis=-1).astype(np.int32)
+            finished |= predicted_id == end_token
+            tokens[:, i + 1] = np.where(finished, 0, predicted_id)
+            yield tokens[:, i + 1]
+            if finished.all():
+                break
+
+    def greedy_generate(self, inp, start_token, end_token, max_length):
+        """Greedy decoding to a token buffer.
+
+        Returns the same (batch, max_length + 1) layout as app.Transformer.greedy_generate:
+        START at index 0 and zeros after each row's END token.
+        """
+        tokens = np.zeros((len(inp), max_length + 1), dtype=np.int32)
+        tokens[:, 0] = start_token
+        for i, step_tokens in enumerate(self.greedy_steps(inp, start_token, end_token, max_length)):
+            tokens[:, i + 1] = step_tokens
+        return tokens
@@ -0,0 +1,77 @@
+"""
+ONNX Runtime inference backend for the custom Transformer chatbot
+Runs the encoder and decoder-step graphs written by export_onnx_model.py on
+the onnxruntime CPU provider, without importing TensorFlow.
+"""
+
+import os
+
+import numpy as np
+import onnxruntime as ort
+
+# ONNX graphs live in this subdirectory of the model directory
+ONNX_DIR = "onnx"
+
+
+class OnnxTransformer:
+    """Greedy generation over exported encoder/decoder-step ONNX graphs"""
+
+    def __init__(self, encoder, decoder_step, config):
+        self.encoder = encoder
+        self.decoder_step = decoder_step
+        self.config = config
+        self.num_heads = config["num_heads"]
+        self.depth = config["d_model"] // self.num_heads
+        self.encoder_inputs = [i.name for i in encoder.get_inputs()]
+        self.decoder_inputs = [i.name for i in decoder_step.get_inputs()]
+
+    @classmethod
+    def load(cls, onnx_dir, config, intra_op_threads=0, inter_op_threads=0):
+        """Create CPU sessions; a thread count of 0 lets onnxruntime choose"""
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+
+        def session(name):
+            return ort.InferenceSession(
+                os.path.join(onnx_dir, name), sess_options=options, providers=["CPUExecutionProvider"]
+            )
+
+        return cls(session("encoder.onnx"), session("decoder_step.onnx"), config)
+
+    def greedy_steps(self, inp, start_token, end_token, max_length):
+        """Greedy decoding one step at a time; yields the (batch,) token ids of each
+        position, with 0 for rows that have finished (as NumpyTransformer.greedy_steps)"""
+        inp = np.asarray(inp, dtype=np.int32)
+        batch_size = inp.shape[0]
+        enc_padding_mask, *enc_kv = self.encoder.run(None, {self.encoder_inputs[0]: inp})
+
+        cache_shape = (batch_size, self.num_heads, max_length + 1, self.depth)
+        self_kv = [np.zeros(cache_shape, dtype=np.float32) for _ in range(len(enc_kv))]
+        tokens = np.zeros((batch_size, max_length + 1), dtype=np.int32)
+        tokens[:, 0] = start_token
+        finished = np.zeros(batch_size, dtype=bool)
+
+        for i in range(max_length):
+            # Per layer the graph takes enc_k, enc_v, self_k, self_v in that order
+            caches = []
+            for layer in range(len(enc_kv) // 2):
+                caches += enc_kv[2 * layer:2 * layer + 2] + self_kv[2 * layer:2 * layer + 2]
+            values = [tokens, np.array(i, dtype=np.int32), enc_padding_mask] + caches
+            logits, *self_kv = self.decoder_step.run(None, dict(zip(self.decoder_inputs, values)))
+            predicted_id = logits.argmax(axis=-1).astype(np.int32)
+            finished |= predicted_id == end_token
+            tokens[:, i + 1] = np.where(finished, 0, predicted_id)
+            yield tokens[:, i + 1]
+            if finished.all():
+                break
+
+    def greedy_generate(self, inp, start_token, end_token, max_length):
+        """Greedy decoding with the same (batch, max_length + 1) output layout as the other backends"""
+        tokens = np.zeros((len(inp), max_length + 1), dtype=np.int32)
+        tokens[:, 0] = start_token
+        for i, step_tokens in enumerate(self.greedy_steps(inp, start_token, end_token, max_length)):
+            tokens[:, i + 1] = step_tokens
+        return tokens
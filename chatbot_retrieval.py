@@ -0,0 +1,146 @@
+"""
+Retrieval fast path for the custom chatbot
+Many questions are near-duplicates of the curated training Q&A pairs, so
+BuffettChatbot first looks the preprocessed question up in a TF-IDF index of
+the training questions and returns the curated answer when the cosine
+similarity clears a threshold, skipping autoregressive decoding entirely.
+
+Questions are represented by hashed word unigrams and bigrams (plus
+character trigrams, which tolerate typos). The index is built offline with
+build_retrieval_index.py and stored as an inverted index of .npy arrays in
+<model-dir>/retrieval/, which are memory-mapped at load time.
+"""
+
+import json
+import os
+import threading
+import zlib
+
+import numpy as np
+
+RETRIEVAL_DIR = "retrieval"
+
+
+def hashed_features(text, n_features, char_ngrams=3):
+    """Feature ids of a preprocessed sentence (with repeats for term counts)"""
+    words = text.split()
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    if char_ngrams:
+        for word in words:
+            padded = f"<{word}>"
+            grams += [f"c:{padded[i:i + char_ngrams]}" for i in range(len(padded) - char_ngrams + 1)]
+    # crc32 rather than hash(): Python's string hash is salted per process
+    return np.array([zlib.crc32(g.encode("utf-8")) % n_features for g in grams], dtype=np.int64)
+
+
+def _tfidf(features, idf):
+    """Unique feature ids and their L2-normalized TF-IDF weights"""
+    ids, counts = np.unique(features, return_counts=True)
+    weights = counts * idf[ids]
+    norm = np.linalg.norm(weights)
+    return ids, (weights / norm if norm else weights).astype(np.float32)
+
+
+def build_index(questions, answers, path, n_features=2**18, char_ngrams=3):
+    """Write an index of preprocessed questions (and their raw answers) to the directory path"""
+    os.makedirs(path, exist_ok=True)
+    features = [hashed_features(q, n_features, char_ngrams) for q in questions]
+
+    # Smoothed inverse document frequency, as in scikit-learn's TfidfVectorizer
+    df = np.zeros(n_features, dtype=np.int64)
+    for f in features:
+        df[np.unique(f)] += 1
+    idf = (np.log((1 + len(questions)) / (1 + df)) + 1).astype(np.float32)
+
+    # Inverted index: for each feature, the documents that contain it and their weights
+    doc_ids, feature_ids, weights = [], [], []
+    for doc, f in enumerate(features):
+        ids, w = _tfidf(f, idf)
+        doc_ids.append(np.full(len(ids), doc, dtype=np.int32))
+        feature_ids.append(ids)
+        weights.append(w)
+    doc_ids, feature_ids, weights = np.concatenate(doc_ids), np.concatenate(feature_ids), np.concatenate(weights)
+    order = np.argsort(feature_ids, kind="stable")
+    indptr = np.zeros(n_features + 1, dtype=np.int64)
+    np.cumsum(np.bincount(feature_ids, minlength=n_features), out=indptr[1:])
+
+    np.save(os.path.join(path, "idf.npy"), idf)
+    np.save(os.path.join(path, "indptr.npy"), indptr)
+    np.save(os.path.join(path, "doc_ids.npy"), doc_ids[order])
+    np.save(os.path.join(path, "weights.npy"), weights[order])
+
+    # Paraphrased questions share answers, so each answer is stored once
+    unique_answers = list(dict.fromkeys(answers))
+    answer_index = {answer: i for i, answer in enumerate(unique_answers)}
+    with open(os.path.join(path, "corpus.json"), 'w') as f:
+        json.dump({
+            "n_features": n_features,
+            "char_ngrams": char_ngrams,
+            "questions": list(questions),
+            "answers": unique_answers,
+            "answer_ids": [answer_index[a] for a in answers],
+        }, f)
+    return len(questions)
+
+
+class RetrievalIndex:
+    """Memory-mapped TF-IDF index over the training questions"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "corpus.json"), 'r') as f:
+            corpus = json.load(f)
+        self.n_features = corpus["n_features"]
+        self.char_ngrams = corpus["char_ngrams"]
+        self.questions = corpus["questions"]
+        self.answers = corpus["answers"]
+        self.answer_ids = corpus["answer_ids"]
+        self.idf = np.load(os.path.join(path, "idf.npy"), mmap_mode="r")
+        self.indptr = np.load(os.path.join(path, "indptr.npy"), mmap_mode="r")
+        self.doc_ids = np.load(os.path.join(path, "doc_ids.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(path, "weights.npy"), mmap_mode="r")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, model_dir):
+        """The index in model_dir, or None if build_retrieval_index.py has not been run"""
+        path = os.path.join(model_dir, RETRIEVAL_DIR)
+        if not os.path.exists(os.path.join(path, "corpus.json")):
+            return None
+        return cls(path)
+
+    def scores(self, text):
+        """Cosine similarity of a preprocessed sentence to every training question"""
+        ids, query = _tfidf(hashed_features(text, self.n_features, self.char_ngrams), self.idf)
+        # Gather the posting lists of all query features in one go and accumulate per document
+        starts, ends = self.indptr[ids], self.indptr[ids + 1]
+        lengths = ends - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return np.bincount(
+            self.doc_ids[positions], weights=np.repeat(query, lengths) * self.weights[positions],
+            minlength=len(self.questions)
+        )
+
+    def search(self, text):
+        """(index of the most similar training question, cosine similarity) for a preprocessed sentence"""
+        scores = self.scores(text)
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def lookup(self, text, threshold):
+        """Curated answer for a preprocessed sentence if its best match clears threshold, else None"""
+        best, score = self.search(text)
+        with self._lock:
+            if score >= threshold:
+                self.hits += 1
+                return self.answers[self.answer_ids[best]]
+            self.misses += 1
+            return None
+
+    def stats(self):
+        """Hit counters since start-up"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
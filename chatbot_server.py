@@ -0,0 +1,171 @@
+"""
+Local inference server for the custom chatbot
+One process owns the BuffettChatbot model (and TensorFlow); Streamlit workers
+started with CHATBOT_BACKEND=remote send questions to it over localhost HTTP
+instead of each loading their own copy (see RemoteChatbot in app.py).
+Concurrent /chat requests are micro-batched into shared decodes, and a new
+version published to the model directory is swapped in without a restart
+(see publish_model_version.py).
+
+Endpoints (JSON bodies):
+    GET  /health       -> {"loaded": bool, "backend": str, "config": {...}, "generation_stats": {...},
+                           "model_version": str, "hot_swaps": int}
+    POST /chat         {"message": str}      -> {"response": str}
+    POST /chat_batch   {"messages": [str]}   -> {"responses": [str]}
+    POST /chat_stream  {"message": str}      -> one JSON string per line, sent as decoded
+
+POST bodies may add "timeout" (seconds): decoding stops at the deadline and the
+partial answer is returned. A /chat_stream client that disconnects cancels its
+decoding.
+
+Usage:
+    python chatbot_server.py [--model-dir model] [--host 127.0.0.1] [--port 8765] [--backend auto]
+                             [--max-batch-size 8] [--max-wait-ms 5] [--response-cache-size 256]
+                             [--no-retrieval] [--generation-timeout SECONDS] [--hot-swap-interval SECONDS]
+    CHATBOT_BACKEND=remote streamlit run app.py
+"""
+
+import argparse
+import json
+import math
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def is_valid_timeout(value):
+    """Whether a request's timeout is a finite, non-negative number of seconds"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value >= 0
+
+
+class ChatbotRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps client connections open and allows chunked streaming
+    protocol_version = "HTTP/1.1"
+    # ChatbotHotSwap; each request answers on the version that is current when it arrives
+    hot_swap = None
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json({"error": "not found"}, status=404)
+            return
+        with self.hot_swap.use() as chatbot:
+            self._send_json({
+                "loaded": chatbot.is_loaded(),
+                "backend": chatbot.backend,
+                "config": chatbot.config,
+                "generation_stats": chatbot.generation_stats(),
+                "model_version": os.path.basename(self.hot_swap.version_dir),
+                "hot_swaps": self.hot_swap.swaps,
+            })
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+        except ValueError:
+            self._send_json({"error": "invalid JSON"}, status=400)
+            return
+
+        if not isinstance(request, dict):
+            self._send_json({"error": "expected a JSON object"}, status=400)
+            return
+        timeout = request.get("timeout")
+        if timeout is not None and not is_valid_timeout(timeout):
+            self._send_json({"error": "timeout must be a non-negative number of seconds"}, status=400)
+            return
+        message, messages = request.get("message", ""), request.get("messages", [])
+        if self.path in ("/chat", "/chat_stream") and not isinstance(message, str):
+            self._send_json({"error": "message must be a string"}, status=400)
+            return
+        if self.path == "/chat_batch" and not (
+            isinstance(messages, list) and all(isinstance(m, str) for m in messages)
+        ):
+            self._send_json({"error": "messages must be a list of strings"}, status=400)
+            return
+        with self.hot_swap.use() as chatbot:
+            if self.path == "/chat":
+                self._send_json({"response": chatbot.chat(message, timeout=timeout)})
+            elif self.path == "/chat_batch":
+                self._send_json({"responses": chatbot.chat_batch(messages, timeout=timeout)})
+            elif self.path == "/chat_stream":
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                stream = chatbot.chat_stream(message, timeout=timeout)
+                try:
+                    for piece in stream:
+                        self._write_chunk(json.dumps(piece).encode("utf-8") + b"\n")
+                    self._write_chunk(b"")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client went away (e.g. a newer question in the UI): stop decoding for it
+                    stream.close()
+            else:
+                self._send_json({"error": "not found"}, status=404)
+
+    def log_message(self, format, *args):
+        # One line per request on stderr is too noisy under load
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=None, help="defaults to app.MODEL_DIR")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--backend", default="auto", choices=["auto", "tensorflow", "numpy", "onnx"])
+    parser.add_argument("--max-batch-size", type=int, default=8,
+                        help="coalesce up to this many concurrent /chat requests into one decode (1 = off)")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="how long a request waits for others to batch with")
+    parser.add_argument("--response-cache-size", type=int, default=256, help="answers kept in memory (0 = no cache)")
+    parser.add_argument("--no-retrieval", action="store_true", help="always decode, even for training questions")
+    parser.add_argument("--generation-timeout", type=float, default=None,
+                        help="default per-request deadline in seconds (requests with one skip micro-batching)")
+    parser.add_argument("--hot-swap-interval", type=float, default=None,
+                        help="seconds between checks for a new model version (0 = never; "
+                             "defaults to CHATBOT_HOT_SWAP_INTERVAL)")
+    args = parser.parse_args()
+
+    # app.py reads the backend at import time, and the server must never run in remote mode itself
+    os.environ["CHATBOT_BACKEND"] = args.backend
+    from app import CHATBOT_HOT_SWAP_INTERVAL, ChatbotHotSwap, MODEL_DIR
+
+    retrieval = {"retrieval_threshold": None} if args.no_retrieval else {}
+    interval = CHATBOT_HOT_SWAP_INTERVAL if args.hot_swap_interval is None else args.hot_swap_interval
+    warmup = ChatbotHotSwap(
+        args.model_dir or MODEL_DIR, poll_seconds=interval, max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms, response_cache_size=args.response_cache_size,
+        generation_timeout=args.generation_timeout, **retrieval
+    )
+    warmup.wait()
+    if warmup.chatbot is None or not warmup.chatbot.is_loaded():
+        raise SystemExit(f"Could not load a model from {args.model_dir or MODEL_DIR}")
+    ChatbotRequestHandler.hot_swap = warmup
+
+    server = ThreadingHTTPServer((args.host, args.port), ChatbotRequestHandler)
+    print(f"✓ Chatbot server ({warmup.chatbot.backend}) listening on http://{args.host}:{args.port}, "
+          f"warm-up took {warmup.seconds:.1f}s", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
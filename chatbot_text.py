@@ -0,0 +1,106 @@
+"""
+Text normalization for the custom chatbot
+One definition shared by the app (questions, cache keys, retrieval) and the
+training scripts (the Q&A corpus), so a model is always queried with text
+normalized the way it was trained on.
+
+A sentence is lowercased, contractions are expanded ("what's" -> "what is",
+"n't" -> " not", ...), and it is split into words of letters, digits and "%"
+and the punctuation marks ? . ! , which become separate words; everything
+else separates words. This is computed with one compiled scan over all
+contractions (with a dictionary lookup for the replacement, skipped for text
+without an apostrophe) and a byte translation table instead of a regex for the
+word split, where the original applied one re.sub pass per rule.
+
+The output matches those passes on the whole training corpus and the edge
+cases in benchmarks/bench_normalizer.py, but not on every possible string:
+where contractions overlap, one scan takes the leftmost match while the passes
+applied rules in order, each to the previous pass's output. For example
+"n'that's" becomes "nothat s" here and "nothat is" with the passes. Such
+strings do not occur in ordinary text.
+"""
+
+import codecs
+import re
+
+# In the order the original passes applied them
+CONTRACTIONS = {
+    "i'm": "i am",
+    "he's": "he is",
+    "she's": "she is",
+    "it's": "it is",
+    "that's": "that is",
+    "what's": "what is",
+    "where's": "where is",
+    "how's": "how is",
+    "'ll": " will",
+    "'ve": " have",
+    "'re": " are",
+    "'d": " would",
+    "won't": "will not",
+    "can't": "cannot",
+    "n't": " not",
+    "n'": "ng",
+    "'bout": "about",
+}
+
+# One scan takes the leftmost match, where the passes took the earliest rule:
+# "won't" / "can't" are tried before "n't", which is tried before "n'", and
+# "n'" yields to the earlier "'ll", "'ve", "'re" and "'d" rules it overlaps.
+# Overlaps between other rules (see the module docstring) are not reordered.
+_CONTRACTION_RE = re.compile(
+    "|".join(re.escape(c) if c != "n'" else r"n'(?!ll|ve|re|d)" for c in CONTRACTIONS)
+)
+_PUNCTUATION = [(mark, b" " + mark + b" ") for mark in (b"?", b".", b"!", b",")]
+_WORD_BYTES = b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789%?.!,"
+# ASCII bytes that are not part of a word become spaces
+_WORD_TABLE = bytes(c if c in _WORD_BYTES else ord(" ") for c in range(256))
+# Joins the sentences of normalize_series, which keeps it through the translation
+_SEPARATOR = "\x00"
+_COLUMN_TABLE = bytes(c if c in _WORD_BYTES + _SEPARATOR.encode("ascii") else ord(" ") for c in range(256))
+# Characters still outside ASCII after lower() are never part of a word
+_NON_ASCII_AS_SPACE = "chatbot_text.space"
+codecs.register_error(_NON_ASCII_AS_SPACE, lambda error: (" ", error.end))
+
+
+def _expand(match):
+    return CONTRACTIONS[match.group()]
+
+
+def _expand_contractions(text):
+    return _CONTRACTION_RE.sub(_expand, text) if "'" in text else text
+
+
+def _spaced_words(text, table):
+    """text as ASCII bytes with every non-word character a space and ? . ! , spaced out"""
+    data = text.encode("ascii", errors=_NON_ASCII_AS_SPACE).translate(table)
+    for mark, spaced in _PUNCTUATION:
+        data = data.replace(mark, spaced)
+    return data
+
+
+def normalize_text(sentence):
+    """Lowercase sentence, expand contractions and space-separate words and ? . ! ,"""
+    if not isinstance(sentence, str):
+        sentence = str(sentence)
+    return b" ".join(_spaced_words(_expand_contractions(sentence.lower()), _WORD_TABLE).split()).decode("ascii")
+
+
+def normalize_series(sentences):
+    """normalize_text over a pandas Series (or any iterable), returned as a Series with the same index.
+
+    The sentences are joined so the translation and word split run once over the
+    whole column instead of once per row.
+    """
+    import pandas as pd
+
+    sentences = pd.Series(sentences)
+    # Like str(): astype(str) keeps missing values as NaN in recent pandas versions
+    texts = [_expand_contractions(text.lower() if isinstance(text, str) else str(text).lower())
+             for text in sentences.tolist()]
+    text = _SEPARATOR.join(texts)
+    if text.count(_SEPARATOR) != len(texts) - 1:
+        text = _SEPARATOR.join(t.replace(_SEPARATOR, " ") for t in texts)
+    words = b" ".join(_spaced_words(text, _COLUMN_TABLE).split()).decode("ascii")
+    normalized = [sentence.strip() for sentence in words.split(_SEPARATOR)] if texts else []
+    return pd.Series(normalized, index=sentences.index, dtype=object)
@@ -0,0 +1,183 @@
+"""
+Compact binary vocabulary for the custom chatbot tokenizer
+tokenizer.json stores the vocabulary twice (word2idx and idx2word with string
+keys), and loading it builds two Python dicts with an entry per word in every
+worker process. tokenizer.bin holds the same vocabulary as:
+
+    header   magic, format version, word count, hash table size, blob size and
+             the size and modification time of the tokenizer.json it was built from
+    offsets  uint32[words + 1]: the UTF-8 bytes of word id i are blob[offsets[i]:offsets[i + 1]]
+    table    int32[table size]: open-addressing hash table (crc32, linear probing)
+             of word ids, -1 for an empty slot
+    blob     the UTF-8 bytes of all words, in id order
+
+The file is memory-mapped read-only, so loading it costs the same whatever the
+vocabulary size and all workers on a machine share its pages through the page
+cache. Words are looked up by hashing their bytes and comparing against the
+blob, ids are decoded by slicing the blob. Whether the file still matches
+tokenizer.json is checked with one stat() of the JSON, never by reading it, so
+copy model directories with tools that keep modification times (cp -p,
+shutil.copytree); otherwise the app falls back to tokenizer.json until
+tokenizer.bin is rebuilt.
+
+training/chatbot_model.py writes the file next to tokenizer.json; use
+build_tokenizer_vocab.py for a model directory trained before it existed.
+
+pad_token_ids lays out the ids of a batch of sentences as the padded int32
+array the models take, for SimpleTokenizer.encode_batch in the app and in the
+training script.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from functools import lru_cache
+
+import numpy as np
+
+TOKENIZER_VOCAB_FILE = "tokenizer.bin"
+
+_MAGIC = b"BVOC"
+_VERSION = 2
+# Padded to 64 bytes so the arrays after it stay aligned
+_HEADER = struct.Struct("<4sIIIIQq28x")
+# Distinct words (and ids) whose lookup (and decoding) VocabularyFile memoizes per process
+_LOOKUP_CACHE_SIZE = 1 << 16
+
+
+def _json_stamp(json_path):
+    """(size, mtime in ns) of tokenizer.json, which tokenizer.bin records at build time"""
+    stat = os.stat(json_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_vocab_file(json_path, path=None):
+    """Write the vocabulary of the tokenizer.json at json_path as tokenizer.bin next to it (or to path)"""
+    with open(json_path, 'r') as f:
+        word2idx = json.load(f)['word2idx']
+    words = [None] * len(word2idx)
+    for word, idx in word2idx.items():
+        if not 0 <= idx < len(words) or words[idx] is not None:
+            raise ValueError(f"{json_path}: token ids are not 0..{len(words) - 1}")
+        words[idx] = word.encode("utf-8")
+
+    offsets = array("I", [0])
+    for word in words:
+        offsets.append(offsets[-1] + len(word))
+    table_size = 1 << max(len(words) * 2 - 1, 1).bit_length()  # load factor <= 0.5
+    table = array("i", [-1]) * table_size
+    for idx, word in enumerate(words):
+        slot = zlib.crc32(word) & (table_size - 1)
+        while table[slot] != -1:
+            slot = (slot + 1) & (table_size - 1)
+        table[slot] = idx
+    if sys.byteorder != "little":
+        offsets.byteswap()
+        table.byteswap()
+
+    path = path or os.path.join(os.path.dirname(json_path), TOKENIZER_VOCAB_FILE)
+    blob = b"".join(words)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(words), table_size, len(blob), *_json_stamp(json_path)))
+        f.write(offsets.tobytes())
+        f.write(table.tobytes())
+        f.write(blob)
+    # Workers may be mapping the old file, so replace it rather than rewriting it in place
+    os.replace(tmp_path, path)
+    return path
+
+
+class VocabularyFile:
+    """Read-only, memory-mapped tokenizer.bin"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_words, table_size, blob_size, *json_stamp = _HEADER.unpack_from(self._mmap)
+        self.json_stamp = tuple(json_stamp)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a version {_VERSION} tokenizer vocabulary")
+        offsets_end = _HEADER.size + 4 * (n_words + 1)
+        table_end = offsets_end + 4 * table_size
+        if len(self._mmap) != table_end + blob_size:
+            raise ValueError(f"{path} is truncated")
+        # Zero-copy views of the mapping
+        view = memoryview(self._mmap)
+        self._offsets = view[_HEADER.size:offsets_end].cast("I")
+        self._table = view[offsets_end:table_end].cast("i")
+        self._blob_start = table_end
+        self._mask = table_size - 1
+        self._size = n_words
+        # Only the words a process actually uses end up as Python objects
+        self.lookup = lru_cache(maxsize=_LOOKUP_CACHE_SIZE)(self._probe)
+        self.word = lru_cache(maxsize=_LOOKUP_CACHE_SIZE)(self._decode)
+
+    @classmethod
+    def load(cls, json_path):
+        """The tokenizer.bin next to json_path, or None if it is missing, unreadable or built from another tokenizer.json"""
+        path = os.path.join(os.path.dirname(json_path), TOKENIZER_VOCAB_FILE)
+        if sys.byteorder != "little" or not os.path.exists(path):
+            return None
+        try:
+            vocab = cls(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        if vocab.json_stamp != _json_stamp(json_path):
+            print(f"{path} was built from a different tokenizer.json, run build_tokenizer_vocab.py; using the JSON")
+            return None
+        return vocab
+
+    def __len__(self):
+        return self._size
+
+    def _word_bytes(self, idx):
+        start = self._blob_start
+        return self._mmap[start + self._offsets[idx]:start + self._offsets[idx + 1]]
+
+    def _probe(self, word, default=None):
+        """Id of word, or default"""
+        data = word.encode("utf-8")
+        slot = zlib.crc32(data) & self._mask
+        table = self._table
+        while table[slot] != -1:
+            if self._word_bytes(table[slot]) == data:
+                return table[slot]
+            slot = (slot + 1) & self._mask
+        return default
+
+    def _decode(self, idx):
+        """Word of id idx (0 <= idx < len(self))"""
+        return self._word_bytes(idx).decode("utf-8")
+
+
+def pad_token_ids(ids, counts, max_length, start_token=None, end_token=None):
+    """Pack the token ids of several sentences into a zero-padded (len(counts), max_length) int32 array.
+
+    ids holds the ids of all sentences back to back and counts the number of ids
+    of each. Every row is [start_token] + ids + [end_token] (either left out when
+    None), and like pad_sequences(padding="post") an overlong row keeps its last
+    max_length tokens. Returns the array and the untruncated length of each row.
+    """
+    ids = np.asarray(ids, dtype=np.int32)
+    counts = np.asarray(counts, dtype=np.int64)
+    has_start = start_token is not None
+    lengths = counts + has_start + (end_token is not None)
+    dropped = np.maximum(lengths - max_length, 0)
+    padded = np.zeros((len(counts), max_length), dtype=np.int32)
+
+    # Column of every id in its row: its position in the sentence, after START, minus the truncated front
+    rows = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    columns = np.arange(len(ids)) - np.repeat(starts - has_start + dropped, counts)
+    kept = columns >= 0
+    padded[rows[kept], columns[kept]] = ids[kept]
+    if has_start:
+        padded[dropped == 0, 0] = start_token
+    if end_token is not None:
+        padded[np.arange(len(counts)), np.minimum(lengths, max_length) - 1] = end_token
+    return padded, lengths
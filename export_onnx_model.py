@@ -0,0 +1,98 @@
+"""
+Export the custom chatbot Transformer to ONNX
+Writes two graphs to <model-dir>/onnx for the onnxruntime backend (chatbot_onnx.py):
+
+- encoder.onnx: encoder token ids -> padding mask and, per decoder layer, the
+  cross-attention keys/values (computed once per question)
+- decoder_step.onnx: decodes the token at `position` against fixed-size
+  self-attention key/value caches and returns the next-token logits plus the
+  updated caches
+
+The weights come from transformer_weights.weights.h5, so this works for models
+trained with training/chatbot_model.py as well.
+
+Usage:
+    python export_onnx_model.py [--model-dir model] [--opset 17]
+"""
+
+import argparse
+import os
+from contextlib import contextmanager
+
+import tensorflow as tf
+import tf2onnx
+
+from app import (
+    BuffettChatbot, MODEL_DIR, SERVING_WEIGHTS_STAMP,
+    decoding_step_signatures, file_sha256, resolve_model_dir
+)
+from chatbot_onnx import ONNX_DIR
+
+
+@contextmanager
+def inlined_position_tables(model, rows):
+    """Make the positional encodings in-graph constants while tracing.
+
+    tf2onnx turns captured eager tensors into extra graph inputs, so the tables are
+    recreated with tf.constant inside the traced function (trimmed to the rows used).
+    """
+    tables = (model.encoder.pos_encoding, model.decoder.pos_encoding)
+    try:
+        model.encoder.pos_encoding = tf.constant(tables[0].numpy()[:, :rows])
+        model.decoder.pos_encoding = tf.constant(tables[1].numpy()[:, :rows])
+        yield
+    finally:
+        model.encoder.pos_encoding, model.decoder.pos_encoding = tables
+
+
+def export_onnx_model(model_dir, opset=17):
+    """Export model_dir's weights as encoder/decoder-step ONNX graphs and return the output directory"""
+    # Offline: no response cache file in the model directory and no retrieval index
+    chatbot = BuffettChatbot(
+        model_dir, use_serving_artifact=False, compile_generation=False, response_cache_size=0, retrieval_threshold=None
+    )
+    if not chatbot.is_loaded():
+        raise RuntimeError(f"Could not load a TensorFlow model from {model_dir}")
+    model = chatbot.model
+    rows = chatbot.config["max_length"] + 1
+
+    def encode(encoder_input):
+        with inlined_position_tables(model, rows):
+            return model.encode_for_steps(encoder_input)
+
+    def decode_step(tokens, position, enc_padding_mask, *flat_caches):
+        with inlined_position_tables(model, rows):
+            return model.decode_position(tokens, position, enc_padding_mask, *flat_caches)
+
+    encoder_signature, decoder_signature = decoding_step_signatures(chatbot.config)
+
+    onnx_dir = os.path.join(model_dir, ONNX_DIR)
+    os.makedirs(onnx_dir, exist_ok=True)
+    tf2onnx.convert.from_function(
+        tf.function(encode, input_signature=encoder_signature),
+        input_signature=encoder_signature, opset=opset,
+        output_path=os.path.join(onnx_dir, "encoder.onnx")
+    )
+    tf2onnx.convert.from_function(
+        tf.function(decode_step, input_signature=decoder_signature),
+        input_signature=decoder_signature, opset=opset,
+        output_path=os.path.join(onnx_dir, "decoder_step.onnx")
+    )
+
+    # Written last: the app only trusts graphs whose stamp matches the current weights
+    weights_path = os.path.join(model_dir, "transformer_weights.weights.h5")
+    with open(os.path.join(onnx_dir, SERVING_WEIGHTS_STAMP), 'w') as f:
+        f.write(file_sha256(weights_path))
+    return onnx_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+    print(f"✓ ONNX graphs exported to {export_onnx_model(resolve_model_dir(args.model_dir), opset=args.opset)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Export the custom chatbot as a self-contained serving artifact
+Writes a SavedModel with a fixed `generate` signature (padded encoder token ids
+in, greedy answer token ids out) plus `encode`/`decode_step` functions for
+token-by-token streaming to <model-dir>/serving. The app loads it
+directly instead of rebuilding the Transformer from config.json, running a
+dummy forward pass and tracing the decode loop in every worker.
+
+Usage:
+    python export_serving_model.py [--model-dir model] [--xla]
+"""
+
+import argparse
+import os
+
+import tensorflow as tf
+
+from app import (
+    BuffettChatbot, MODEL_DIR, SERVING_DIR, SERVING_WEIGHTS_STAMP,
+    decoding_step_signatures, file_sha256, resolve_model_dir
+)
+
+
+def export_serving_model(model_dir, jit_compile=False):
+    """Export model_dir's weights as a SavedModel under model_dir/serving and return its path"""
+    # Offline: no response cache file in the model directory and no retrieval index
+    chatbot = BuffettChatbot(
+        model_dir, use_serving_artifact=False, jit_compile=jit_compile, response_cache_size=0, retrieval_threshold=None
+    )
+    if not chatbot.is_loaded():
+        raise RuntimeError(f"Could not load a TensorFlow model from {model_dir}")
+
+    serving_dir = os.path.join(model_dir, SERVING_DIR)
+    module = tf.Module()
+    module.model = chatbot.model  # tracks the variables captured by generate
+    module.generate = chatbot._generate_fn
+    # Single-step functions for token-by-token streaming (BuffettChatbot.chat_stream)
+    encoder_signature, decoder_signature = decoding_step_signatures(chatbot.config)
+    module.encode = tf.function(chatbot.model.encode_for_steps, input_signature=encoder_signature)
+    module.decode_step = tf.function(chatbot.model.decode_position, input_signature=decoder_signature)
+    tf.saved_model.save(module, serving_dir, signatures={"serving_default": module.generate})
+
+    # Written last: the app only trusts an artifact whose stamp matches the current weights
+    weights_path = os.path.join(model_dir, "transformer_weights.weights.h5")
+    with open(os.path.join(serving_dir, SERVING_WEIGHTS_STAMP), 'w') as f:
+        f.write(file_sha256(weights_path))
+    return serving_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--xla", action="store_true", help="XLA-compile the exported generate function")
+    args = parser.parse_args()
+    print(f"✓ Serving artifact exported to {export_serving_model(resolve_model_dir(args.model_dir), jit_compile=args.xla)}")
+
+
+if __name__ == "__main__":
+    main()
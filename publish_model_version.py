@@ -0,0 +1,70 @@
+"""
+Publish a trained model as a new version of the model directory
+Copies a trained model directory (weights, config, tokenizer and any exported
+artifacts next to them) to <model-dir>/<version>/ and then atomically points
+<model-dir>/current at it. Running apps and chatbot servers notice the pointer
+within CHATBOT_HOT_SWAP_INTERVAL seconds, load and warm up the new version in
+the background and swap it in without a restart (see ChatbotHotSwap in app.py).
+
+Without --from, the pointer is moved to an already published version, e.g. to
+roll back. Build the retrieval index and export the serving/ONNX artifacts
+into the source directory before publishing, so the version is complete when
+the running apps load it.
+
+Usage:
+    python publish_model_version.py --version VERSION [--from path/to/trained_model] [--model-dir model]
+"""
+
+import argparse
+import os
+import shutil
+
+from app import MODEL_DIR, MODEL_VERSION_POINTER, RESPONSE_CACHE_FILE, resolve_model_dir
+
+MODEL_FILES = ["config.json", "tokenizer.json", "transformer_weights.weights.h5"]
+
+
+def publish_model_version(model_dir, version, source_dir=None):
+    """Copy source_dir to model_dir/version (if given) and make it the current version; returns its path"""
+    if not version or os.sep in version or version.startswith(".") or version == MODEL_VERSION_POINTER:
+        raise ValueError(f"Invalid version name '{version}'")
+    version_dir = os.path.join(model_dir, version)
+    if source_dir is not None:
+        if os.path.exists(version_dir):
+            raise FileExistsError(f"{version_dir} already exists, publish under a new version")
+        # Copy next to the final path and rename, so a half-copied version is never visible
+        staging_dir = os.path.join(model_dir, f".{version}.tmp")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        shutil.copytree(source_dir, staging_dir, ignore=shutil.ignore_patterns(f"{RESPONSE_CACHE_FILE}*"))
+        os.rename(staging_dir, version_dir)
+    missing = [name for name in MODEL_FILES if not os.path.exists(os.path.join(version_dir, name))]
+    if missing:
+        raise FileNotFoundError(f"{version_dir} is missing {', '.join(missing)}")
+
+    # Write the new pointer under a temporary name and rename it over the old one (atomic on POSIX);
+    # a symlink pointer stays a symlink
+    pointer = os.path.join(model_dir, MODEL_VERSION_POINTER)
+    staging_pointer = f"{pointer}.tmp"
+    if os.path.lexists(staging_pointer):
+        os.remove(staging_pointer)
+    if os.path.islink(pointer):
+        os.symlink(version, staging_pointer)
+    else:
+        with open(staging_pointer, 'w') as f:
+            f.write(version + "\n")
+    os.replace(staging_pointer, pointer)
+    return resolve_model_dir(model_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--version", required=True, help="name of the version subdirectory")
+    parser.add_argument("--from", dest="source_dir", default=None, help="trained model directory to copy in")
+    args = parser.parse_args()
+    os.makedirs(args.model_dir, exist_ok=True)
+    print(f"✓ Current model version: {publish_model_version(args.model_dir, args.version, args.source_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ Keras 3 Compatible Version
 Run this notebook in Google Colab to train the chatbot model.
 
 Instructions:
-1. Upload this file to Google Colab
+1. Upload this file, chatbot_text.py and chatbot_vocab.py (repository root) to Google Colab
 2. Upload your Q&A CSV file to Colab
 3. Run all cells
 4. Download the model files from the 'model' folder
@@ -21,11 +21,12 @@ Google Colab Setup:
 # ============================================================================
 
 import os
-import re
+import sys
 import json
 import numpy as np
 import pandas as pd
 from time import time
+from itertools import chain, repeat
 import tensorflow as tf
 import zipfile
 
@@ -59,6 +60,10 @@ D_MODEL = 256
 NUM_HEADS = 8
 UNITS = 512
 DROPOUT = 0.1
+# Weight of the auxiliary loss that teaches intermediate decoder layers to predict
+# the full model's next token (for BuffettChatbot(early_exit_threshold=...)). It changes
+# the training objective, so it is off (0) unless requested, e.g. EARLY_EXIT_LOSS_WEIGHT=0.3
+EARLY_EXIT_LOSS_WEIGHT = float(os.environ.get("EARLY_EXIT_LOSS_WEIGHT", "0"))
 
 EPOCHS = 120
 OUTPUT_DIR = "./model"
@@ -72,6 +77,7 @@ Hyperparameters:
 - NUM_HEADS: {NUM_HEADS}
 - UNITS: {UNITS}
 - DROPOUT: {DROPOUT}
+- EARLY_EXIT_LOSS_WEIGHT: {EARLY_EXIT_LOSS_WEIGHT}
 - EPOCHS: {EPOCHS}
 """)
 
@@ -90,30 +96,13 @@ print(f"\nUploaded file: {CSV_FILENAME}")
 # STEP 5: Text Preprocessing
 # ============================================================================
 
-def preprocess_sentence(sentence):
-    if not isinstance(sentence, str):
-        sentence = str(sentence)
-    sentence = sentence.lower().strip()
-    sentence = re.sub(r"([?.!,])", r" \1 ", sentence)
-    sentence = re.sub(r'[" "]+', " ", sentence)
-    sentence = re.sub(r"i'm", "i am", sentence)
-    sentence = re.sub(r"he's", "he is", sentence)
-    sentence = re.sub(r"she's", "she is", sentence)
-    sentence = re.sub(r"it's", "it is", sentence)
-    sentence = re.sub(r"that's", "that is", sentence)
-    sentence = re.sub(r"what's", "what is", sentence)
-    sentence = re.sub(r"where's", "where is", sentence)
-    sentence = re.sub(r"how's", "how is", sentence)
-    sentence = re.sub(r"\'ll", " will", sentence)
-    sentence = re.sub(r"\'ve", " have", sentence)
-    sentence = re.sub(r"\'re", " are", sentence)
-    sentence = re.sub(r"\'d", " would", sentence)
-    sentence = re.sub(r"won't", "will not", sentence)
-    sentence = re.sub(r"can't", "cannot", sentence)
-    sentence = re.sub(r"n't", " not", sentence)
-    sentence = re.sub(r"[^a-zA-Z0-9?.!,%]+", " ", sentence)
-    sentence = sentence.strip()
-    return sentence
+# Same normalization as the app uses for questions at inference time
+try:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+except NameError:
+    pass  # Colab: chatbot_text.py and chatbot_vocab.py are uploaded to the working directory
+from chatbot_text import normalize_series, normalize_text as preprocess_sentence
+from chatbot_vocab import pad_token_ids, write_vocab_file
 
 # ============================================================================
 # STEP 6: Load Data
@@ -141,8 +130,8 @@ def load_conversations_from_csv(csv_path):
     
     df = df.dropna(subset=[q_col, a_col])
     
-    questions = [preprocess_sentence(q) for q in df[q_col].tolist()]
-    answers = [preprocess_sentence(a) for a in df[a_col].tolist()]
+    questions = normalize_series(df[q_col]).tolist()
+    answers = normalize_series(df[a_col]).tolist()
     
     # Filter empty
     pairs = [(q, a) for q, a in zip(questions, answers) if q and a]
@@ -194,6 +183,19 @@ class SimpleTokenizer:
     def decode(self, tokens):
         return ' '.join([self.idx2word.get(idx, '<OOV>') for idx in tokens if idx > 0])
     
+    def encode_batch(self, sentences, max_length, start_token=None, end_token=None):
+        # Zero-padded int32 array of [start_token] + ids + [end_token] rows and the untruncated row lengths
+        split = [sentence.split() for sentence in sentences]
+        counts = np.fromiter(map(len, split), dtype=np.int64, count=len(split))
+        ids = np.fromiter(map(self.word2idx.get, chain.from_iterable(split), repeat(1)), dtype=np.int32, count=int(counts.sum()))
+        return pad_token_ids(ids, counts, max_length, start_token, end_token)
+    
+    def decode_batch(self, tokens):
+        # Ids outside the vocabulary (padding, START, END) are skipped
+        tokens = np.asarray(tokens)
+        tokens = np.where((tokens > 0) & (tokens < self.vocab_size), tokens, 0)
+        return [self.decode(row) for row in tokens.tolist()]
+    
     def save(self, path):
         with open(path, 'w') as f:
             json.dump({'word2idx': self.word2idx, 'idx2word': {int(k): v for k, v in self.idx2word.items()}, 'vocab_size': self.vocab_size}, f)
@@ -222,20 +224,13 @@ print(f"Total vocab size (with special tokens): {VOCAB_SIZE}")
 # ============================================================================
 
 def tokenize_and_filter(inputs, outputs):
-    tokenized_inputs, tokenized_outputs = [], []
-    
-    for q, a in zip(inputs, outputs):
-        q_tok = [START_TOKEN] + tokenizer.encode(q) + [END_TOKEN]
-        a_tok = [START_TOKEN] + tokenizer.encode(a) + [END_TOKEN]
-        
-        if len(q_tok) <= MAX_LENGTH and len(a_tok) <= MAX_LENGTH:
-            tokenized_inputs.append(q_tok)
-            tokenized_outputs.append(a_tok)
+    tokenized_inputs, input_lengths = tokenizer.encode_batch(inputs, MAX_LENGTH, START_TOKEN, END_TOKEN)
+    tokenized_outputs, output_lengths = tokenizer.encode_batch(outputs, MAX_LENGTH, START_TOKEN, END_TOKEN)
     
-    tokenized_inputs = tf.keras.preprocessing.sequence.pad_sequences(tokenized_inputs, maxlen=MAX_LENGTH, padding="post")
-    tokenized_outputs = tf.keras.preprocessing.sequence.pad_sequences(tokenized_outputs, maxlen=MAX_LENGTH, padding="post")
+    # Drop pairs where either side does not fit
+    keep = (input_lengths <= MAX_LENGTH) & (output_lengths <= MAX_LENGTH)
     
-    return tokenized_inputs, tokenized_outputs
+    return tokenized_inputs[keep], tokenized_outputs[keep]
 
 questions_tok, answers_tok = tokenize_and_filter(questions, answers)
 print(f"Samples after filtering: {len(questions_tok)}")
@@ -399,14 +394,19 @@ class Decoder(tf.keras.layers.Layer):
         self.dec_layers = [DecoderLayer(d_model, num_heads, dff, rate) for _ in range(num_layers)]
         self.dropout = tf.keras.layers.Dropout(rate)
     
-    def call(self, x, enc_output, training=False, look_ahead_mask=None, padding_mask=None):
+    def call(self, x, enc_output, training=False, look_ahead_mask=None, padding_mask=None, return_intermediate=False):
         seq_len = tf.shape(x)[1]
         x = self.embedding(x)
         x *= tf.math.sqrt(tf.cast(self.d_model, tf.float32))
         x += self.pos_encoding[:, :seq_len, :]
         x = self.dropout(x, training=training)
+        intermediate = []
         for i in range(self.num_layers):
             x = self.dec_layers[i](x, enc_output, training=training, look_ahead_mask=look_ahead_mask, padding_mask=padding_mask)
+            intermediate.append(x)
+        if return_intermediate:
+            # Outputs of every layer but the last, the candidate early-exit points
+            return x, intermediate[:-1]
         return x
 
 class Transformer(tf.keras.Model):
@@ -425,8 +425,13 @@ class Transformer(tf.keras.Model):
         combined_mask = tf.maximum(dec_target_padding_mask, look_ahead_mask)
         
         enc_output = self.encoder(inp, training=training, mask=enc_padding_mask)
-        dec_output = self.decoder(tar, enc_output, training=training, look_ahead_mask=combined_mask, padding_mask=dec_padding_mask)
+        dec_output, intermediate = self.decoder(
+            tar, enc_output, training=training, look_ahead_mask=combined_mask, padding_mask=dec_padding_mask,
+            return_intermediate=True
+        )
         final_output = self.final_layer(dec_output)
+        if training and EARLY_EXIT_LOSS_WEIGHT and intermediate:
+            self.add_loss(EARLY_EXIT_LOSS_WEIGHT * early_exit_loss(tar, final_output, [self.final_layer(h) for h in intermediate]))
         return final_output
 
 # ============================================================================
@@ -442,6 +447,21 @@ def loss_function(real, pred):
     loss_ *= mask
     return tf.reduce_sum(loss_) / tf.reduce_sum(mask)
 
+def early_exit_loss(tar, final_logits, exit_logits):
+    """Cross-entropy of each intermediate layer's logits against the full model's (fixed) distribution.
+    
+    Averaged over the non-padding decoder positions and the exits. Matching the full
+    model rather than the labels trains the exits for the early-exit decision itself:
+    whether stopping at that layer gives the token the full model would have chosen.
+    """
+    mask = tf.cast(tf.math.not_equal(tar, 0), tf.float32)
+    target = tf.nn.softmax(tf.stop_gradient(final_logits))
+    losses = [
+        tf.reduce_sum(tf.keras.losses.categorical_crossentropy(target, logits, from_logits=True) * mask) / tf.reduce_sum(mask)
+        for logits in exit_logits
+    ]
+    return tf.add_n(losses) / len(losses)
+
 def accuracy_function(real, pred):
     accuracies = tf.equal(real, tf.argmax(pred, axis=2, output_type=tf.int32))
     mask = tf.math.logical_not(tf.math.equal(real, 0))
@@ -531,6 +551,8 @@ print(f"✓ Weights saved to {weights_path}")
 # Save tokenizer
 tokenizer_path = os.path.join(OUTPUT_DIR, "tokenizer.json")
 tokenizer.save(tokenizer_path)
+# Binary copy of the vocabulary that the app memory-maps instead of parsing the JSON
+write_vocab_file(tokenizer_path)
 print(f"✓ Tokenizer saved")
 
 # Save config
@@ -550,12 +572,44 @@ with open(config_path, 'w') as f:
     json.dump(config, f, indent=2)
 print(f"✓ Config saved")
 
+# Save the vocabulary shortlist: every token that occurs in a training answer.
+# BuffettChatbot(vocab_shortlist=True) only projects decode steps onto these ids.
+shortlist = sorted(int(t) for t in np.unique(answers_tok) if t not in (0, START_TOKEN, END_TOKEN))
+with open(os.path.join(OUTPUT_DIR, "vocab_shortlist.json"), 'w') as f:
+    json.dump({"token_ids": shortlist}, f)
+print(f"✓ Vocabulary shortlist saved ({len(shortlist)} tokens)")
+
 # Save history
 history_path = os.path.join(OUTPUT_DIR, "training_history.json")
 with open(history_path, 'w') as f:
     json.dump({k: [float(v) for v in vals] for k, vals in history.history.items()}, f, indent=2)
 print(f"✓ History saved")
 
+# Export the serving artifact (SavedModel with a fixed generate signature) so the
+# app can load it directly instead of rebuilding the model at start-up. This needs
+# the repository's app.py; otherwise run `python export_serving_model.py` after
+# extracting the model files.
+# The trained model is already saved, so an export failure is reported and training carries on.
+try:
+    sys.path.insert(0, os.path.abspath(os.path.join(OUTPUT_DIR, os.pardir)))
+    from export_serving_model import export_serving_model
+    export_serving_model(OUTPUT_DIR)
+    print(f"✓ Serving artifact exported")
+except ImportError:
+    print("ℹ Serving artifact not exported (app.py not found). Run `python export_serving_model.py` after extracting the model.")
+except Exception as e:
+    print(f"⚠ Serving artifact export failed ({e}). Run `python export_serving_model.py` after extracting the model.")
+
+# Export encoder/decoder-step ONNX graphs for the onnxruntime backend (needs app.py and tf2onnx)
+try:
+    from export_onnx_model import export_onnx_model
+    export_onnx_model(OUTPUT_DIR)
+    print(f"✓ ONNX graphs exported")
+except ImportError:
+    print("ℹ ONNX graphs not exported (needs app.py and tf2onnx). Run `python export_onnx_model.py` after extracting the model.")
+except Exception as e:
+    print(f"⚠ ONNX export failed ({e}). Run `python export_onnx_model.py` after extracting the model.")
+
 # ============================================================================
 # STEP 16: Test Model
 # ============================================================================
@@ -568,9 +622,7 @@ def evaluate(sentence):
 
     sentence = preprocess_sentence(sentence)
 
-    sentence = [START_TOKEN] + tokenizer.encode(sentence) + [END_TOKEN]
-
-    sentence = tf.keras.preprocessing.sequence.pad_sequences([sentence], maxlen=MAX_LENGTH, padding="post")
+    sentence, _ = tokenizer.encode_batch([sentence], MAX_LENGTH, START_TOKEN, END_TOKEN)
 
     encoder_input = tf.cast(sentence, tf.int32)
 
@@ -614,9 +666,7 @@ def predict(sentence):
 
     prediction = evaluate(sentence)
 
-    predicted_tokens = [i for i in prediction.numpy() if i < tokenizer.vocab_size and i > 0]
-
-    return tokenizer.decode(predicted_tokens)
+    return tokenizer.decode_batch([prediction.numpy()])[0]
 
 
 
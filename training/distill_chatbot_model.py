@@ -0,0 +1,322 @@
+"""
+Warren Buffett Investment Advisor - Student Model Distillation
+==============================================================
+Trains smaller students (fewer heads, narrower FFN, optionally fewer layers
+or a smaller d_model) on a trained teacher's soft outputs over the Q&A corpus
+and writes each one as a model directory the app loads in place of the teacher.
+
+- Targets are the teacher's own greedy answers to the corpus questions
+  (sequence-level distillation), so the student learns what the teacher says
+  rather than the curated answers the teacher only approximates.
+- The loss mixes the KL divergence to the teacher's temperature-softened
+  next-token distribution with cross-entropy on the teacher's tokens.
+- During training the encoder embedding, decoder embedding and output
+  projection share one matrix, which keeps the small student from overfitting
+  ~1k questions with three separate vocab x d_model tables. The saved weights
+  expand it back into the regular Transformer layout, so the TensorFlow,
+  NumPy, ONNX and serving-artifact paths load a student unchanged.
+
+Finishes with a latency-vs-agreement table (teacher and every student) to pick
+the trade-off. Copy the chosen student's files into model/ (or pass its
+directory to chatbot_server.py --model-dir), then re-run
+export_serving_model.py / export_onnx_model.py for it.
+
+Usage:
+    python training/distill_chatbot_model.py [--teacher-dir model] [--output-dir model_students]
+        [--student 2,128,4,256 --student 1,128,4,256] [--epochs 60]
+    python training/distill_chatbot_model.py --report-only model_students/*
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from app import BuffettChatbot, MODEL_DIR, Transformer, preprocess_sentence_chatbot  # noqa: E402
+
+QA_CSV = os.path.join(REPO_DIR, "training", "warren_buffett_qa_augmented.csv")
+WEIGHTS_FILE = "transformer_weights.weights.h5"
+# Copied from the teacher: the student keeps its tokenizer, so these still apply
+SHARED_FILES = ["tokenizer.json", "tokenizer.bin", "vocab_shortlist.json"]
+
+# Same schedule as chatbot_model.py
+class CustomSchedule(tf.keras.optimizers.schedules.LearningRateSchedule):
+    def __init__(self, d_model, warmup_steps=400):
+        super(CustomSchedule, self).__init__()
+        self.d_model = d_model
+        self.d_model_float = tf.cast(d_model, tf.float32)
+        self.warmup_steps = warmup_steps
+
+    def __call__(self, step):
+        step = tf.cast(step, tf.float32)
+        arg1 = tf.math.rsqrt(step)
+        arg2 = step * (self.warmup_steps ** -1.5)
+        return tf.math.rsqrt(self.d_model_float) * tf.math.minimum(arg1, arg2)
+
+    def get_config(self):
+        return {"d_model": self.d_model, "warmup_steps": self.warmup_steps}
+
+
+class TiedOutputProjection(tf.keras.layers.Layer):
+    """Output logits against the (unscaled) shared embedding matrix"""
+    def __init__(self, embedding, **kwargs):
+        super(TiedOutputProjection, self).__init__(**kwargs)
+        self.embedding = embedding
+
+    def build(self, input_shape):
+        self.bias = self.add_weight(shape=(self.embedding.input_dim,), initializer="zeros", name="bias")
+
+    def call(self, x):
+        return tf.matmul(x, self.embedding.embeddings, transpose_b=True) + self.bias
+
+
+class SharedEmbeddingTransformer(Transformer):
+    """Training-time student: one embedding matrix for encoder, decoder and output projection"""
+    def __init__(self, *args, **kwargs):
+        super(SharedEmbeddingTransformer, self).__init__(*args, **kwargs)
+        self.decoder.embedding = self.encoder.embedding
+        self.final_layer = TiedOutputProjection(self.encoder.embedding)
+
+
+def build_transformer(cls, config):
+    model = cls(
+        num_layers=config["num_layers"],
+        d_model=config["d_model"],
+        num_heads=config["num_heads"],
+        dff=config["units"],
+        input_vocab_size=config["vocab_size"],
+        target_vocab_size=config["vocab_size"],
+        pe_input=config["vocab_size"],
+        pe_target=config["vocab_size"],
+        rate=config["dropout"]
+    )
+    max_length = config["max_length"]
+    model((tf.zeros((1, max_length), dtype=tf.int32), tf.zeros((1, max_length - 1), dtype=tf.int32)))
+    return model
+
+
+def untie(student, config):
+    """Copy a trained SharedEmbeddingTransformer into the plain Transformer layout the app loads"""
+    model = build_transformer(Transformer, config)
+    embedding = student.encoder.embedding.get_weights()
+    model.encoder.embedding.set_weights(embedding)
+    model.decoder.embedding.set_weights(embedding)
+    model.final_layer.set_weights([embedding[0].T, student.final_layer.bias.numpy()])
+    for source, target in zip(student.encoder.enc_layers + student.decoder.dec_layers,
+                              model.encoder.enc_layers + model.decoder.dec_layers):
+        target.set_weights(source.get_weights())
+    return model
+
+
+def parse_student(spec):
+    """'layers,d_model,heads,units' -> config overrides"""
+    num_layers, d_model, num_heads, units = (int(v) for v in spec.split(","))
+    if d_model % num_heads:
+        raise argparse.ArgumentTypeError(f"d_model {d_model} is not divisible by {num_heads} heads")
+    return {"num_layers": num_layers, "d_model": d_model, "num_heads": num_heads, "units": units}
+
+
+def student_name(config):
+    return f"student_L{config['num_layers']}_D{config['d_model']}_H{config['num_heads']}_F{config['units']}"
+
+
+def load_questions(csv_path):
+    """Unique corpus questions, in CSV order"""
+    df = pd.read_csv(csv_path, delimiter="\t", on_bad_lines="skip")
+    questions = df[df.columns[0]].dropna().astype(str)
+    seen, unique = set(), []
+    for question in questions:
+        key = preprocess_sentence_chatbot(question)
+        if key not in seen:
+            seen.add(key)
+            unique.append(question)
+    return unique
+
+
+def answer_tokens(buffer):
+    """Generated ids (without START) per row of a (batch, max_length + 1) greedy buffer, up to the first padding id"""
+    tokens = []
+    for row in np.asarray(buffer):
+        # The teacher can predict the padding id mid-answer, so count_nonzero would misplace the cut
+        padding = row[1:] == 0
+        end = int(np.argmax(padding)) + 1 if padding.any() else len(row)
+        tokens.append(row[1:end].tolist())
+    return tokens
+
+
+def teacher_targets(teacher, questions, batch_size):
+    """Encoder inputs and [START] + greedy answer + [END] decoder sequences from the teacher"""
+    config = teacher.config
+    encoder_input = teacher._encode_inputs(questions)
+    targets = np.zeros((len(questions), config["max_length"] + 2), dtype=np.int32)
+    for offset in range(0, len(questions), batch_size):
+        answers = answer_tokens(teacher._evaluate_batch(questions[offset:offset + batch_size]))
+        for row, tokens in enumerate(answers, offset):
+            sequence = [config["start_token"]] + tokens + [config["end_token"]]
+            targets[row, :len(sequence)] = sequence
+    return encoder_input, targets
+
+
+def distill(teacher, student_config, encoder_input, targets, output_dir, epochs=60, batch_size=64,
+            temperature=2.0, alpha=0.5, seed=1234):
+    """Train one student against the teacher and write its model directory"""
+    tf.keras.utils.set_random_seed(seed)
+    config = dict(teacher.config, **student_config)
+    student = build_transformer(SharedEmbeddingTransformer, config)
+    optimizer = tf.keras.optimizers.Adam(CustomSchedule(config["d_model"]), beta_1=0.9, beta_2=0.98, epsilon=1e-9)
+
+    @tf.function
+    def train_step(inp, tar):
+        tar_inp, tar_real = tar[:, :-1], tar[:, 1:]
+        mask = tf.cast(tf.not_equal(tar_real, 0), tf.float32)
+        teacher_logits = teacher.model((inp, tar_inp), training=False)
+        soft_targets = tf.nn.softmax(teacher_logits / temperature)
+        with tf.GradientTape() as tape:
+            logits = student((inp, tar_inp), training=True)
+            # KL(teacher || student) at temperature T, scaled by T^2 to keep gradient magnitudes comparable
+            log_probs = tf.nn.log_softmax(logits / temperature)
+            kl = tf.reduce_sum(soft_targets * (tf.math.log(soft_targets + 1e-9) - log_probs), axis=-1)
+            ce = tf.keras.losses.sparse_categorical_crossentropy(tar_real, logits, from_logits=True)
+            per_token = alpha * temperature ** 2 * kl + (1 - alpha) * ce
+            loss = tf.reduce_sum(per_token * mask) / tf.reduce_sum(mask)
+        gradients = tape.gradient(loss, student.trainable_variables)
+        optimizer.apply_gradients(zip(gradients, student.trainable_variables))
+        accuracy = tf.cast(tf.equal(tar_real, tf.argmax(logits, axis=-1, output_type=tf.int32)), tf.float32)
+        return loss, tf.reduce_sum(accuracy * mask) / tf.reduce_sum(mask)
+
+    dataset = tf.data.Dataset.from_tensor_slices((encoder_input, targets))
+    dataset = dataset.shuffle(len(targets), seed=seed).batch(batch_size)
+    history = {"loss": [], "teacher_token_accuracy": []}
+    print(f"\nDistilling {student_name(config)} ({student.count_params():,} trained parameters)")
+    for epoch in range(epochs):
+        start = perf_counter()
+        losses, accuracies = [], []
+        for inp, tar in dataset:
+            loss, accuracy = train_step(inp, tar)
+            losses.append(float(loss))
+            accuracies.append(float(accuracy))
+        history["loss"].append(float(np.mean(losses)))
+        history["teacher_token_accuracy"].append(float(np.mean(accuracies)))
+        if epoch % 10 == 9 or epoch == epochs - 1:
+            print(f"Epoch {epoch + 1}/{epochs} loss {history['loss'][-1]:.4f} "
+                  f"teacher token accuracy {history['teacher_token_accuracy'][-1]:.4f} ({perf_counter() - start:.1f}s)")
+
+    os.makedirs(output_dir, exist_ok=True)
+    untie(student, config).save_weights(os.path.join(output_dir, WEIGHTS_FILE))
+    for name in SHARED_FILES:
+        if os.path.exists(os.path.join(teacher.model_dir, name)):
+            # copy2 keeps modification times, which tokenizer.bin checks tokenizer.json against
+            shutil.copy2(os.path.join(teacher.model_dir, name), output_dir)
+    with open(os.path.join(output_dir, "config.json"), 'w') as f:
+        json.dump(config, f, indent=2)
+    history["distillation"] = {"teacher_config": teacher.config, "epochs": epochs, "temperature": temperature, "alpha": alpha}
+    with open(os.path.join(output_dir, "training_history.json"), 'w') as f:
+        json.dump(history, f)
+    return output_dir
+
+
+def timed_answers(chatbot, questions, repeats):
+    """Greedy token buffers and the best mean latency per answer over repeats passes, in milliseconds"""
+    chatbot.chat(questions[0])  # graph tracing
+    best = float("inf")
+    for _ in range(repeats):
+        start = perf_counter()
+        buffers = [chatbot._evaluate(q) for q in questions]
+        best = min(best, (perf_counter() - start) * 1000 / len(questions))
+    return [answer_tokens(np.asarray(b)[np.newaxis])[0] for b in buffers], best
+
+
+def weight_count(model_dir):
+    """Model parameters in a model directory's weights file (a compiled model also saves optimizer slots)"""
+    import h5py
+
+    sizes = []
+
+    def visit(name, item):
+        if isinstance(item, h5py.Dataset) and not name.startswith("optimizer/"):
+            sizes.append(item.size)
+
+    with h5py.File(os.path.join(model_dir, WEIGHTS_FILE), 'r') as f:
+        f.visititems(visit)
+    return sum(sizes)
+
+
+def token_agreement(expected, actual):
+    """Share of the expected answer tokens (END included) reproduced at the same position"""
+    expected, actual = expected + [None], actual + [None]
+    return sum(a == b for a, b in zip(expected, actual)) / len(expected)
+
+
+def report(teacher_dir, student_dirs, questions, repeats=3):
+    """Print latency (TensorFlow and NumPy backends) against agreement with the teacher's greedy answers"""
+    rows = []
+    reference = None
+    for model_dir in [teacher_dir] + list(student_dirs):
+        latencies = {}
+        for backend in ("tensorflow", "numpy"):
+            chatbot = BuffettChatbot(model_dir, backend=backend, response_cache_size=0, retrieval_threshold=None)
+            if not chatbot.is_loaded():
+                sys.exit(f"Could not load a model from {model_dir}")
+            answers, latencies[backend] = timed_answers(chatbot, questions, repeats)
+        reference = reference or answers
+        exact = np.mean([a == b for a, b in zip(reference, answers)])
+        tokens = np.mean([token_agreement(a, b) for a, b in zip(reference, answers)])
+        name = "teacher" if model_dir == teacher_dir else os.path.basename(os.path.normpath(model_dir))
+        rows.append((name, weight_count(model_dir), latencies["tensorflow"], latencies["numpy"], exact, tokens))
+
+    print(f"\nLatency vs agreement with the teacher ({len(questions)} corpus questions)")
+    print(f"{'Model':<26}{'params':>10}{'TF ms':>8}{'NumPy ms':>10}{'speed-up':>10}{'exact':>8}{'tokens':>8}")
+    for name, params, tf_ms, np_ms, exact, tokens in rows:
+        print(f"{name:<26}{params / 1e6:>9.2f}M{tf_ms:>8.1f}{np_ms:>10.1f}{f'{rows[0][3] / np_ms:.2f}x':>10}"
+              f"{exact:>8.1%}{tokens:>8.1%}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--teacher-dir", default=MODEL_DIR)
+    parser.add_argument("--output-dir", default="model_students", help="one subdirectory per student")
+    parser.add_argument("--csv", default=QA_CSV)
+    parser.add_argument("--student", type=parse_student, action="append",
+                        help="layers,d_model,heads,units (repeatable; default: 2,128,4,256 and 1,128,4,256)")
+    parser.add_argument("--epochs", type=int, default=60)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--alpha", type=float, default=0.5, help="weight of the soft-target loss")
+    parser.add_argument("--report-questions", type=int, default=100, help="corpus questions in the report")
+    parser.add_argument("--report-only", nargs="+", metavar="STUDENT_DIR", help="skip training, only compare these")
+    args = parser.parse_args()
+
+    questions = load_questions(args.csv)
+    student_dirs = args.report_only
+    if not student_dirs:
+        teacher = BuffettChatbot(args.teacher_dir, backend="tensorflow", use_serving_artifact=False,
+                                 response_cache_size=0, retrieval_threshold=None)
+        if not teacher.is_loaded():
+            sys.exit(f"Could not load the teacher from {args.teacher_dir}")
+        start = perf_counter()
+        encoder_input, targets = teacher_targets(teacher, questions, args.batch_size)
+        print(f"Teacher answers for {len(questions)} questions in {perf_counter() - start:.1f}s")
+        student_dirs = []
+        for student_config in args.student or [parse_student("2,128,4,256"), parse_student("1,128,4,256")]:
+            output_dir = os.path.join(args.output_dir, student_name(student_config))
+            student_dirs.append(distill(
+                teacher, student_config, encoder_input, targets, output_dir, epochs=args.epochs,
+                batch_size=args.batch_size, temperature=args.temperature, alpha=args.alpha
+            ))
+            print(f"✓ Student written to {output_dir}")
+
+    report(args.teacher_dir, student_dirs, questions[::max(len(questions) // args.report_questions, 1)][:args.report_questions])
+
+
+if __name__ == "__main__":
+    main()